@@ -0,0 +1,74 @@
+"""Compare two sets of benchmark results
+
+Usage: ``python benchmarks/compare.py BASELINE.json CURRENT.json [--threshold 0.1]``
+
+Every number found in both files is listed with its relative change. Changes for the
+worse which exceed the threshold are flagged and cause a non-zero exit status.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Iterator
+
+# measurements for which bigger numbers are better - all others are costs
+_HIGHER_IS_BETTER = ("per_second",)
+# counts which describe how work was done rather than how fast
+_IGNORED = ("threads", "renders", "delivered_events", "coalesced_events")
+
+
+def flatten(results: Any, prefix: str = "") -> Iterator[tuple[str, float]]:
+    if isinstance(results, dict):
+        for key, value in results.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        yield prefix, results
+
+
+def is_regression(name: str, change: float, threshold: float) -> bool:
+    if any(part in _IGNORED for part in name.split(".")):
+        return False
+    if any(marker in name for marker in _HIGHER_IS_BETTER):
+        return change < -threshold
+    return change > threshold
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change beyond which a result is flagged (default: 0.1)",
+    )
+    args = parser.parse_args()
+
+    baseline = dict(flatten(json.loads(args.baseline.read_text())["scenarios"]))
+    current = dict(flatten(json.loads(args.current.read_text())["scenarios"]))
+
+    regressions = 0
+    width = max(map(len, current), default=0)
+    print(f"{'':<{width}}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, value in current.items():
+        if name not in baseline:
+            continue
+        old_value = baseline[name]
+        change = (value - old_value) / old_value if old_value else 0.0
+        flag = ""
+        if is_regression(name, change, args.threshold):
+            regressions += 1
+            flag = "  <- worse"
+        print(f"{name:<{width}}{old_value:>14.3f}{value:>14.3f}{change:>+10.1%}{flag}")
+
+    if regressions:
+        print(f"\n{regressions} result(s) got worse by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
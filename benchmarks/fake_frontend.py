@@ -0,0 +1,212 @@
+"""In-process stand-ins for the Jupyter comm and the JavaScript client
+
+These allow a :class:`~reactpy_jupyter.layout_widget.LayoutWidget` to be driven
+without a kernel or a browser.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+from typing import Any, Callable, Iterator
+
+import comm
+from comm.base_comm import BaseComm
+
+from reactpy_jupyter.updates import apply_update
+from reactpy_jupyter.wire_format import decode_message, message_size
+
+_VIEW_IDS = count()
+
+
+class FakeComm(BaseComm):
+    """A comm which hands the messages it publishes to in-process listeners"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.listeners: list[Callable[[dict[str, Any], list[Any]], None]] = []
+        super().__init__(*args, **kwargs)
+
+    def publish_msg(
+        self,
+        msg_type: str,
+        data: Any = None,
+        metadata: Any = None,
+        buffers: Any = None,
+        **keys: Any,
+    ) -> None:
+        if msg_type != "comm_msg" or data.get("method") != "custom":
+            return None
+        for listener in list(self.listeners):
+            listener(data["content"], buffers or [])
+
+    def receive(
+        self, content: dict[str, Any], buffers: list[Any] | None = None
+    ) -> None:
+        """Deliver a custom message to the widget as if sent from a view"""
+        self.handle_msg(
+            {
+                "content": {
+                    "comm_id": self.comm_id,
+                    "data": {"method": "custom", "content": content},
+                },
+                "buffers": buffers or [],
+            }
+        )
+
+
+@contextmanager
+def fake_comms() -> Iterator[None]:
+    """Create all widget comms as :class:`FakeComm` objects within this context"""
+    create_comm = comm.create_comm
+    comm.create_comm = FakeComm
+    try:
+        yield None
+    finally:
+        comm.create_comm = create_comm
+
+
+class FakeClient:
+    """Acts like one view of a widget in the browser
+
+    Updates are applied to a copy of the model and acknowledged as soon as they
+    arrive. Each received message is recorded with its size and arrival time.
+    """
+
+    def __init__(self, widget_comm: FakeComm) -> None:
+        self.view_id = next(_VIEW_IDS)
+        self.model: Any = {}
+        self.version: int | None = None
+        self.inner_widgets: set[str] = set()
+        self.buffers: dict[str, Any] = {}
+        """The binary values this view was sent, by digest"""
+        self.received: list[tuple[float, int]] = []
+        """The time each message addressed to this view arrived and its size"""
+        self._comm = widget_comm
+        self._changed = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        widget_comm.listeners.append(self._handle_message)
+        self._send({"type": "client-ready", "version": None})
+
+    def send_event(self, target: str, event: dict[str, Any]) -> None:
+        self._send({"type": "dom-event", "data": {"target": target, "data": [event]}})
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float = 30) -> None:
+        with self._changed:
+            if not self._changed.wait_for(predicate, timeout):
+                raise TimeoutError(f"View {self.view_id} did not receive an update")
+
+    def wait_for_version(self, version: int, timeout: float = 30) -> None:
+        self.wait_for(lambda: (self.version or 0) >= version, timeout)
+
+    async def wait_for_async(
+        self, predicate: Callable[[], bool], timeout: float = 30
+    ) -> None:
+        """Like :meth:`wait_for` but lets the running event loop work meanwhile"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            changed = loop.create_future()
+            with self._changed:
+                if predicate():
+                    return None
+                self._async_waiters.append((loop, changed))
+            try:
+                await asyncio.wait_for(changed, deadline - loop.time())
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"View {self.view_id} did not receive an update")
+
+    async def wait_for_version_async(self, version: int, timeout: float = 30) -> None:
+        await self.wait_for_async(lambda: (self.version or 0) >= version, timeout)
+
+    def find_element(self, event_name: str) -> dict[str, Any]:
+        """Find the first element in the model with a handler for the given event"""
+        element = _find_element(self.model, event_name)
+        if element is None:
+            raise LookupError(f"No {event_name!r} handler in the model")
+        return element
+
+    def find_target(self, event_name: str) -> str:
+        """Find the target of the first handler for the given event in the model"""
+        return self.find_element(event_name)["eventHandlers"][event_name]["target"]
+
+    def reconnect(self, version: int | None = None) -> None:
+        """Disconnect then connect again, as a reloaded page does
+
+        The view claims to have the given version, or the one it has by default.
+        """
+        self._send({"type": "client-removed"})
+        if version is None:
+            version = self.version
+        self._send({"type": "client-ready", "version": version})
+
+    def close(self) -> None:
+        self._comm.listeners.remove(self._handle_message)
+        self._send({"type": "client-removed"})
+
+    def _send(self, content: dict[str, Any]) -> None:
+        self._comm.receive({"viewID": self.view_id, **content})
+
+    def _handle_message(self, content: dict[str, Any], buffers: list[Any]) -> None:
+        if self.view_id not in content["viewIDs"]:
+            return None
+        arrived = time.perf_counter()
+        size = message_size(content, buffers)
+        message = decode_message(content, buffers)
+        with self._changed:
+            self.received.append((arrived, size))
+            offset = 1 if content.get("encoding") else 0
+            for index, digest in enumerate(content.get("bufferIDs", []), offset):
+                self.buffers[digest] = buffers[index]
+            dropped = content.get("droppedBuffers", {}).get(str(self.view_id), [])
+            for digest in dropped:
+                del self.buffers[digest]
+            if message["type"] == "inner-widgets":
+                self.inner_widgets.update(message.get("added", []))
+                self.inner_widgets.difference_update(message.get("removed", []))
+            else:
+                if message["type"] == "layout-update-batch":
+                    updates = message["updates"]
+                else:
+                    updates = [message]
+                for update in updates:
+                    self.model = apply_update(self.model, update)
+                self.version = message["version"]
+            self._changed.notify_all()
+            async_waiters, self._async_waiters = self._async_waiters, []
+        for loop, changed in async_waiters:
+            _call_soon_in(loop, _set_result, changed)
+        if message["type"] != "inner-widgets":
+            self._send({"type": "ack", "version": message["version"]})
+
+
+def _find_element(model: Any, event_name: str) -> dict[str, Any] | None:
+    if not isinstance(model, dict):
+        return None
+    if event_name in model.get("eventHandlers", {}):
+        return model
+    for child in model.get("children", []):
+        element = _find_element(child, event_name)
+        if element is not None:
+            return element
+    return None
+
+
+def _call_soon_in(
+    loop: asyncio.AbstractEventLoop, function: Callable[..., Any], *args: Any
+) -> None:
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        loop.call_soon(function, *args)
+    else:
+        loop.call_soon_threadsafe(function, *args)
+
+
+def _set_result(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,93 @@
+"""Measure how long ``import reactpy_jupyter`` takes and what it imports
+
+Usage: ``python benchmarks/import_time.py [--repeat N] [--output PATH]``
+
+Each import happens in a fresh interpreter started with ``python -X importtime``.
+Results are printed as JSON (or written to the given path) and may be compared with
+``benchmarks/compare.py``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+
+# modules which are slow to import and only needed once widgets are used
+HEAVY_MODULES = (
+    "anywidget",
+    "ipywidgets",
+    "jupyter_server",
+    "notebook",
+    "reactpy",
+    "requests",
+)
+
+_REPORT_MODULES = f"""
+import json, sys
+print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))
+"""
+
+
+def import_once(module: str) -> tuple[float, list[str]]:
+    """Import the module in a new interpreter
+
+    Returns the cumulative import time in seconds and which heavy modules it loaded.
+    """
+    # the source directory takes precedence over any installed copy
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}{_REPORT_MODULES}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    return cumulative_us / 1e6, json.loads(result.stdout)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    args = parser.parse_args()
+
+    times = []
+    heavy_modules: list[str] = []
+    for _ in range(args.repeat):
+        elapsed, heavy_modules = import_once("reactpy_jupyter")
+        times.append(elapsed)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "heavy_modules_imported": heavy_modules,
+        },
+        "scenarios": {
+            "import": {
+                "median_ms": median(times) * 1000,
+                "min_ms": min(times) * 1000,
+            }
+        },
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""Measure the cost of rendering LayoutWidgets and exchanging messages with their views
+
+Usage: ``python benchmarks/layout_widget.py [--scenario NAME ...] [--output PATH]``
+
+Widgets are driven by in-process stand-ins for the comm and the browser so neither a
+kernel nor a browser is needed. Results are printed as JSON (or written to the given
+path) and may be compared with ``benchmarks/compare.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import gc
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Callable
+
+import ipywidgets
+from fake_frontend import FakeClient, fake_comms
+from reactpy import component, html, use_state
+from reactpy.core.types import ComponentType, VdomChild
+
+from reactpy_jupyter import config, from_widget
+from reactpy_jupyter.layout_widget import LayoutWidget, set_import_source_base_url
+
+SCENARIOS: dict[str, Callable[[Any], dict[str, Any]]] = {}
+
+
+def scenario(function: Callable[[Any], dict[str, Any]]) -> Callable[..., Any]:
+    SCENARIOS[function.__name__] = function
+    return function
+
+
+def counter_app(body: Callable[[int], VdomChild]) -> ComponentType:
+    """An app whose body is rendered again each time its button is clicked"""
+
+    @component
+    def App():
+        count, set_count = use_state(0)
+        return html.div(
+            html.button(
+                {"on_click": lambda event: set_count(lambda c: c + 1)}, str(count)
+            ),
+            body(count),
+        )
+
+    return App()
+
+
+@component
+def Nested(depth: int, count: int):
+    if not depth:
+        return html.span(str(count))
+    return html.div(Nested(depth - 1, count))
+
+
+@scenario
+def deep(args: Any) -> dict[str, Any]:
+    """Components nested many levels deep"""
+    return measure_clicks(
+        lambda: counter_app(lambda count: Nested(args.depth, count)), args.events
+    )
+
+
+@scenario
+def wide(args: Any) -> dict[str, Any]:
+    """A long list of elements"""
+    return measure_clicks(
+        lambda: counter_app(
+            lambda count: html.ul(
+                [html.li({"key": str(i)}, f"{i}: {count}") for i in range(args.width)]
+            )
+        ),
+        args.events,
+    )
+
+
+@scenario
+def inner_widgets(args: Any) -> dict[str, Any]:
+    """Many ipywidgets embedded with from_widget"""
+    sliders = [ipywidgets.IntSlider() for _ in range(args.inner_widgets)]
+    try:
+        return measure_clicks(
+            lambda: counter_app(
+                lambda count: html.div(
+                    [from_widget(s, key=s.model_id) for s in sliders]
+                )
+            ),
+            args.events,
+        )
+    finally:
+        for slider in sliders:
+            slider.close()
+
+
+@scenario
+def high_frequency_events(args: Any) -> dict[str, Any]:
+    """Mouse moves sent as fast as possible"""
+
+    @component
+    def Tracker():
+        position, set_position = use_state(0)
+        return html.div(
+            {"on_mouse_move": lambda event: set_position(event["clientX"])},
+            str(position),
+        )
+
+    widget = LayoutWidget(Tracker())
+    client = FakeClient(widget.comm)
+    try:
+        client.wait_for_version(1)
+        target = client.find_target("on_mouse_move")
+        start_version = client.version
+        start = time.perf_counter()
+        for x in range(1, args.events + 1):
+            client.send_event(target, {"type": "mousemove", "clientX": x})
+        last = str(args.events)
+        client.wait_for(
+            lambda: client.find_element("on_mouse_move")["children"] == [last]
+        )
+        elapsed = time.perf_counter() - start
+        event_stats = widget.event_stats()
+        return {
+            "events_per_second": args.events / elapsed,
+            "renders": client.version - start_version,
+            "delivered_events": event_stats["delivered"],
+            "coalesced_events": event_stats["coalesced"],
+            "dropped_events": event_stats["dropped"],
+        }
+    finally:
+        client.close()
+        widget.close()
+
+
+@scenario
+def scale(args: Any) -> dict[str, Any]:
+    """Memory, threads and startup time with many live widgets"""
+    results = {}
+    for count in args.widgets:
+        gc.collect()
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        widgets = [LayoutWidget(counter_app(lambda _: None)) for _ in range(count)]
+        clients = [FakeClient(w.comm) for w in widgets]
+        for client in clients:
+            client.wait_for_version(1)
+        elapsed = time.perf_counter() - start
+        results[str(count)] = {
+            "startup_ms_per_widget": elapsed * 1000 / count,
+            "rss_bytes_per_widget": (rss_bytes() - rss_before) / count,
+            "threads": threading.active_count(),
+        }
+        for client, widget in zip(clients, widgets):
+            client.close()
+            widget.close()
+    return results
+
+
+@scenario
+def render_loop(args: Any) -> dict[str, Any]:
+    """Click latency rendering in a thread versus on the loop events arrive from
+
+    Views are driven from an event loop in the main thread, as a kernel would be, so
+    in the "kernel" mode no message has to cross between threads.
+    """
+    results = {}
+    previous_mode = config.REACTPY_JUPYTER_RENDER_LOOP.current
+    try:
+        for mode in ("thread", "kernel"):
+            config.REACTPY_JUPYTER_RENDER_LOOP.current = mode
+            results[mode] = asyncio.run(
+                measure_clicks_async(
+                    lambda: counter_app(lambda count: Nested(args.depth, count)),
+                    args.events,
+                )
+            )
+    finally:
+        config.REACTPY_JUPYTER_RENDER_LOOP.current = previous_mode
+    return results
+
+
+@scenario
+def binary_props(args: Any) -> dict[str, Any]:
+    """Re-rendering an element with a large binary prop sent as base64 or as a buffer
+
+    The prop does not change between renders so, as a buffer, it's only sent once.
+    """
+    data = bytes(range(256)) * (args.binary_size // 256)
+    encoded = base64.b64encode(data).decode()
+    return {
+        "base64": measure_clicks(
+            lambda: counter_app(lambda count: html.div({"data": encoded}, count)),
+            args.events,
+        ),
+        "buffer": measure_clicks(
+            lambda: counter_app(lambda count: html.div({"data": data}, count)),
+            args.events,
+        ),
+    }
+
+
+@component
+def Busy(milliseconds: float, count: int):
+    """Spends the given time rendering in pure Python, as CPU bound components do"""
+    end = time.perf_counter() + milliseconds / 1000
+    while time.perf_counter() < end:
+        pass
+    return html.span(str(count))
+
+
+@scenario
+def render_processes(args: Any) -> dict[str, Any]:
+    """How responsive the kernel stays while widgets render in it or in workers
+
+    A ticker on the event loop views are driven from stands in for the kernel. How late
+    its ticks are measures the time it's kept from running while clicks are rendered.
+    """
+    results = {}
+    previous_processes = config.REACTPY_JUPYTER_RENDER_PROCESSES.current
+    try:
+        for processes in (0, 2):
+            config.REACTPY_JUPYTER_RENDER_PROCESSES.current = processes
+            mode = f"{processes}_processes" if processes else "in_kernel"
+            results[mode] = asyncio.run(
+                measure_responsiveness(
+                    lambda: counter_app(lambda count: Busy(args.render_ms, count)),
+                    args.events,
+                )
+            )
+    finally:
+        config.REACTPY_JUPYTER_RENDER_PROCESSES.current = previous_processes
+    return results
+
+
+@scenario
+def headless(args: Any) -> dict[str, Any]:
+    """The cost of showing widgets live and of rendering them up front in headless mode"""
+    results = {}
+    previous_headless = config.REACTPY_JUPYTER_HEADLESS.current
+    try:
+        for mode in ("false", "true"):
+            config.REACTPY_JUPYTER_HEADLESS.current = mode
+            rss_before = rss_bytes()
+            threads_before = threading.active_count()
+            start = time.perf_counter()
+            widgets = []
+            for _ in range(args.events):
+                widget = LayoutWidget(counter_app(lambda count: Nested(10, count)))
+                widget._reactpy_rendered.wait()
+                widgets.append(widget)
+            elapsed = time.perf_counter() - start
+            results["live" if mode == "false" else "headless"] = {
+                "ms_per_widget": elapsed * 1000 / args.events,
+                "rss_bytes_per_widget": (rss_bytes() - rss_before) / args.events,
+                "threads_started": threading.active_count() - threads_before,
+            }
+            for widget in widgets:
+                widget.close()
+            gc.collect()
+    finally:
+        config.REACTPY_JUPYTER_HEADLESS.current = previous_headless
+    return results
+
+
+async def measure_responsiveness(
+    make_app: Callable[[], ComponentType], events: int, tick: float = 0.001
+) -> dict[str, Any]:
+    """Click the app's button while measuring how late ticks of the event loop are"""
+    widget = LayoutWidget(make_app())
+    client = FakeClient(widget.comm)
+    lateness: list[float] = []
+
+    async def ticker() -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lateness.append(time.perf_counter() - start - tick)
+
+    try:
+        await client.wait_for_version_async(1)
+        target = client.find_target("on_click")
+        ticker_task = asyncio.create_task(ticker())
+        # one click at a time so that each is rendered
+        latencies = []
+        for _ in range(events):
+            version = client.version
+            start = time.perf_counter()
+            client.send_event(target, {"type": "click"})
+            await client.wait_for_version_async(version + 1)
+            latencies.append(time.perf_counter() - start)
+        ticker_task.cancel()
+        return {
+            "tick_lateness_ms": percentiles([t * 1000 for t in lateness]),
+            "latency_ms": percentiles([t * 1000 for t in latencies]),
+        }
+    finally:
+        client.close()
+        widget.close()
+        await asyncio.sleep(0.01)
+
+
+async def measure_clicks_async(
+    make_app: Callable[[], ComponentType], events: int
+) -> dict[str, Any]:
+    """Like :func:`measure_clicks` but without blocking the running event loop"""
+    widget = LayoutWidget(make_app())
+    client = FakeClient(widget.comm)
+    try:
+        await client.wait_for_version_async(1)
+        target = client.find_target("on_click")
+
+        latencies = []
+        for _ in range(events):
+            version = client.version
+            start = time.perf_counter()
+            client.send_event(target, {"type": "click"})
+            await client.wait_for_version_async(version + 1)
+            latencies.append(time.perf_counter() - start)
+
+        version = client.version
+        start = time.perf_counter()
+        for _ in range(events):
+            client.send_event(target, {"type": "click"})
+        last = str(events * 2)
+        await client.wait_for_async(
+            lambda: client.find_element("on_click")["children"] == [last]
+        )
+        elapsed = time.perf_counter() - start
+
+        return {
+            "latency_ms": percentiles([t * 1000 for t in latencies]),
+            "events_per_second": events / elapsed,
+            "renders_per_second": (client.version - version) / elapsed,
+        }
+    finally:
+        client.close()
+        widget.close()
+        # let a layout on this loop unmount before the loop is closed
+        await asyncio.sleep(0.01)
+
+
+def measure_clicks(
+    make_app: Callable[[], ComponentType], events: int
+) -> dict[str, Any]:
+    """Click the app's button to measure latency, throughput and update sizes"""
+    start = time.perf_counter()
+    widget = LayoutWidget(make_app())
+    client = FakeClient(widget.comm)
+    try:
+        client.wait_for_version(1)
+        startup = time.perf_counter() - start
+        target = client.find_target("on_click")
+
+        # one click at a time to measure latency
+        latencies = []
+        received_before = len(client.received)
+        version_before = client.version
+        for _ in range(events):
+            version = client.version
+            start = time.perf_counter()
+            client.send_event(target, {"type": "click"})
+            client.wait_for_version(version + 1)
+            latencies.append(time.perf_counter() - start)
+        sizes = [size for _, size in client.received[received_before:]]
+        updates = client.version - version_before
+
+        # then all at once to measure throughput
+        version = client.version
+        start = time.perf_counter()
+        for _ in range(events):
+            client.send_event(target, {"type": "click"})
+        last = str(events * 2)
+        client.wait_for(lambda: client.find_element("on_click")["children"] == [last])
+        elapsed = time.perf_counter() - start
+
+        return {
+            "startup_ms": startup * 1000,
+            "latency_ms": percentiles([t * 1000 for t in latencies]),
+            "renders_per_second": (client.version - version) / elapsed,
+            "bytes_per_update": sum(sizes) / updates,
+        }
+    finally:
+        client.close()
+        widget.close()
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    values = sorted(values)
+    summary = {
+        f"p{p}": values[min(len(values) - 1, len(values) * p // 100)]
+        for p in (50, 90, 99)
+    }
+    summary["max"] = values[-1]
+    return summary
+
+
+def rss_bytes() -> int:
+    try:
+        status = Path("/proc/self/status").read_text()
+    except OSError:  # not Linux - fall back to the peak
+        import resource
+
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Run only this scenario (may be given more than once)",
+    )
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=100)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--inner-widgets", type=int, default=100)
+    parser.add_argument(
+        "--binary-size",
+        type=int,
+        default=1024 * 1024,
+        help="Bytes in the prop of the binary_props scenario",
+    )
+    parser.add_argument(
+        "--render-ms",
+        type=float,
+        default=2.0,
+        help="Time each render takes in the render_processes scenario",
+    )
+    parser.add_argument(
+        "--widgets",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=[1, 100, 1000],
+        help="Comma separated numbers of live widgets for the scale scenario",
+    )
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "render_threads": config.REACTPY_JUPYTER_RENDER_THREADS.current,
+            "render_loop": config.REACTPY_JUPYTER_RENDER_LOOP.current,
+            "render_processes": config.REACTPY_JUPYTER_RENDER_PROCESSES.current,
+            "wire_format": config.REACTPY_JUPYTER_WIRE_FORMAT.current,
+            "update_batch_window": config.REACTPY_JUPYTER_UPDATE_BATCH_WINDOW.current,
+        },
+        "scenarios": {},
+    }
+    # skip the one-off discovery of a server for import sources
+    set_import_source_base_url("http://127.0.0.1/")
+    with fake_comms():
+        for name in args.scenario or SCENARIOS:
+            results["scenarios"][name] = SCENARIOS[name](args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Compare the fallback static file server against a plain ``http.server``
+
+Usage: ``python benchmarks/static_server.py [--clients N] [--files N] [--rounds N]``
+
+Each client fetches every file once per round over its own connection, sending the
+``ETag`` it got for a file when fetching it again as a browser would. Results are
+printed as JSON and may be compared with ``benchmarks/compare.py``.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from typing import Any, Callable
+
+from reactpy_jupyter.static_server import StaticFileServer
+
+
+def make_modules(directory: Path, count: int, size: int) -> list[str]:
+    """Write JavaScript modules of roughly the given size"""
+    names = []
+    for i in range(count):
+        name = f"module-{i}.js"
+        line = f"export const value{i} = {list(range(20))};\n"
+        (directory / name).write_text(line * (size // len(line) + 1))
+        names.append(name)
+    return names
+
+
+def start_simple_server(directory: Path) -> tuple[str, Callable[[], None]]:
+    """The server that was used before - single threaded with no caching headers"""
+
+    def make_handler(*args: Any, **kwargs: Any) -> SimpleHTTPRequestHandler:
+        return _QuietHandler(*args, directory=str(directory), **kwargs)
+
+    server = HTTPServer(("127.0.0.1", 0), make_handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/", server.shutdown
+
+
+def start_static_file_server(directory: Path) -> tuple[str, Callable[[], None]]:
+    server = StaticFileServer(directory)
+    return server.start(), server.stop
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def run_client(url: str, names: list[str], rounds: int) -> tuple[list[float], int]:
+    """Fetch every file each round, revalidating with ETags when there are any"""
+    host, port = url.split("//", 1)[1].rstrip("/").split(":")
+    connection = http.client.HTTPConnection(host, int(port), timeout=30)
+    etags: dict[str, str] = {}
+    latencies = []
+    received = 0
+    for _ in range(rounds):
+        for name in names:
+            headers = {"Accept-Encoding": "br, gzip"}
+            if name in etags:
+                headers["If-None-Match"] = etags[name]
+            start = time.perf_counter()
+            connection.request("GET", f"/{name}", headers=headers)
+            response = connection.getresponse()
+            received += len(response.read())
+            latencies.append(time.perf_counter() - start)
+            etag = response.getheader("ETag")
+            if etag:
+                etags[name] = etag
+    connection.close()
+    return latencies, received
+
+
+def measure(url: str, names: list[str], clients: int, rounds: int) -> dict[str, Any]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(
+            executor.map(lambda _: run_client(url, names, rounds), range(clients))
+        )
+    elapsed = time.perf_counter() - start
+    latencies = sorted(t for client_latencies, _ in results for t in client_latencies)
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms": {
+            f"p{p}": latencies[min(len(latencies) - 1, len(latencies) * p // 100)]
+            * 1000
+            for p in (50, 90, 99)
+        },
+        "bytes_received": sum(received for _, received in results),
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--file-size", type=int, default=64 * 1024)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {
+        "meta": {
+            "clients": args.clients,
+            "files": args.files,
+            "file_size": args.file_size,
+            "rounds": args.rounds,
+            "cpus": os.cpu_count(),
+        },
+        "scenarios": {},
+    }
+    servers = {
+        "simple_http_server": start_simple_server,
+        "static_file_server": start_static_file_server,
+    }
+    with TemporaryDirectory() as directory:
+        names = make_modules(Path(directory), args.files, args.file_size)
+        for name, start_server in servers.items():
+            url, stop = start_server(Path(directory))
+            try:
+                results["scenarios"][name] = measure(
+                    url, names, args.clients, args.rounds
+                )
+            finally:
+                stop()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
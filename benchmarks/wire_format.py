@@ -0,0 +1,83 @@
+"""Compare the size and speed of the wire formats used to send layout updates
+
+Usage: ``python benchmarks/wire_format.py [--rows N] [--repeat N]``
+
+Results are printed as JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from argparse import ArgumentParser
+from typing import Any, Callable
+
+from reactpy_jupyter.wire_format import decode_message, encode_message
+
+
+def make_table_update(rows: int, columns: int = 8) -> dict[str, Any]:
+    """A layout update like one produced by rendering a large table"""
+    return {
+        "type": "layout-update",
+        "path": "",
+        "model": {
+            "tagName": "table",
+            "children": [
+                {
+                    "tagName": "tr",
+                    "key": str(r),
+                    "children": [
+                        {
+                            "tagName": "td",
+                            "attributes": {"style": {"textAlign": "right"}},
+                            "children": [f"{r * columns + c:.3f}"],
+                        }
+                        for c in range(columns)
+                    ],
+                }
+                for r in range(rows)
+            ],
+        },
+    }
+
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    update = make_table_update(args.rows)
+    results: dict[str, Any] = {"rows": args.rows}
+
+    # the comm serializes JSON content itself so include that in the JSON timings
+    payload = json.dumps(update)
+    results["json"] = {
+        "bytes": len(payload.encode()),
+        "encode_seconds": measure(lambda: json.dumps(update), args.repeat),
+        "decode_seconds": measure(lambda: json.loads(payload), args.repeat),
+    }
+
+    content, buffers = encode_message(update, "msgpack")
+    results[content["encoding"]] = {
+        "bytes": sum(len(b) for b in buffers),
+        "encode_seconds": measure(
+            lambda: encode_message(update, "msgpack"), args.repeat
+        ),
+        "decode_seconds": measure(
+            lambda: decode_message(content, buffers), args.repeat
+        ),
+    }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -25,11 +25,18 @@ def check_python(session: Session) -> None:
         "flake8",
         "isort",
     )
-    session.run("flake8", "reactpy_jupyter", "setup.py", "noxfile.py")
+    session.run("flake8", "reactpy_jupyter", "tests", "setup.py", "noxfile.py")
     session.run("black", "--check", ".")
     session.run("isort", "--check-only", ".")
 
 
+@group.session
+def test_python(session: Session) -> None:
+    session.install("-e", ".[msgpack]")
+    session.install("pytest")
+    session.run("pytest", *session.posargs)
+
+
 @group.session(python=False)
 def check_javascript(session: Session) -> None:
     session.run("npm", "ci", external=True)
@@ -4,11 +4,19 @@
 # Copyright (c) Ryan Morshead.
 # Distributed under the terms of the Modified BSD License.
 
-from . import jupyter_server_extension
-from .import_resources import setup_import_resources
-from .layout_widget import run, set_import_source_base_url, to_widget
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
 from .monkey_patch import execute_patch
-from .widget_component import from_widget
+
+if TYPE_CHECKING:
+    from . import jupyter_server_extension
+    from .layout_widget import run, set_import_source_base_url, to_widget
+    from .magics import load_ipython_extension, unload_ipython_extension
+    from .web_modules import collect_web_modules
+    from .widget_component import from_widget
 
 __version__ = "0.9.5"  # DO NOT MODIFY
 
@@ -19,9 +27,35 @@ __all__ = (
     "to_widget",
     "run",
     "set_import_source_base_url",
+    "collect_web_modules",
     "jupyter_server_extension",
 )
 
+# This package is imported by a .pth file whenever Python starts so the modules which
+# provide its API, and which import Jupyter and ReactPy, are only loaded when used.
+_LAZY_ATTRIBUTES = {
+    "from_widget": "widget_component",
+    "load_ipython_extension": "magics",
+    "unload_ipython_extension": "magics",
+    "to_widget": "layout_widget",
+    "run": "layout_widget",
+    "set_import_source_base_url": "layout_widget",
+    "collect_web_modules": "web_modules",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name == "jupyter_server_extension":
+        return import_module(f"{__name__}.{name}")
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f"{__name__}.{_LAZY_ATTRIBUTES[name]}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
+
 
-setup_import_resources()
 execute_patch()
@@ -0,0 +1,151 @@
+"""Send binary values in layout models to views as comm buffers instead of as JSON
+
+Values which support the buffer protocol - ``bytes``, ``bytearray``, ``memoryview`` and
+arrays such as NumPy's - are replaced in messages by a placeholder like::
+
+    {"__reactpy_buffer__": "<digest>", "dtype": "float64", "shape": [2, 3]}
+
+while their data is sent, without being copied where possible, in the buffers of the
+message. Views turn placeholders back into typed arrays and keep the data they're sent
+so that values which haven't changed need not be sent again.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Iterable
+
+BUFFER_KEY = "__reactpy_buffer__"
+
+# types which are known not to support the buffer protocol
+_PLAIN_TYPES = frozenset([str, int, float, bool, type(None), dict, list, tuple])
+# struct format characters of the types JavaScript has typed arrays for
+_INT_FORMATS = frozenset("bhilq")
+_UINT_FORMATS = frozenset("BHILQ")
+_FLOAT_FORMATS = frozenset("fd")
+
+
+def is_buffer(value: Any) -> bool:
+    """Whether the value supports the buffer protocol"""
+    if type(value) in _PLAIN_TYPES:
+        return False
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return True
+    try:
+        memoryview(value)
+    except TypeError:
+        return False
+    return True
+
+
+def contains_buffers(model: Any) -> bool:
+    """Whether the attributes or children of any element in a model hold a buffer"""
+    # This runs on every update so only what could hold props is searched.
+    stack = [model]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type is dict:
+            if "tagName" in value:
+                stack.extend(value.get("attributes", {}).values())
+                stack.extend(value.get("children", ()))
+            else:
+                stack.extend(value.values())
+        elif value_type is list:
+            stack.extend(value)
+        elif value_type not in _PLAIN_TYPES and is_buffer(value):
+            return True
+    return False
+
+
+def extract_buffers(
+    data: Any, inline: bool = False
+) -> tuple[Any, dict[str, memoryview]]:
+    """Replace buffers within the data by placeholders
+
+    Returns the data, copied only where it contained buffers, and the bytes of each
+    buffer by its digest. With ``inline`` the bytes are also kept in the placeholders,
+    under ``"data"``, as widget state expects.
+    """
+    found: dict[str, memoryview] = {}
+    return _extract_buffers(data, found, inline), found
+
+
+def _extract_buffers(data: Any, found: dict[str, memoryview], inline: bool) -> Any:
+    if isinstance(data, dict):
+        items: Iterable[tuple[Any, Any]] = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    elif is_buffer(data):
+        return _placeholder(data, found, inline)
+    else:
+        return data
+    copy = None
+    for key, value in items:
+        new_value = _extract_buffers(value, found, inline)
+        if new_value is not value:
+            if copy is None:
+                copy = data.copy()
+            copy[key] = new_value
+    return data if copy is None else copy
+
+
+def _placeholder(value: Any, found: dict[str, memoryview], inline: bool) -> Any:
+    view = memoryview(value)
+    fmt = view.format.lstrip("@=<")
+    shape = list(view.shape or ())
+    if fmt in _INT_FORMATS:
+        dtype = f"int{view.itemsize * 8}"
+    elif fmt in _UINT_FORMATS:
+        dtype = f"uint{view.itemsize * 8}"
+    elif fmt in _FLOAT_FORMATS:
+        dtype = f"float{view.itemsize * 8}"
+    else:
+        # other types (and byte orders) are sent as raw bytes
+        dtype, shape = "uint8", [view.nbytes]
+    try:
+        data = view.cast("B")
+    except TypeError:
+        # not contiguous or not a native format - only then is a copy made
+        data = memoryview(view.tobytes())
+    digest = blake2b(data, digest_size=16).hexdigest()
+    found[digest] = data
+    placeholder: dict[str, Any] = {BUFFER_KEY: digest, "dtype": dtype, "shape": shape}
+    if inline:
+        placeholder["data"] = data
+    return placeholder
+
+
+class SentBuffers:
+    """The buffers a view has been sent and keeps, least recently used first
+
+    Once they take up more than ``maxsize`` bytes, the least recently used are
+    forgotten, and the view must be told to do the same.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+
+    def use(self, buffers: dict[str, memoryview]) -> tuple[list[str], list[str]]:
+        """Record that a message refers to the given buffers
+
+        Returns the digests of those the view does not have and must be sent, and of
+        those the view should forget to stay within the size limit.
+        """
+        missing = []
+        for digest, data in buffers.items():
+            if digest in self._sizes:
+                self._sizes.move_to_end(digest)
+            else:
+                missing.append(digest)
+                self._sizes[digest] = data.nbytes
+                self._total += data.nbytes
+        evicted = []
+        while self._total > self.maxsize and len(self._sizes) > len(buffers):
+            digest, size = self._sizes.popitem(last=False)
+            self._total -= size
+            evicted.append(digest)
+        return missing, evicted
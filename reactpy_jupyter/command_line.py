@@ -0,0 +1,46 @@
+"""Tell which program a process runs from its command line
+
+This is used as Python starts, by way of the ``.pth`` file, so must import nothing
+but the standard library.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+# options of the Python interpreter which take a value
+_PYTHON_OPTIONS_WITH_VALUES = ("-W", "-X", "--check-hash-based-pycs")
+
+
+def program_name(command_line: Sequence[str]) -> str | None:
+    """The name of the program, or of the script or module it runs if it's Python
+
+    The other arguments, like paths to notebooks, say nothing of what the program is.
+    """
+    if not command_line:
+        return None
+    name = _file_program_name(command_line[0])
+    if not name.startswith("python"):
+        return name
+    args = iter(command_line[1:])
+    for arg in args:
+        if arg == "-c":
+            return None
+        if arg == "-m":
+            return next(args, "").split(".", 1)[0]
+        if arg.startswith("-m"):
+            return arg[2:].split(".", 1)[0]
+        if arg in _PYTHON_OPTIONS_WITH_VALUES:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return _file_program_name(arg)
+    return None
+
+
+def _file_program_name(path: str) -> str:
+    # the process may be on Windows
+    name = path.replace("\\", "/").rsplit("/", 1)[-1]
+    for suffix in (".exe", "-script.py", ".py"):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
@@ -0,0 +1,276 @@
+"""Options for configuring ReactPy Jupyter
+
+Each option may be set with an environment variable of the same name or, at runtime,
+by assigning to its ``current`` attribute.
+"""
+
+from __future__ import annotations
+
+from reactpy._option import Option
+from reactpy.config import boolean
+
+try:
+    import msgpack
+except ImportError:  # nocov
+    msgpack = None
+
+
+def _positive_int(value: str | int) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"Expected a positive integer, not {value!r}")
+    return number
+
+
+def _non_negative_int(value: str | int) -> int:
+    number = int(value)
+    if number < 0:
+        raise ValueError(f"Expected a non-negative integer, not {value!r}")
+    return number
+
+
+def _non_negative_float(value: str | float) -> float:
+    number = float(value)
+    if number < 0:
+        raise ValueError(f"Expected a non-negative number, not {value!r}")
+    return number
+
+
+def _render_loop(value: str) -> str:
+    if value not in ("thread", "kernel"):
+        raise ValueError(f"Expected 'thread' or 'kernel', not {value!r}")
+    return value
+
+
+def _headless(value: str | bool) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value not in ("auto", "true", "false"):
+        raise ValueError(f"Expected 'auto', 'true' or 'false', not {value!r}")
+    return value
+
+
+def _wire_format(value: str) -> str:
+    if value not in ("json", "msgpack"):
+        raise ValueError(f"Expected 'json' or 'msgpack', not {value!r}")
+    if value == "msgpack" and msgpack is None:
+        raise ValueError("The 'msgpack' wire format requires msgpack to be installed")
+    return value
+
+
+REACTPY_JUPYTER_RENDER_THREADS = Option(
+    "REACTPY_JUPYTER_RENDER_THREADS",
+    default=1,
+    validator=_positive_int,
+)
+"""The number of threads whose event loops are shared to render all widget layouts"""
+
+
+REACTPY_JUPYTER_RENDER_LOOP = Option(
+    "REACTPY_JUPYTER_RENDER_LOOP",
+    default="thread",
+    validator=_render_loop,
+)
+"""Where widgets render - in 'thread's of their own or on the 'kernel' event loop
+
+Widgets created where no event loop is running, as is the case outside of a kernel,
+always render in threads. On the kernel's loop, widgets avoid handing each event and
+update between threads but cannot render while a cell is running.
+"""
+
+
+REACTPY_JUPYTER_UPDATE_BATCH_WINDOW = Option(
+    "REACTPY_JUPYTER_UPDATE_BATCH_WINDOW",
+    default=0.0,
+    validator=_non_negative_float,
+)
+"""Seconds to collect layout updates before sending them as one batch (0 disables)"""
+
+
+REACTPY_JUPYTER_WIRE_FORMAT = Option(
+    "REACTPY_JUPYTER_WIRE_FORMAT",
+    default="json",
+    validator=_wire_format,
+)
+"""How messages between widgets and their views are encoded - 'json' or 'msgpack'"""
+
+
+REACTPY_JUPYTER_COMPRESSION_THRESHOLD = Option(
+    "REACTPY_JUPYTER_COMPRESSION_THRESHOLD",
+    default=32 * 1024,
+    validator=int,
+)
+"""Size in bytes above which binary encoded messages are compressed with zlib"""
+
+
+REACTPY_JUPYTER_UPDATE_HISTORY_SIZE = Option(
+    "REACTPY_JUPYTER_UPDATE_HISTORY_SIZE",
+    default=64,
+    validator=_non_negative_int,
+)
+"""How many recent updates are kept so reconnecting views can catch up incrementally"""
+
+
+REACTPY_JUPYTER_EVENT_QUEUE_SIZE = Option(
+    "REACTPY_JUPYTER_EVENT_QUEUE_SIZE",
+    default=256,
+    validator=_positive_int,
+)
+"""How many events may wait to be delivered to a widget before some are dropped
+
+Only events which are coalesced or rate limited, like mouse moves, are dropped - the
+oldest first. Discrete events, like clicks, never are.
+"""
+
+
+REACTPY_JUPYTER_EVENT_CONCURRENCY = Option(
+    "REACTPY_JUPYTER_EVENT_CONCURRENCY",
+    default=4,
+    validator=_positive_int,
+)
+"""How many events may be in the midst of being handled by a widget's layout at once
+
+Further events wait in the widget's queue until one of those is done, so events for a
+slow handler coalesce or are dropped rather than piling up as tasks.
+"""
+
+
+REACTPY_JUPYTER_VIEW_WINDOW = Option(
+    "REACTPY_JUPYTER_VIEW_WINDOW",
+    default=16,
+    validator=_positive_int,
+)
+"""How many versions a view may fall behind before updates to it are held back"""
+
+
+REACTPY_JUPYTER_VIEW_OUTBOX_SIZE = Option(
+    "REACTPY_JUPYTER_VIEW_OUTBOX_SIZE",
+    default=256,
+    validator=_positive_int,
+)
+"""How many updates may be held for a lagging view before it is sent the full model"""
+
+
+REACTPY_JUPYTER_HIBERNATE_AFTER = Option(
+    "REACTPY_JUPYTER_HIBERNATE_AFTER",
+    default=0.0,
+    validator=_non_negative_float,
+)
+"""Seconds without any views after which a widget's layout is unmounted (0 disables)
+
+A hibernating widget renders its component afresh, losing any state, once it is
+displayed again.
+"""
+
+
+REACTPY_JUPYTER_STATS = Option(
+    "REACTPY_JUPYTER_STATS",
+    default=False,
+    validator=boolean,
+)
+"""Whether widgets created from now on record stats about their renders and messages"""
+
+
+REACTPY_JUPYTER_DISCOVERY_TIMEOUT = Option(
+    "REACTPY_JUPYTER_DISCOVERY_TIMEOUT",
+    default=2.0,
+    validator=_non_negative_float,
+)
+"""Seconds to spend looking for a running Jupyter server to serve import sources"""
+
+
+REACTPY_JUPYTER_PRELOAD_MODULES = Option(
+    "REACTPY_JUPYTER_PRELOAD_MODULES",
+    default=True,
+    validator=boolean,
+)
+"""Whether views are told which modules a layout imports so they load them early"""
+
+
+REACTPY_JUPYTER_WEB_MODULES_MAX_SIZE = Option(
+    "REACTPY_JUPYTER_WEB_MODULES_MAX_SIZE",
+    default=256 * 1024 * 1024,
+    validator=_non_negative_int,
+)
+"""Bytes web modules may take up before the least recently used are removed (0 disables)"""
+
+
+REACTPY_JUPYTER_WEB_MODULES_MAX_AGE = Option(
+    "REACTPY_JUPYTER_WEB_MODULES_MAX_AGE",
+    default=30 * 24 * 60 * 60.0,
+    validator=_non_negative_float,
+)
+"""Seconds after their last use that web modules are removed (0 disables)"""
+
+
+REACTPY_JUPYTER_COMPONENT_WIDGETS = Option(
+    "REACTPY_JUPYTER_COMPONENT_WIDGETS",
+    default=64,
+    validator=_positive_int,
+)
+"""How many widgets made to display components are kept before the oldest is closed
+
+Widgets with connected views are never closed, nor are those displayed by the running
+cell until they've been shown, so more may be kept meanwhile. A closed widget's output
+stops updating and, once its page is reloaded, shows only what was saved with the
+notebook.
+"""
+
+
+REACTPY_JUPYTER_RENDER_PROCESSES = Option(
+    "REACTPY_JUPYTER_RENDER_PROCESSES",
+    default=0,
+    validator=_non_negative_int,
+)
+"""Worker processes which render the layouts of widgets (0 renders them in the kernel)"""
+
+
+REACTPY_JUPYTER_VIEW_BUFFERS_SIZE = Option(
+    "REACTPY_JUPYTER_VIEW_BUFFERS_SIZE",
+    default=64 * 1024 * 1024,
+    validator=_non_negative_int,
+)
+"""Bytes of binary values each view keeps so unchanged ones are not sent again"""
+
+
+REACTPY_JUPYTER_HEADLESS = Option(
+    "REACTPY_JUPYTER_HEADLESS",
+    default="auto",
+    validator=_headless,
+)
+"""Whether layouts render up front and show as static HTML - 'auto', 'true' or 'false'
+
+This suits notebooks run in batches, where no browser will ever show widgets. With
+'auto' that's assumed when the kernel was started by papermill, nbconvert or nbclient.
+"""
+
+
+REACTPY_JUPYTER_HEADLESS_MAX_RENDERS = Option(
+    "REACTPY_JUPYTER_HEADLESS_MAX_RENDERS",
+    default=16,
+    validator=_positive_int,
+)
+"""The most times a layout renders in headless mode before it's shown as it is"""
+
+
+REACTPY_JUPYTER_HEADLESS_SETTLE_TIME = Option(
+    "REACTPY_JUPYTER_HEADLESS_SETTLE_TIME",
+    default=0.1,
+    validator=_non_negative_float,
+)
+"""The most seconds a layout waits for a pending render in headless mode"""
+
+
+REACTPY_JUPYTER_HTML_SNAPSHOT = Option(
+    "REACTPY_JUPYTER_HTML_SNAPSHOT",
+    default=False,
+    validator=boolean,
+)
+"""Whether displayed widgets also include static HTML of how they last rendered
+
+The HTML is shown where the widget can't be, as when the notebook is viewed without a
+kernel. Displaying a widget which has yet to render then waits up to a second for it.
+Whatever this is set to, the HTML is always given to displays which can't show widgets
+at all, and in :data:`REACTPY_JUPYTER_HEADLESS` mode to every display - of components,
+of ``run()`` and of widgets made with ``to_widget()``.
+"""
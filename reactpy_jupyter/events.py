@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+
+from attr import dataclass
+from reactpy.core.types import LayoutEventMessage
+
+
+@dataclass
+class EventPolicy:
+    """Rules for limiting the rate at which events of one type are delivered
+
+    Rate limits apply separately to each event handler. Events which are superseded
+    by a later one are counted as coalesced.
+    """
+
+    coalesce: bool = False
+    """Replace a queued event with a newer one for the same handler"""
+    throttle: float = 0
+    """Deliver at most one event every this many seconds, the latest one winning"""
+    debounce: float = 0
+    """Deliver only once no further events have arrived for this many seconds"""
+
+
+DEFAULT_EVENT_POLICIES: dict[str, EventPolicy] = {
+    event_type: EventPolicy(coalesce=True)
+    for event_type in (
+        "drag",
+        "dragover",
+        "mousemove",
+        "pointermove",
+        "resize",
+        "scroll",
+        "touchmove",
+        "wheel",
+    )
+}
+"""The policies each widget starts with, keyed by DOM event type"""
+
+
+class EventQueue:
+    """A bounded queue of events waiting to be delivered to a layout
+
+    Once full, the oldest queued event whose policy coalesces or rate limits it is
+    dropped to make room. Other events are never dropped, so the queue may then exceed
+    its bound. At most ``concurrency`` events are delivered at once. The rest wait in
+    the queue, where those which coalesce are still replaced by newer ones.
+    All methods must be called from within the event loop the queue is used in.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[LayoutEventMessage], Awaitable[None]],
+        maxsize: int,
+        policies: dict[str, EventPolicy],
+        concurrency: int,
+    ) -> None:
+        self.policies = policies
+        self._deliver = deliver
+        self._maxsize = maxsize
+        self._concurrency = concurrency
+        self._pending: deque[tuple[Hashable, LayoutEventMessage, bool]] = deque()
+        self._ready: asyncio.Event | None = None
+        self._throttled: dict[Hashable, _Throttled] = {}
+        self._debounced: dict[Hashable, asyncio.TimerHandle] = {}
+        self._counts = {"received": 0, "delivered": 0, "coalesced": 0, "dropped": 0}
+
+    def counts(self) -> dict[str, int]:
+        """The number of events received, delivered, coalesced and dropped"""
+        return dict(self._counts, queued=len(self._pending))
+
+    def put(self, event: LayoutEventMessage) -> None:
+        self._counts["received"] += 1
+        event_type = _get_event_type(event)
+        policy = self.policies.get(event_type) if event_type else None
+        if policy is None:
+            self._enqueue(None, event, False)
+            return None
+
+        key = (event["target"], event_type)
+        coalesce_key = key if policy.coalesce else None
+        if policy.debounce:
+            self._debounce(key, coalesce_key, event, policy.debounce)
+        elif policy.throttle:
+            self._throttle(key, coalesce_key, event, policy.throttle)
+        else:
+            self._enqueue(coalesce_key, event, policy.coalesce)
+
+    def clear(self) -> None:
+        """Discard any events which are waiting to be delivered"""
+        for handle in self._debounced.values():
+            handle.cancel()
+        for throttled in self._throttled.values():
+            if throttled.handle is not None:
+                throttled.handle.cancel()
+        self._debounced.clear()
+        self._throttled.clear()
+        self._pending.clear()
+
+    async def run(self) -> None:
+        """Hand queued events to the layout in order, each delivered as its own task
+
+        Deliveries are not awaited one after another so that a slow event handler
+        doesn't hold back events for the rest of the layout. Events are left queued
+        while as many deliveries as allowed are in progress. Those still in progress
+        are cancelled when this is.
+        """
+        ready = self._ready = asyncio.Event()
+        deliveries: set[asyncio.Task[None]] = set()
+
+        def delivered(task: asyncio.Task[None]) -> None:
+            deliveries.discard(task)
+            ready.set()
+
+        try:
+            while True:
+                while not self._pending or len(deliveries) >= self._concurrency:
+                    ready.clear()
+                    await ready.wait()
+                _, event, _ = self._pending.popleft()
+                task = asyncio.create_task(self._deliver(event))
+                deliveries.add(task)
+                task.add_done_callback(delivered)
+                self._counts["delivered"] += 1
+        finally:
+            for task in deliveries:
+                task.cancel()
+
+    def _enqueue(
+        self, coalesce_key: Hashable, event: LayoutEventMessage, droppable: bool
+    ) -> None:
+        if coalesce_key is not None and self._pending:
+            if self._pending[-1][0] == coalesce_key:
+                self._pending[-1] = (coalesce_key, event, droppable)
+                self._counts["coalesced"] += 1
+                return None
+        if len(self._pending) >= self._maxsize and not self._drop_oldest(droppable):
+            self._counts["dropped"] += 1
+            return None
+        self._pending.append((coalesce_key, event, droppable))
+        if self._ready is not None:
+            self._ready.set()
+
+    def _drop_oldest(self, droppable: bool) -> bool:
+        # Only events which are rate limited, like mouse moves, are dropped since
+        # later ones supersede them. Discrete events, like clicks, never are. Returns
+        # whether there is room for a new event.
+        for index, (_, _, pending_droppable) in enumerate(self._pending):
+            if pending_droppable:
+                del self._pending[index]
+                self._counts["dropped"] += 1
+                return True
+        return not droppable
+
+    def _debounce(
+        self,
+        key: Hashable,
+        coalesce_key: Hashable,
+        event: LayoutEventMessage,
+        delay: float,
+    ) -> None:
+        handle = self._debounced.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+            self._counts["coalesced"] += 1
+
+        def enqueue() -> None:
+            del self._debounced[key]
+            self._enqueue(coalesce_key, event, True)
+
+        loop = asyncio.get_running_loop()
+        self._debounced[key] = loop.call_later(delay, enqueue)
+
+    def _throttle(
+        self,
+        key: Hashable,
+        coalesce_key: Hashable,
+        event: LayoutEventMessage,
+        interval: float,
+    ) -> None:
+        now = time.monotonic()
+        throttled = self._throttled.get(key)
+        if throttled is None or (
+            throttled.handle is None and now - throttled.last_time >= interval
+        ):
+            self._throttled[key] = _Throttled(now)
+            self._enqueue(coalesce_key, event, True)
+            return None
+
+        if throttled.handle is not None:
+            # a trailing event is already scheduled - replace it with this one
+            throttled.event = event
+            self._counts["coalesced"] += 1
+            return None
+
+        def enqueue_trailing() -> None:
+            self._throttled[key] = _Throttled(time.monotonic())
+            self._enqueue(coalesce_key, throttled.event, True)
+
+        loop = asyncio.get_running_loop()
+        throttled.event = event
+        throttled.handle = loop.call_later(
+            throttled.last_time + interval - now, enqueue_trailing
+        )
+
+
+class _Throttled:
+    __slots__ = "last_time", "handle", "event"
+
+    def __init__(self, last_time: float) -> None:
+        self.last_time = last_time
+        self.handle: asyncio.TimerHandle | None = None
+        self.event: Any = None
+
+
+def _get_event_type(event: LayoutEventMessage) -> str | None:
+    # handlers receive the serialized DOM event(s) - the first names the event type
+    data = event.get("data")
+    if data and isinstance(data[0], dict):
+        return data[0].get("type")
+    return None
@@ -0,0 +1,105 @@
+"""Render layouts up front, and show them as static HTML, when no browser will view them
+
+Notebooks run in batches, as by papermill or ``nbconvert --execute``, have no frontend
+to show widgets or send them events. In headless mode layouts render until they settle
+down and are then shown as the HTML they rendered, without a live layout, render thread
+or server for import sources.
+"""
+
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Collection
+
+from reactpy.core.types import ComponentType
+
+from reactpy_jupyter.command_line import program_name
+from reactpy_jupyter.config import (
+    REACTPY_JUPYTER_HEADLESS,
+    REACTPY_JUPYTER_HEADLESS_MAX_RENDERS,
+    REACTPY_JUPYTER_HEADLESS_SETTLE_TIME,
+)
+from reactpy_jupyter.snapshot import render_model, snapshot_mimebundle
+
+try:
+    import psutil
+except ImportError:  # nocov
+    psutil = None
+
+# the programs and modules of the tools which run notebooks in batches
+BATCH_RUNNERS = frozenset(
+    ["papermill", "nbconvert", "jupyter-nbconvert", "nbclient", "jupyter-execute"]
+)
+
+
+def is_headless() -> bool:
+    """Whether layouts should be rendered up front rather than run as live widgets"""
+    headless = REACTPY_JUPYTER_HEADLESS.current
+    if headless == "auto":
+        return started_by_batch_runner()
+    return headless == "true"
+
+
+@lru_cache(maxsize=None)
+def started_by_batch_runner() -> bool:
+    """Whether the parent of this process is a tool which runs notebooks in batches
+
+    Kernels are started by the process executing the notebook, so this tells whether a
+    kernel has a frontend.
+    """
+    return program_name(_parent_command_line()) in BATCH_RUNNERS
+
+
+def headless_mimebundle(
+    component: ComponentType,
+    include: Collection[str] | None = None,
+    exclude: Collection[str] | None = None,
+) -> dict[str, Any]:
+    """Represent the component by the HTML it renders once it has settled down
+
+    Its model is only included as JSON if explicitly asked for since frontends would
+    otherwise prefer showing it to the HTML.
+    """
+    if not include or "application/json" not in include:
+        exclude = {*(exclude or ()), "application/json"}
+    return snapshot_mimebundle(
+        component,
+        include,
+        exclude,
+        max_renders=REACTPY_JUPYTER_HEADLESS_MAX_RENDERS.current,
+        settle_time=REACTPY_JUPYTER_HEADLESS_SETTLE_TIME.current,
+        shared_thread=False,
+    )
+
+
+def render_headless_model(
+    component: ComponentType,
+) -> tuple[Any, dict[str, Any]] | None:
+    """Render the component until it settles down - see :func:`render_model`
+
+    No render thread is left running once it has.
+    """
+    return render_model(
+        component,
+        max_renders=REACTPY_JUPYTER_HEADLESS_MAX_RENDERS.current,
+        settle_time=REACTPY_JUPYTER_HEADLESS_SETTLE_TIME.current,
+        shared_thread=False,
+    )
+
+
+def _parent_command_line() -> list[str]:
+    try:
+        raw = Path(f"/proc/{os.getppid()}/cmdline").read_bytes()
+    except OSError:
+        # not Linux
+        pass
+    else:
+        return raw.decode(errors="replace").split("\0")
+    if psutil is not None:
+        try:
+            return psutil.Process().parent().cmdline()
+        except (psutil.Error, AttributeError):
+            return []
+    return []
@@ -1,117 +1,173 @@
 from __future__ import annotations
 
+import json
 import logging
-import socket
-from contextlib import closing
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from threading import Thread
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from importlib import import_module
+from pathlib import Path
+from typing import Any
 from uuid import uuid4
 
-import requests
-from notebook import notebookapp
+from appdirs import user_cache_dir
 
+from .config import REACTPY_JUPYTER_DISCOVERY_TIMEOUT
 from .jupyter_server_extension import (
     REACTPY_RESOURCE_BASE_PATH,
     REACTPY_WEB_MODULES_DIR,
 )
 from .layout_widget import set_import_source_base_url
+from .static_server import StaticFileServer
 
 logger = logging.getLogger(__name__)
 
+_MAX_CONCURRENT_PROBES = 8
+_DISCOVERY_CACHE_FILE = (
+    Path(user_cache_dir("reactpy-jupyter", "reactive-python")) / "servers.json"
+)
+
 
 def setup_import_resources() -> None:
     if _try_to_set_import_source_base_url():
         return None
-
-    host = "127.0.0.1"
-    port = _find_available_port("127.0.0.1")
-
-    logger.debug(
-        f"Serving web modules via local static file server at http://{host}:{port}/"
-    )
-    serve_dir = str(REACTPY_WEB_MODULES_DIR.current)
-
-    thread = Thread(
-        target=_run_simple_static_file_server,
-        args=(host, port, serve_dir),
-        daemon=True,
-    )
-    thread.start()
-
-    set_import_source_base_url(f"http://{host}:{port}/")
+    server = StaticFileServer(REACTPY_WEB_MODULES_DIR.current)
+    set_import_source_base_url(server.start())
 
 
 def _try_to_set_import_source_base_url() -> bool:
     # Try to see if there's a local server we should use. This might happen when running
     # in a notebook from within VSCode
-    _temp_file_name = f"__temp_{uuid4().hex}__"
-    _temp_file = REACTPY_WEB_MODULES_DIR.current / _temp_file_name
-    _temp_file.touch()
-    for _server_info in notebookapp.list_running_servers():
-        if _server_info["hostname"] not in ("localhost", "127.0.0.1"):
-            continue
-
-        _resource_url_parts = [
-            _server_info["url"].rstrip("/"),
-            _server_info["base_url"].strip("/"),
-            REACTPY_RESOURCE_BASE_PATH,
-        ]
-        _resource_url = "/".join(filter(None, _resource_url_parts))
-        _temp_file_url = _resource_url + "/" + _temp_file_name
-
-        response = requests.get(_temp_file_url, params={"token": _server_info["token"]})
+    servers = {
+        _server_key(info): info
+        for info in _list_running_servers()
+        if info["hostname"] in ("localhost", "127.0.0.1")
+    }
+    if not servers:
+        return False
+
+    # servers are keyed by PID so a cached URL is never used for a restarted server
+    cache = _read_discovery_cache()
+    for key in servers:
+        if key in cache:
+            set_import_source_base_url(cache[key])
+            logger.debug(f"Serving web modules via cached server URL {cache[key]!r}")
+            return True
 
-        if response.status_code == 200:
-            set_import_source_base_url(_resource_url)
-            logger.debug(
-                f"Serving web modules via existing NotebookApp server at {_resource_url!r}"
+    found = _probe_servers(servers, REACTPY_JUPYTER_DISCOVERY_TIMEOUT.current)
+    if found is None:
+        return False
+    key, resource_url = found
+    set_import_source_base_url(resource_url)
+    logger.debug(f"Serving web modules via existing Jupyter server at {resource_url!r}")
+
+    # forget servers which are no longer running
+    cache = {k: v for k, v in cache.items() if k in servers}
+    cache[key] = resource_url
+    _write_discovery_cache(cache)
+    return True
+
+
+def _list_running_servers() -> list[dict[str, Any]]:
+    servers: dict[str, dict[str, Any]] = {}
+    for module_name in ("jupyter_server.serverapp", "notebook.notebookapp"):
+        try:
+            server_app = import_module(module_name)
+        except ImportError:
+            continue
+        for info in server_app.list_running_servers():
+            servers.setdefault(info["url"], info)
+    return list(servers.values())
+
+
+def _server_key(info: dict[str, Any]) -> str:
+    return f"{info.get('pid')}:{info['url']}"
+
+
+def _probe_servers(
+    servers: dict[str, dict[str, Any]], timeout: float
+) -> tuple[str, str] | None:
+    """Find a server which serves the web modules directory
+
+    Up to ``_MAX_CONCURRENT_PROBES`` servers are asked at once and all are given at
+    most ``timeout`` seconds in total to respond. Returns the key of the first server to do so and its resource URL.
+    """
+    deadline = time.monotonic() + timeout
+    temp_file_name = f"__temp_{uuid4().hex}__"
+    temp_file = REACTPY_WEB_MODULES_DIR.current / temp_file_name
+    temp_file.touch()
+    executor = ThreadPoolExecutor(
+        max_workers=min(len(servers), _MAX_CONCURRENT_PROBES),
+        thread_name_prefix="reactpy-server-discovery",
+    )
+    try:
+        futures = {
+            executor.submit(_probe_server, info, temp_file_name, deadline): key
+            for key, info in servers.items()
+        }
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.debug(f"No Jupyter server responded within {timeout}s")
+                break
+            done, pending = wait(pending, remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                resource_url = future.result()
+                if resource_url is not None:
+                    return futures[future], resource_url
+        return None
+    finally:
+        # probes which are yet to start are abandoned, the rest time out by themselves
+        executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            temp_file.unlink()
+        except FileNotFoundError:  # nocov
+            pass
+
+
+def _probe_server(
+    info: dict[str, Any], temp_file_name: str, deadline: float
+) -> str | None:
+    import requests
+
+    # probes queued behind others only get whatever time is left
+    timeout = deadline - time.monotonic()
+    if timeout <= 0:
+        return None
+    resource_url_parts = [
+        info["url"].rstrip("/"),
+        info["base_url"].strip("/"),
+        REACTPY_RESOURCE_BASE_PATH,
+    ]
+    resource_url = "/".join(filter(None, resource_url_parts))
+    try:
+        # sessions aren't thread safe so each probe has its own
+        with requests.Session() as session:
+            response = session.get(
+                f"{resource_url}/{temp_file_name}",
+                params={"token": info["token"]},
+                timeout=timeout,
             )
-            return True
-    _temp_file.unlink()
-    return False
+    except requests.RequestException as error:
+        logger.debug(f"Could not reach Jupyter server at {info['url']!r} - {error}")
+        return None
+    return resource_url if response.status_code == 200 else None
 
 
-def _run_simple_static_file_server(host: str, port: int, directory: str) -> None:
-    class CORSRequestHandler(SimpleHTTPRequestHandler):
-        def end_headers(self):
-            self.send_header("Access-Control-Allow-Origin", "*")
-            SimpleHTTPRequestHandler.end_headers(self)
+def _read_discovery_cache() -> dict[str, str]:
+    try:
+        return json.loads(_DISCOVERY_CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
 
-        def log_message(self, format, *args):
-            logger.info(
-                "%s - - [%s] %s\n"
-                % (self.address_string(), self.log_date_time_string(), format % args)
-            )
 
-    def make_cors_handler(*args, **kwargs):
-        return CORSRequestHandler(*args, directory=directory, **kwargs)
-
-    with HTTPServer((host, port), make_cors_handler) as httpd:
-        httpd.serve_forever()
-
-
-def _find_available_port(
-    host: str,
-    port_min: int = 8000,
-    port_max: int = 9000,
-    allow_reuse_waiting_ports: bool = True,
-) -> int:
-    """Get a port that's available for the given host and port range"""
-    for port in range(port_min, port_max):
-        with closing(socket.socket()) as sock:
-            try:
-                if allow_reuse_waiting_ports:
-                    # As per this answer: https://stackoverflow.com/a/19247688/3159288
-                    # setting can be somewhat unreliable because we allow the use of
-                    # ports that are stuck in TIME_WAIT. However, not setting the option
-                    # means we're overly cautious and almost always use a different addr
-                    # even if it could have actually been used.
-                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                sock.bind((host, port))
-            except OSError:
-                pass
-            else:
-                return port
-    raise RuntimeError(
-        f"Host {host!r} has no available port in range {port_max}-{port_max}"
-    )
+def _write_discovery_cache(cache: dict[str, str]) -> None:
+    # write then rename so concurrently starting kernels never read a partial file
+    temp_file = _DISCOVERY_CACHE_FILE.with_name(f"{uuid4().hex}.tmp")
+    try:
+        _DISCOVERY_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temp_file.write_text(json.dumps(cache))
+        os.replace(temp_file, _DISCOVERY_CACHE_FILE)
+    except OSError as error:  # nocov
+        logger.debug(f"Could not cache discovered server URL - {error}")
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import re
 from pathlib import Path
+from typing import TYPE_CHECKING
 from urllib.parse import urljoin
 
 from appdirs import user_data_dir
-from jupyter_server.serverapp import ServerApp
-from notebook.base.handlers import AuthenticatedFileHandler
-from notebook.notebookapp import NotebookApp
+
+if TYPE_CHECKING:
+    from jupyter_server.serverapp import ServerApp
+    from notebook.notebookapp import NotebookApp
 
 try:
     from reactpy.config import REACTPY_WEB_MODULES_DIR
@@ -22,19 +25,39 @@ REACTPY_RESOURCE_BASE_PATH = "_reactpy_web_modules"
 
 
 def _load_jupyter_server_extension(server_app: ServerApp | NotebookApp) -> None:
+    from .server_handlers import (
+        HashedWebModuleHandler,
+        WebModuleHandler,
+        WebModuleManifestHandler,
+    )
+    from .web_modules import (
+        HASHED_PATH_PREFIX,
+        MANIFEST_PATH,
+        collect_web_modules_in_background,
+    )
+
     web_app = server_app.web_app
     base_url = web_app.settings["base_url"]
-    route_pattern = urljoin(base_url, rf"{REACTPY_RESOURCE_BASE_PATH}/(.*)")
+    resource_url = urljoin(base_url, REACTPY_RESOURCE_BASE_PATH)
+    handler_kwargs = {"path": str(REACTPY_WEB_MODULES_DIR.current.absolute())}
     web_app.add_handlers(
         host_pattern=r".*$",
         host_handlers=[
+            # the first matching route is used so the catch-all must go last
+            (
+                rf"{resource_url}/{re.escape(MANIFEST_PATH)}",
+                WebModuleManifestHandler,
+                handler_kwargs,
+            ),
             (
-                route_pattern,
-                AuthenticatedFileHandler,
-                {"path": str(REACTPY_WEB_MODULES_DIR.current.absolute())},
+                rf"{resource_url}/{HASHED_PATH_PREFIX}/([0-9a-f]+)/(.+)",
+                HashedWebModuleHandler,
+                handler_kwargs,
             ),
+            (rf"{resource_url}/(.*)", WebModuleHandler, handler_kwargs),
         ],
     )
+    collect_web_modules_in_background()
 
 
 # compat for older versions of Jupyter
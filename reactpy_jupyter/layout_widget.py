@@ -1,28 +1,79 @@
 from __future__ import annotations
 
 import asyncio
+import sys
+from collections import Counter
 from functools import wraps
 from pathlib import Path
-from queue import Queue as SyncQueue
-from threading import Thread
-from typing import Any, Awaitable, Callable, overload
+from threading import Event, Lock
+from time import perf_counter
+from typing import Any, Callable, overload
 
 import anywidget
 from IPython.display import DisplayHandle
 from IPython.display import display as ipython_display
-from ipywidgets import Widget, widget_serialization
-from jsonpointer import set_pointer
+from ipywidgets import Widget
 from reactpy.core.layout import Layout
 from reactpy.core.types import ComponentType
-from traitlets import Instance, List, Unicode
+from traitlets import Dict, List, Unicode
 from typing_extensions import ParamSpec
 
+from reactpy_jupyter.buffers import contains_buffers, extract_buffers
+from reactpy_jupyter.config import (
+    REACTPY_JUPYTER_EVENT_CONCURRENCY,
+    REACTPY_JUPYTER_EVENT_QUEUE_SIZE,
+    REACTPY_JUPYTER_HIBERNATE_AFTER,
+    REACTPY_JUPYTER_HTML_SNAPSHOT,
+    REACTPY_JUPYTER_PRELOAD_MODULES,
+    REACTPY_JUPYTER_RENDER_PROCESSES,
+    REACTPY_JUPYTER_UPDATE_BATCH_WINDOW,
+    REACTPY_JUPYTER_UPDATE_HISTORY_SIZE,
+    REACTPY_JUPYTER_VIEW_BUFFERS_SIZE,
+    REACTPY_JUPYTER_VIEW_OUTBOX_SIZE,
+    REACTPY_JUPYTER_VIEW_WINDOW,
+    REACTPY_JUPYTER_WIRE_FORMAT,
+)
+from reactpy_jupyter.events import DEFAULT_EVENT_POLICIES, EventPolicy, EventQueue
+from reactpy_jupyter.headless import (
+    headless_mimebundle,
+    is_headless,
+    render_headless_model,
+)
+from reactpy_jupyter.process_pool import RemoteLayout
+from reactpy_jupyter.profiler import ProfiledLayout, current_profile
+from reactpy_jupyter.render_loop import acquire_render_loop
+from reactpy_jupyter.snapshot import (
+    FIRST_RENDER_TIMEOUT,
+    HTML_MIME_TYPE,
+    WIDGET_MIME_TYPE,
+    model_to_html,
+    wants_mime_type,
+)
+from reactpy_jupyter.stats import (
+    NULL_STATS,
+    NullStats,
+    Stats,
+    TimedLayout,
+    create_stats,
+)
+from reactpy_jupyter.updates import (
+    UpdateHistory,
+    ViewOutbox,
+    apply_update,
+    collapse_updates,
+    find_imported_modules,
+)
+from reactpy_jupyter.web_modules import record_web_modules_used
 from reactpy_jupyter.widget_component import InnerWidgets, inner_widgets_context
+from reactpy_jupyter.wire_format import decode_message, encode_message
 
 # from `npx vite build`
 bundled_assets_dir = Path(__file__).parent / "static"
 ESM = (bundled_assets_dir / "index.js").read_text()
 
+_IMPORT_SOURCE_BASE_URL: str | None = None
+_IMPORT_SOURCE_BASE_URL_LOCK = Lock()
+
 
 def set_import_source_base_url(base_url: str) -> None:
     """Fallback URL for import sources, if no Jupyter Server is discovered by the client"""
@@ -30,12 +81,56 @@ def set_import_source_base_url(base_url: str) -> None:
     _IMPORT_SOURCE_BASE_URL = base_url
 
 
+def _get_import_source_base_url() -> str:
+    # Discovering where import sources are served from is slow so it is put off until
+    # the first widget is created, unless a URL was set explicitly before then.
+    with _IMPORT_SOURCE_BASE_URL_LOCK:
+        if _IMPORT_SOURCE_BASE_URL is None:
+            from reactpy_jupyter.import_resources import setup_import_resources
+
+            setup_import_resources()
+    return _IMPORT_SOURCE_BASE_URL or ""
+
+
 def run(constructor: Callable[[], ComponentType]) -> DisplayHandle | None:
     """Run the given ReactPy elemen definition as a Jupyter Widget.
 
-    This function is meant to be similarly to ``reactpy.run``.
+    This function is meant to be similarly to ``reactpy.run``. When a notebook cell
+    which called this is run again, the widgets it made the last time are closed.
     """
-    return ipython_display(LayoutWidget(constructor()))
+    if is_headless():
+        return ipython_display(headless_mimebundle(constructor()), raw=True)
+    widget = LayoutWidget(constructor())
+    cell = _running_cell()
+    if cell is not None:
+        cell_id, execution = cell
+        superseded: list[LayoutWidget] = []
+        with _RUN_WIDGETS_LOCK:
+            made_in, widgets = _RUN_WIDGETS.get(cell_id, (execution, []))
+            if made_in != execution:
+                # their output was cleared when the cell was run again
+                superseded, widgets = widgets, []
+            _RUN_WIDGETS[cell_id] = (execution, [*widgets, widget])
+        for old_widget in superseded:
+            old_widget.close()
+    return ipython_display(widget)
+
+
+# the execution of each notebook cell which last called run() and the widgets it made
+_RUN_WIDGETS: dict[str, tuple[int, list[LayoutWidget]]] = {}
+_RUN_WIDGETS_LOCK = Lock()
+
+
+def _running_cell() -> tuple[str, int] | None:
+    # the ID of the notebook cell IPython is running, if the frontend sent one, and
+    # which execution of it this is
+    ipython = sys.modules.get("IPython")
+    shell = ipython.get_ipython() if ipython is not None else None
+    parent = getattr(shell, "parent_header", None) or {}
+    cell_id = parent.get("metadata", {}).get("cellId")
+    if cell_id is None:
+        return None
+    return cell_id, shell.execution_count
 
 
 _P = ParamSpec("_P")
@@ -71,67 +166,475 @@ class LayoutWidget(anywidget.AnyWidget):
 
     _esm = ESM
     _import_source_base_url = Unicode().tag(sync=True)
-    _inner_widgets = List(Instance(Widget)).tag(sync=True, **widget_serialization)
+    _reactpy_wire_format = Unicode().tag(sync=True)
+    _reactpy_snapshot = Dict().tag(sync=True)
+    _reactpy_preload = List(Unicode()).tag(sync=True)
 
     def __init__(self, component: ComponentType) -> None:
+        headless = is_headless()
         super().__init__(
-            _import_source_base_url=_IMPORT_SOURCE_BASE_URL,
-            _inner_widgets=[],
+            # without a browser there is nothing to load import sources
+            _import_source_base_url="" if headless else _get_import_source_base_url(),
+            _reactpy_wire_format=REACTPY_JUPYTER_WIRE_FORMAT.current,
         )
         self._reactpy_model = {}
-        self._reactpy_views = set()
-        self._reactpy_layout = Layout(
-            inner_widgets_context(
-                component,
-                value=InnerWidgets(self._add_inner_widget, self._remove_inner_widget),
-            )
+        self._reactpy_version = 0
+        self._reactpy_history = UpdateHistory(
+            REACTPY_JUPYTER_UPDATE_HISTORY_SIZE.current
+        )
+        self._reactpy_views: dict[int, ViewOutbox] = {}
+        self._reactpy_inner_widgets: dict[str, Widget] = {}
+        self._reactpy_inner_widget_refs: Counter[str] = Counter()
+        self._reactpy_update_batch: list[dict[str, Any]] = []
+        self._reactpy_stats: Stats | NullStats = (
+            NULL_STATS if headless else create_stats(self._reactpy_gauges)
         )
-        self._reactpy_loop = _spawn_threaded_event_loop(
-            self._reactpy_layout_render_loop()
+        root = inner_widgets_context(
+            component,
+            value=InnerWidgets(self._add_inner_widget, self._remove_inner_widget),
         )
+        profile = current_profile()
+        if REACTPY_JUPYTER_RENDER_PROCESSES.current:
+            # inner widgets live in the kernel so can't be embedded from a worker
+            self._reactpy_layout = RemoteLayout(component)
+        elif profile is not None:
+            self._reactpy_layout = ProfiledLayout(root, self._reactpy_stats, profile)
+        elif self._reactpy_stats.enabled:
+            self._reactpy_layout = TimedLayout(root, self._reactpy_stats)
+        else:
+            self._reactpy_layout = Layout(root)
+        self._reactpy_events = EventQueue(
+            self._reactpy_layout.deliver,
+            REACTPY_JUPYTER_EVENT_QUEUE_SIZE.current,
+            dict(DEFAULT_EVENT_POLICIES),
+            REACTPY_JUPYTER_EVENT_CONCURRENCY.current,
+        )
+        self._reactpy_render_task: asyncio.Task[None] | None = None
+        self._reactpy_hibernate_timer: asyncio.TimerHandle | None = None
+        self._reactpy_closed = False
+        self._reactpy_viewed = False
+        self._reactpy_headless = headless
+        self._reactpy_has_buffers = False
+        self._reactpy_used_modules: set[str] = set()
+        self._reactpy_rendered = Event()
+        if headless:
+            self._reactpy_render_headless(component)
+            return None
+        self._reactpy_loop = acquire_render_loop()
+        self._reactpy_loop.call_soon(self._reactpy_start)
         self.on_msg(lambda _, *args, **kwargs: self._reactpy_on_msg(*args, **kwargs))
 
+    def _reactpy_render_headless(self, component: ComponentType) -> None:
+        # The layout renders to completion now and is never started. The widget is
+        # left closed, as far as rendering goes, so it never acquires a render loop.
+        self._reactpy_closed = True
+        rendered = render_headless_model(component)
+        if rendered is not None:
+            self._reactpy_model, inner_widgets = rendered
+            self._reactpy_inner_widgets.update(inner_widgets)
+            self._reactpy_has_buffers = contains_buffers(self._reactpy_model)
+            self._reactpy_version = 1
+        self._reactpy_rendered.set()
+
     def _reactpy_on_msg(self, message: dict[str, Any], buffers: Any):
+        if self._reactpy_stats.enabled:
+            # stats are only recorded from the render loop so need no lock
+            self._reactpy_loop.call_soon(
+                self._reactpy_record_received, message, buffers, perf_counter()
+            )
         m_type = message.get("type")
         if m_type == "client-ready":
-            v_id = message["viewID"]
-            self._reactpy_views.add(v_id)
-            update_message = {
-                "type": "layout-update",
-                "path": "",
-                "model": self._reactpy_model,
-            }
-            self.send({"viewID": v_id, "data": update_message})
+            self._reactpy_loop.call_soon(
+                self._reactpy_add_view, message["viewID"], message.get("version")
+            )
         elif m_type == "dom-event":
-            asyncio.run_coroutine_threadsafe(
-                self._reactpy_layout.deliver(message["data"]),
-                loop=self._reactpy_loop,
+            self._reactpy_loop.call_soon(
+                self._reactpy_events.put, decode_message(message, buffers)
+            )
+        elif m_type == "ack":
+            self._reactpy_loop.call_soon(
+                self._reactpy_ack_view, message["viewID"], message["version"]
             )
         elif m_type == "client-removed":
-            v_id = message["viewID"]
-            if v_id in self._reactpy_views:
-                self._reactpy_views.remove(message["viewID"])
+            self._reactpy_loop.call_soon(self._reactpy_remove_view, message["viewID"])
+
+    def _reactpy_record_received(
+        self, message: dict[str, Any], buffers: Any, received_at: float
+    ) -> None:
+        self._reactpy_stats.message_received(message, buffers)
+        if message.get("type") == "dom-event":
+            self._reactpy_stats.event_received(received_at)
+
+    # View bookkeeping happens within the render loop so that no update can be sent
+    # between a view receiving the current model and being subscribed to updates.
+
+    def _reactpy_add_view(self, v_id: int, version: int | None) -> None:
+        if self._reactpy_closed:
+            return None
+        self._reactpy_viewed = True
+        self._reactpy_cancel_hibernation()
+        if self._reactpy_render_task is None:
+            # Waking from hibernation - the layout's first render will replace the
+            # whole model so there is nothing to send until then.
+            self._reactpy_views[v_id] = self._reactpy_new_outbox(self._reactpy_version)
+            self._reactpy_start()
+            return None
+
+        outbox = self._reactpy_views[v_id] = self._reactpy_new_outbox(version or 0)
+        if self._reactpy_inner_widgets:
+            self._reactpy_send(
+                [v_id],
+                {"type": "inner-widgets", "added": list(self._reactpy_inner_widgets)},
+            )
+        if version == self._reactpy_version:
+            # the view already rendered the current snapshot from the widget state
+            return None
+        missed_updates = None
+        if version is not None:
+            missed_updates = self._reactpy_history.since(version)
+        if missed_updates:
+            self._reactpy_send([v_id], _make_update_batch(missed_updates))
+        else:
+            self._reactpy_send([v_id], self._reactpy_full_update())
+        outbox.sent_version = self._reactpy_version
+
+    def _reactpy_ack_view(self, v_id: int, version: int) -> None:
+        outbox = self._reactpy_views.get(v_id)
+        if outbox is None:
+            return None
+        outbox.acked_version = max(outbox.acked_version, version)
+        if outbox.is_behind:
+            return None
+        if outbox.needs_resync:
+            self._reactpy_send([v_id], self._reactpy_full_update())
+        elif outbox.pending:
+            self._reactpy_send([v_id], _make_update_batch(outbox.pending))
+        else:
+            return None
+        outbox.pending = []
+        outbox.needs_resync = False
+        outbox.sent_version = self._reactpy_version
+
+    def _reactpy_remove_view(self, v_id: int) -> None:
+        self._reactpy_views.pop(v_id, None)
+        hibernate_after = REACTPY_JUPYTER_HIBERNATE_AFTER.current
+        if hibernate_after and not self._reactpy_views:
+            self._reactpy_cancel_hibernation()
+            self._reactpy_hibernate_timer = asyncio.get_running_loop().call_later(
+                hibernate_after, self._reactpy_hibernate
+            )
+
+    def _reactpy_new_outbox(self, version: int) -> ViewOutbox:
+        return ViewOutbox(
+            REACTPY_JUPYTER_VIEW_WINDOW.current,
+            REACTPY_JUPYTER_VIEW_OUTBOX_SIZE.current,
+            version,
+            REACTPY_JUPYTER_VIEW_BUFFERS_SIZE.current,
+        )
+
+    def _reactpy_full_update(self) -> dict[str, Any]:
+        return {
+            "type": "layout-update",
+            "path": "",
+            "model": self._reactpy_model,
+            "version": self._reactpy_version,
+        }
+
+    @property
+    def event_policies(self) -> dict[str, EventPolicy]:
+        """Rate limiting policies for this widget's events, keyed by DOM event type"""
+        return self._reactpy_events.policies
+
+    def event_stats(self) -> dict[str, int]:
+        """Counts of the events this widget has received, delivered, coalesced or dropped"""
+        return self._reactpy_events.counts()
+
+    def outbox_stats(self) -> dict[int, dict[str, Any]]:
+        """For each view, how many updates are held back and how many versions behind it is"""
+        return {
+            v_id: {
+                "pending": len(outbox.pending),
+                "lag": outbox.sent_version - outbox.acked_version,
+                "needs_resync": outbox.needs_resync,
+            }
+            for v_id, outbox in list(self._reactpy_views.items())
+        }
+
+    @property
+    def has_views(self) -> bool:
+        """Whether any view of this widget, in any browser, is connected"""
+        return bool(self._reactpy_views)
+
+    @property
+    def was_viewed(self) -> bool:
+        """Whether a view of this widget has ever connected, whether or not it still is"""
+        return self._reactpy_viewed
+
+    def stats(self) -> dict[str, Any]:
+        """Counters, gauges and histograms describing this widget's costs
+
+        Stats are only recorded if ``REACTPY_JUPYTER_STATS`` was enabled when the
+        widget was created. Times are in seconds and sizes in bytes.
+        """
+        return self._reactpy_stats.snapshot()
+
+    def _reactpy_gauges(self) -> dict[str, int]:
+        return {
+            "views": len(self._reactpy_views),
+            "queued_events": self._reactpy_events.counts()["queued"],
+            "held_updates": sum(
+                len(outbox.pending) for outbox in list(self._reactpy_views.values())
+            ),
+            "inner_widgets": len(self._reactpy_inner_widgets),
+        }
+
+    def close(self) -> None:
+        """Unmount the layout, release the render loop and close the widget"""
+        # may be called by Widget.__del__ even if __init__ did not complete
+        if not getattr(self, "_reactpy_closed", True):
+            self._reactpy_closed = True
+            self._reactpy_loop.call_soon(self._reactpy_stop)
+            self._reactpy_loop.release()
+            self._reactpy_stats.close()
+        super().close()
+
+    # The layout is started and stopped from within the render loop. Once stopped,
+    # whether by closing the widget or hibernating, the model and update history are
+    # discarded. The version keeps counting up so that views can tell old from new.
+
+    def _reactpy_start(self) -> None:
+        if not self._reactpy_closed:
+            self._reactpy_render_task = asyncio.get_running_loop().create_task(
+                self._reactpy_layout_render_loop()
+            )
+
+    def _reactpy_stop(self) -> None:
+        self._reactpy_cancel_hibernation()
+        self._reactpy_views.clear()
+        if self._reactpy_render_task is not None:
+            self._reactpy_render_task.cancel()
+
+    def _reactpy_hibernate(self) -> None:
+        self._reactpy_hibernate_timer = None
+        if not self._reactpy_views and self._reactpy_render_task is not None:
+            self._reactpy_render_task.cancel()
+
+    def _reactpy_cancel_hibernation(self) -> None:
+        if self._reactpy_hibernate_timer is not None:
+            self._reactpy_hibernate_timer.cancel()
+            self._reactpy_hibernate_timer = None
+
+    def _reactpy_release_layout(self) -> None:
+        self._reactpy_render_task = None
+        self._reactpy_rendered.clear()
+        self._reactpy_has_buffers = False
+        self._reactpy_model = {}
+        self._reactpy_history.clear()
+        self._reactpy_update_batch = []
+        self._reactpy_events.clear()
+        if self._reactpy_snapshot:
+            self._reactpy_snapshot = {}
+        if self._reactpy_views:
+            # a view was added while the layout was being stopped
+            self._reactpy_start()
 
     async def _reactpy_layout_render_loop(self) -> None:
-        async with self._reactpy_layout:
-            while True:
-                update_message = await self._reactpy_layout.render()
-                if not update_message["path"]:
-                    self._reactpy_model = update_message["model"]
-                else:
-                    set_pointer(
-                        self._reactpy_model,
-                        update_message["path"],
-                        update_message["model"],
-                    )
-                for v_id in self._reactpy_views:
-                    self.send({"viewID": v_id, "data": update_message})
+        try:
+            async with self._reactpy_layout:
+                events_task = asyncio.create_task(self._reactpy_events.run())
+                try:
+                    await self._reactpy_render_updates()
+                finally:
+                    events_task.cancel()
+        finally:
+            self._reactpy_release_layout()
+
+    async def _reactpy_render_updates(self) -> None:
+        while True:
+            update = await self._reactpy_layout.render()
+            self._reactpy_model = apply_update(self._reactpy_model, update)
+            self._reactpy_version += 1
+            if not self._reactpy_rendered.is_set():
+                self._reactpy_rendered.set()
+            imported_modules = find_imported_modules(update["model"])
+            if imported_modules:
+                new_modules = imported_modules.difference(self._reactpy_used_modules)
+                if new_modules:
+                    self._reactpy_used_modules.update(new_modules)
+                    record_web_modules_used(new_modules)
+                if REACTPY_JUPYTER_PRELOAD_MODULES.current:
+                    self._reactpy_add_preload_hints(imported_modules)
+            if not self._reactpy_has_buffers:
+                # only then are messages searched for binary values to send as buffers
+                self._reactpy_has_buffers = contains_buffers(update["model"])
+            if self._reactpy_version == 1:
+                self._reactpy_publish_snapshot()
+            update_message = {**update, "version": self._reactpy_version}
+            self._reactpy_history.append(update_message)
+            self._reactpy_dispatch_update(update_message)
+            # yield to the other widgets sharing this loop in case more renders
+            # are already queued and awaiting them would not suspend this task
+            await asyncio.sleep(0)
+
+    def _reactpy_add_preload_hints(self, modules: set[str]) -> None:
+        # The state of the widget is synced before the update is sent so views begin
+        # loading modules while it's in transit. Views created later load them at once.
+        new_modules = modules.difference(self._reactpy_preload)
+        if new_modules:
+            self._reactpy_preload = [*self._reactpy_preload, *sorted(new_modules)]
+
+    def _reactpy_dispatch_update(self, update_message: dict[str, Any]) -> None:
+        batch_window = REACTPY_JUPYTER_UPDATE_BATCH_WINDOW.current
+        if not batch_window:
+            self._reactpy_send_to_views(update_message)
+            return None
+        if not self._reactpy_update_batch:
+            asyncio.get_running_loop().call_later(
+                batch_window, self._reactpy_flush_update_batch
+            )
+        self._reactpy_update_batch.append(update_message)
+
+    def _reactpy_flush_update_batch(self) -> None:
+        if not self._reactpy_update_batch:
+            # the layout was stopped before the batch was sent
+            return None
+        self._reactpy_send_to_views(_make_update_batch(self._reactpy_update_batch))
+        self._reactpy_update_batch = []
+
+    def _reactpy_send_to_views(self, data: dict[str, Any]) -> None:
+        self._reactpy_stats.update_sent()
+        ready_view_ids = []
+        for v_id, outbox in self._reactpy_views.items():
+            if outbox.is_behind:
+                # the view will be sent the latest state once it acknowledges more
+                outbox.hold(data)
+            else:
+                ready_view_ids.append(v_id)
+                outbox.sent_version = data["version"]
+        self._reactpy_send(ready_view_ids, data)
+
+    def _reactpy_send(self, view_ids: list[int], data: dict[str, Any]) -> None:
+        # Encode once and let each view pick out the messages addressed to it so the
+        # cost of an update does not grow with the number of views.
+        if not view_ids:
+            return None
+        binary_content: dict[str, Any] = {}
+        binary_buffers: list[memoryview] = []
+        if self._reactpy_has_buffers:
+            data, binary_content, binary_buffers = self._reactpy_extract_buffers(
+                view_ids, data
+            )
+        content, buffers = encode_message(data, self._reactpy_wire_format)
+        content.update(binary_content)
+        buffers = [*buffers, *binary_buffers]
+        self._reactpy_stats.message_sent(content, buffers)
+        self.send({"viewIDs": view_ids, **content}, buffers)
+
+    def _reactpy_extract_buffers(
+        self, view_ids: list[int], data: dict[str, Any]
+    ) -> tuple[dict[str, Any], dict[str, Any], list[memoryview]]:
+        # Binary values follow the encoded message in its buffers. Those which some of
+        # the views don't have yet are sent (to all of them) while each view is told
+        # which of the ones it has to forget.
+        data, found = extract_buffers(data)
+        if not found:
+            return data, {}, []
+        sending: dict[str, None] = {}
+        dropped = {}
+        for v_id in view_ids:
+            missing, evicted = self._reactpy_views[v_id].sent_buffers.use(found)
+            sending.update(dict.fromkeys(missing))
+            if evicted:
+                dropped[str(v_id)] = evicted
+        content: dict[str, Any] = {}
+        if sending:
+            content["bufferIDs"] = list(sending)
+        if dropped:
+            content["droppedBuffers"] = dropped
+        return data, content, [found[digest] for digest in sending]
+
+    def _reactpy_publish_snapshot(self) -> None:
+        # Syncing the snapshot sends the whole model so it's only published for the
+        # first view. Views connected later are sent the model, or what they missed of
+        # it, in reply to saying which version they painted from the page's cache.
+        if self._reactpy_views:
+            return None
+        # Read the version first. Should an update land in between, the model will be
+        # newer than the version it is published with and the view will merely be sent
+        # an update it has already applied.
+        version = self._reactpy_version
+        if not self._reactpy_model:
+            # nothing has been rendered since the layout was (re)started
+            return None
+        if self._reactpy_snapshot.get("version") != version:
+            model = self._reactpy_model
+            if self._reactpy_has_buffers:
+                # widget state carries the bytes of the binary values itself
+                model, _ = extract_buffers(model, inline=True)
+            self._reactpy_snapshot = {
+                "version": version,
+                "model": model,
+                "innerWidgets": list(self._reactpy_inner_widgets),
+            }
+
+    def _repr_mimebundle_(self, **kwargs: Any) -> tuple[dict, dict] | None:
+        # The HTML is shown where the widget can't be, as when the notebook is viewed
+        # without a kernel, and embedded widgets are shown as their own HTML. Rendering
+        # it, and waiting for there to be something to render, is left to those who
+        # ask for it or whose display can't show the widget itself. Headless widgets
+        # have already rendered and only have a browser to be shown in by their HTML.
+        include, exclude = kwargs.get("include"), kwargs.get("exclude")
+        wants_html = wants_mime_type(HTML_MIME_TYPE, include, exclude) and (
+            self._reactpy_headless
+            or REACTPY_JUPYTER_HTML_SNAPSHOT.current
+            or not wants_mime_type(WIDGET_MIME_TYPE, include, exclude)
+        )
+        if wants_html:
+            self._reactpy_wait_for_first_render(FIRST_RENDER_TIMEOUT)
+        self._reactpy_publish_snapshot()
+        bundle = super()._repr_mimebundle_(**kwargs)
+        model = self._reactpy_model
+        if bundle is not None and model and wants_html:
+            bundle[0][HTML_MIME_TYPE] = model_to_html(
+                model, dict(self._reactpy_inner_widgets)
+            )
+        return bundle
+
+    def _reactpy_wait_for_first_render(self, timeout: float) -> None:
+        if self._reactpy_version or self._reactpy_closed:
+            # hibernating widgets are not woken just to be displayed
+            return None
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is not self._reactpy_loop.loop:
+            # the render can't happen while this blocks the loop it's rendered on
+            self._reactpy_rendered.wait(timeout)
+
+    # Inner widgets are reference counted since the same widget may be embedded more
+    # than once. Views are only told about widgets being added or removed entirely.
 
     def _add_inner_widget(self, widget: Widget) -> None:
-        self._inner_widgets = self._inner_widgets + [widget]
+        model_id = widget.model_id
+        self._reactpy_inner_widget_refs[model_id] += 1
+        if model_id not in self._reactpy_inner_widgets:
+            self._reactpy_inner_widgets[model_id] = widget
+            self._reactpy_send(
+                list(self._reactpy_views),
+                {"type": "inner-widgets", "added": [model_id]},
+            )
 
     def _remove_inner_widget(self, widget: Widget) -> None:
-        self._inner_widgets = [w for w in self._inner_widgets if w != widget]
+        model_id = widget.model_id
+        self._reactpy_inner_widget_refs[model_id] -= 1
+        if self._reactpy_inner_widget_refs[model_id] <= 0:
+            del self._reactpy_inner_widget_refs[model_id]
+            del self._reactpy_inner_widgets[model_id]
+            self._reactpy_send(
+                list(self._reactpy_views),
+                {"type": "inner-widgets", "removed": [model_id]},
+            )
 
     def __repr__(self) -> str:
         return f"LayoutWidget({self._reactpy_layout})"
@@ -142,18 +645,12 @@ class LayoutWidget(anywidget.AnyWidget):
         cls._esm = "http://localhost:5173/src/index.js"
 
 
-def _spawn_threaded_event_loop(
-    coro: Callable[..., Awaitable[Any]]
-) -> asyncio.AbstractEventLoop:
-    loop_q: SyncQueue[asyncio.AbstractEventLoop] = SyncQueue()
-
-    def run_in_thread() -> None:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop_q.put(loop)
-        loop.run_until_complete(coro)
-
-    thread = Thread(target=run_in_thread, daemon=True)
-    thread.start()
-
-    return loop_q.get()
+def _make_update_batch(updates: list[dict[str, Any]]) -> dict[str, Any]:
+    updates = collapse_updates(updates)
+    if len(updates) == 1:
+        return updates[0]
+    return {
+        "type": "layout-update-batch",
+        "updates": updates,
+        "version": updates[-1]["version"],
+    }
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import Any
+
+from IPython.core.magic_arguments import argument, magic_arguments, parse_argstring
+
+from reactpy_jupyter import profiler
+from reactpy_jupyter.stats import format_stats, kernel_stats
+
+_MAGICS = {"reactpy_stats": "line", "reactpy_profile": "line"}
+
+
+def load_ipython_extension(ipython: Any) -> None:
+    """Register ReactPy's magics with ``%load_ext reactpy_jupyter``"""
+    for name, kind in _MAGICS.items():
+        ipython.register_magic_function(globals()[name], kind, name)
+
+
+def unload_ipython_extension(ipython: Any) -> None:
+    for name, kind in _MAGICS.items():
+        ipython.magics_manager.magics[kind].pop(name, None)
+
+
+def reactpy_stats(line: str) -> None:
+    """Print a summary of the stats recorded by all widgets in this kernel
+
+    Stats are only recorded by widgets created while ``REACTPY_JUPYTER_STATS`` is
+    enabled.
+    """
+    stats = kernel_stats()
+    if not stats["widgets"]:
+        print("No widgets are recording stats - set REACTPY_JUPYTER_STATS to enable")
+        return None
+    print(f"Stats for {stats['widgets']} widget(s)\n")
+    print(format_stats(stats))
+
+
+@magic_arguments()
+@argument(
+    "action",
+    nargs="?",
+    default="show",
+    choices=("start", "stop", "show", "save"),
+    help="Start or stop profiling widgets created from now on, show the results "
+    "or save them to a file",
+)
+@argument("path", nargs="?", help="Where to save - speedscope if it ends in .json")
+@argument(
+    "-s",
+    "--sort",
+    default="total",
+    choices=("total", "self", "effects", "renders", "name"),
+    help="The column to sort the results by",
+)
+@argument("-l", "--limit", type=int, default=None, help="Show at most this many rows")
+def reactpy_profile(line: str) -> None:
+    """Profile the render times of the components in widgets
+
+    Only widgets created after ``%reactpy_profile start`` are profiled. They continue
+    recording after ``%reactpy_profile stop``, which stops profiling new widgets.
+    """
+    args = parse_argstring(reactpy_profile, line)
+    if args.action == "start":
+        profiler.start_profile()
+        print("Profiling widgets created from now on")
+        return None
+
+    if args.action == "stop":
+        profiler.stop_profile()
+    profile = profiler.latest_profile()
+    if profile is None:
+        print("Nothing has been profiled - use '%reactpy_profile start' first")
+    elif args.action == "save":
+        if not args.path:
+            print("A path to save the profile to is required")
+            return None
+        profile.save(args.path)
+        print(f"Saved profile to {args.path}")
+    else:
+        print(profile.table(args.sort, args.limit))
@@ -1,25 +1,216 @@
-from typing import Any
-from weakref import finalize
+from __future__ import annotations
 
-from reactpy.core.component import Component
+import os
+import sys
+from collections import OrderedDict
+from importlib.abc import Loader, MetaPathFinder
+from importlib.machinery import ModuleSpec
+from importlib.util import find_spec
+from threading import RLock
+from types import ModuleType
+from typing import Any, Callable, Sequence
 
-from reactpy_jupyter.layout_widget import to_widget
+from reactpy_jupyter.command_line import program_name
 
-# we can't track the widgets by adding them as a hidden attribute to the component
-# because Component has __slots__ defined
-LIVE_WIDGETS: dict[int, Any] = {}
+# the programs and modules which start IPython or its kernel
+IPYTHON_PROGRAMS = frozenset(
+    ["ipython", "ipython3", "IPython", "ipykernel", "ipykernel_launcher"]
+)
 
 
 def execute_patch() -> None:
-    """Monkey patch ReactPy's Component class to display as a Jupyter widget"""
-
-    def _repr_mimebundle_(self: Component, *a, **kw) -> None:
-        self_id = id(self)
-        if self_id not in LIVE_WIDGETS:
-            widget = LIVE_WIDGETS[self_id] = to_widget(self)
-            finalize(self, lambda: LIVE_WIDGETS.pop(self_id, None))
-        else:
-            widget = LIVE_WIDGETS[self_id]
-        return widget._repr_mimebundle_(*a, **kw)
-
-    Component._repr_mimebundle_ = _repr_mimebundle_
+    """Monkey patch ReactPy to display components as Jupyter widgets
+
+    Since this is done on import of this package, which a ``.pth`` file causes to
+    happen whenever Python starts, ReactPy is only patched once it is imported. Only
+    IPython, where components are displayed, waits for that. Other programs only have
+    ReactPy patched if they imported it first.
+    """
+    if "reactpy" not in sys.modules and not running_ipython():
+        return None
+    when_imported("reactpy.config", _configure_reactpy)
+    when_imported("reactpy.core.component", _patch_component)
+
+
+def running_ipython() -> bool:
+    """Whether this process is IPython or one of its kernels"""
+    # Kernels started by Jupyter are told the PID of their parent, whatever launched them
+    return "JPY_PARENT_PID" in os.environ or (
+        program_name(getattr(sys, "orig_argv", sys.argv)) in IPYTHON_PROGRAMS
+    )
+
+
+def when_imported(module_name: str, hook: Callable[[ModuleType], None]) -> None:
+    """Call a hook with a module once it has been imported, or now if it already is"""
+    with _IMPORT_HOOKS_LOCK:
+        module = sys.modules.get(module_name)
+        if module is None:
+            _IMPORT_HOOKS.setdefault(module_name, []).append(hook)
+            if _FINDER not in sys.meta_path:
+                sys.meta_path.insert(0, _FINDER)
+            return None
+    hook(module)
+
+
+def _configure_reactpy(config: ModuleType) -> None:
+    # importing the extension sets where ReactPy stores the web modules it serves
+    from reactpy_jupyter import jupyter_server_extension  # noqa: F401
+
+
+def _patch_component(component_module: ModuleType) -> None:
+    def _repr_mimebundle_(self: Any, *a, **kw) -> Any:
+        from reactpy_jupyter.headless import headless_mimebundle, is_headless
+        from reactpy_jupyter.snapshot import (
+            WIDGET_MIME_TYPE,
+            snapshot_mimebundle,
+            wants_mime_type,
+        )
+
+        include, exclude = kw.get("include"), kw.get("exclude")
+        if is_headless():
+            # no widget is made since there is no browser to show it
+            return headless_mimebundle(self, include, exclude)
+        if not wants_mime_type(WIDGET_MIME_TYPE, include, exclude):
+            # no need to start a live layout for a display which can't show it
+            return snapshot_mimebundle(self, include, exclude)
+        return COMPONENT_WIDGETS.get(self)._repr_mimebundle_(*a, **kw)
+
+    component_module.Component._repr_mimebundle_ = _repr_mimebundle_
+
+
+class WidgetCache:
+    """The widgets made to display components, least recently displayed last
+
+    We can't track the widgets by adding them as a hidden attribute to the component
+    because Component has __slots__ defined. Instead, they are keyed by the ``id`` of
+    their component. Each widget's layout keeps its component alive, so the ``id``
+    cannot be reused by another component while the widget is cached. Since that also
+    means widgets would otherwise live forever, once more than
+    :data:`~reactpy_jupyter.config.REACTPY_JUPYTER_COMPONENT_WIDGETS` are cached the
+    least recently displayed are closed and forgotten. Only widgets which are no longer
+    shown are closed - those whose views have all gone, and those displayed by an
+    earlier cell which never had a view. Widgets displayed by the running cell may not
+    have been rendered by the browser yet.
+    """
+
+    def __init__(self) -> None:
+        # the component, its widget, and the execution which last displayed it
+        self._widgets: OrderedDict[int, tuple[Any, Any, int | None]] = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, component: Any) -> Any:
+        """Get the widget for the component, creating it if there is none"""
+        from reactpy_jupyter.config import REACTPY_JUPYTER_COMPONENT_WIDGETS
+        from reactpy_jupyter.layout_widget import to_widget
+
+        key = id(component)
+        execution = _execution_count()
+        with self._lock:
+            entry = self._widgets.get(key)
+            if entry is not None and entry[0] is component:
+                self._widgets[key] = (component, entry[1], execution)
+                self._widgets.move_to_end(key)
+                return entry[1]
+
+        widget = to_widget(component)
+        closing = []
+        with self._lock:
+            # another thread may have made a widget for the component meanwhile
+            replaced = self._widgets.pop(key, None)
+            if replaced is not None:
+                closing.append(replaced[1])
+            self._widgets[key] = (component, widget, execution)
+            excess = len(self._widgets) - REACTPY_JUPYTER_COMPONENT_WIDGETS.current
+            older = list(self._widgets.items())[:-1]
+            for old_key, (_, old_widget, displayed_in) in older:
+                if excess <= 0:
+                    break
+                if _is_unshown(old_widget, displayed_in != execution):
+                    del self._widgets[old_key]
+                    closing.append(old_widget)
+                    excess -= 1
+        for old_widget in closing:
+            old_widget.close()
+        return widget
+
+    def clear(self) -> None:
+        """Close all the cached widgets"""
+        with self._lock:
+            widgets = [widget for _, widget, _ in self._widgets.values()]
+            self._widgets.clear()
+        for widget in widgets:
+            widget.close()
+
+    def __len__(self) -> int:
+        return len(self._widgets)
+
+
+def _is_unshown(widget: Any, displayed_earlier: bool) -> bool:
+    if widget.has_views:
+        return False
+    # A widget displayed by the running cell, but not viewed yet, is likely still on
+    # its way to the browser.
+    return widget.was_viewed or displayed_earlier
+
+
+def _execution_count() -> int | None:
+    # the cell being run by IPython, if this is IPython
+    ipython = sys.modules.get("IPython")
+    shell = ipython.get_ipython() if ipython is not None else None
+    return getattr(shell, "execution_count", None)
+
+
+COMPONENT_WIDGETS = WidgetCache()
+
+
+_IMPORT_HOOKS: dict[str, list[Callable[[ModuleType], None]]] = {}
+_IMPORT_HOOKS_LOCK = RLock()
+
+
+class _PostImportFinder(MetaPathFinder):
+    """Wraps the loaders of hooked modules so hooks run once the module is executed"""
+
+    def __init__(self) -> None:
+        self._finding: set[str] = set()
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Sequence[str] | None,
+        target: ModuleType | None = None,
+    ) -> ModuleSpec | None:
+        if fullname not in _IMPORT_HOOKS or fullname in self._finding:
+            return None
+        # let the other finders locate the module
+        self._finding.add(fullname)
+        try:
+            spec = find_spec(fullname)
+        finally:
+            self._finding.discard(fullname)
+        if spec is None or spec.loader is None:
+            return None
+        spec.loader = _PostImportLoader(spec.loader)
+        return spec
+
+
+class _PostImportLoader(Loader):
+    def __init__(self, loader: Loader) -> None:
+        self._loader = loader
+
+    def create_module(self, spec: ModuleSpec) -> ModuleType | None:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self._loader.exec_module(module)
+        with _IMPORT_HOOKS_LOCK:
+            hooks = _IMPORT_HOOKS.pop(module.__name__, [])
+            if not _IMPORT_HOOKS and _FINDER in sys.meta_path:
+                sys.meta_path.remove(_FINDER)
+        for hook in hooks:
+            hook(module)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+
+_FINDER = _PostImportFinder()
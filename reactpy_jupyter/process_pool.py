@@ -0,0 +1,282 @@
+"""Render widget layouts in worker processes so that slow renders can't stall the kernel
+
+Each worker runs the layouts of many widgets. Widgets are given a :class:`RemoteLayout`
+which relays events to, and updates from, the real layout in a worker over a pipe.
+Components are sent to workers with ``cloudpickle`` if it's installed, so that ones
+defined in a notebook may be rendered, and ``pickle`` otherwise.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import pickle
+import traceback
+from itertools import count
+from multiprocessing.connection import Connection
+from threading import Lock, Thread
+from typing import Any
+
+from reactpy.core.layout import Layout
+from reactpy.core.types import ComponentType, LayoutEventMessage, LayoutUpdateMessage
+
+from reactpy_jupyter.config import REACTPY_JUPYTER_RENDER_PROCESSES
+
+try:
+    import cloudpickle
+except ImportError:  # nocov
+    cloudpickle = None
+
+logger = logging.getLogger(__name__)
+
+_LAYOUT_IDS = count()
+_WORKER_NUMBERS = count()
+_WORKERS: list[RenderWorker] = []
+_WORKERS_LOCK = Lock()
+
+
+class RemoteLayout:
+    """Stands in for a :class:`~reactpy.core.layout.Layout` rendered by a worker
+
+    Should the component fail to be sent to the worker, or the worker crash, the
+    layout renders a message describing the error instead. Embedding widgets with
+    :func:`~reactpy_jupyter.widget_component.from_widget` is not supported since they
+    only exist in the kernel.
+    """
+
+    def __init__(self, root: ComponentType) -> None:
+        self.root = root
+        self._id = -1
+        self._worker: RenderWorker | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inbox: asyncio.Queue[tuple[str, Any]] | None = None
+
+    async def __aenter__(self) -> RemoteLayout:
+        # a new ID each time so messages about a previous mount are ignored
+        self._id = next(_LAYOUT_IDS)
+        self._loop = asyncio.get_running_loop()
+        self._inbox = asyncio.Queue()
+        try:
+            payload = _dumps(self.root)
+        except Exception:
+            logger.exception(f"Could not send {self.root} to a render worker")
+            self._inbox.put_nowait(("error", traceback.format_exc()))
+            return self
+        self._worker = acquire_render_worker()
+        self._worker.mount(self, payload)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._worker is not None:
+            self._worker.unmount(self)
+            self._worker = None
+        self._inbox = None
+
+    async def render(self) -> LayoutUpdateMessage:
+        assert self._inbox is not None, "Layout not mounted"
+        kind, payload = await self._inbox.get()
+        if kind == "update":
+            return payload
+        # Show the error and stop rendering until unmounted. Raising instead would
+        # restart the layout, likely failing again, for as long as it has views.
+        self._inbox.put_nowait(("stopped", None))
+        if kind == "stopped":
+            await asyncio.Future()
+        return {
+            "type": "layout-update",
+            "path": "",
+            "model": {"tagName": "pre", "children": [payload]},
+        }
+
+    async def deliver(self, event: LayoutEventMessage) -> None:
+        if self._worker is not None:
+            self._worker.send(("event", self._id, event))
+
+    def _receive(self, kind: str, payload: Any) -> None:
+        # called from the thread reading the worker's messages
+        loop, inbox = self._loop, self._inbox
+        if loop is not None and inbox is not None:
+            loop.call_soon_threadsafe(inbox.put_nowait, (kind, payload))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.root})"
+
+
+def acquire_render_worker() -> RenderWorker:
+    """Get the render worker with the fewest layouts, starting one if there is room
+
+    Up to :data:`~reactpy_jupyter.config.REACTPY_JUPYTER_RENDER_PROCESSES` workers are
+    started. Workers which crashed are replaced.
+    """
+    with _WORKERS_LOCK:
+        _WORKERS[:] = [w for w in _WORKERS if w.alive]
+        if len(_WORKERS) < REACTPY_JUPYTER_RENDER_PROCESSES.current:
+            worker = RenderWorker(f"reactpy-render-process-{next(_WORKER_NUMBERS)}")
+            _WORKERS.append(worker)
+        else:
+            worker = min(_WORKERS, key=lambda w: len(w.layouts))
+        return worker
+
+
+class RenderWorker:
+    """A worker process which renders layouts, and the thread which reads its messages"""
+
+    def __init__(self, name: str) -> None:
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_run_worker, args=(child_connection,), name=name, daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.layouts: dict[int, RemoteLayout] = {}
+        self.alive = True
+        self._stopping = False
+        self._send_lock = Lock()
+        self._reader = Thread(target=self._read, name=f"{name}-reader", daemon=True)
+        self._reader.start()
+
+    def mount(self, layout: RemoteLayout, payload: bytes) -> None:
+        with _WORKERS_LOCK:
+            self.layouts[layout._id] = layout
+        if not self.send(("mount", layout._id, payload)):
+            layout._receive("error", "The render worker is not running")
+
+    def unmount(self, layout: RemoteLayout) -> None:
+        with _WORKERS_LOCK:
+            self.layouts.pop(layout._id, None)
+        self.send(("unmount", layout._id))
+
+    def send(self, message: tuple[Any, ...]) -> bool:
+        """Send a message to the worker, returning whether that was possible"""
+        with self._send_lock:
+            try:
+                self._connection.send(message)
+            except (OSError, ValueError):
+                return False
+        return True
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.send(("stop",))
+
+    def _read(self) -> None:
+        while True:
+            try:
+                kind, layout_id, payload = self._connection.recv()
+            except (EOFError, OSError):
+                break
+            layout = self.layouts.get(layout_id)
+            if layout is not None:
+                layout._receive(kind, payload)
+
+        self.alive = False
+        if self._stopping:
+            return None
+        self.process.join(1)
+        message = (
+            f"The process rendering this widget exited unexpectedly "
+            f"(exit code {self.process.exitcode}). Re-display it to try again."
+        )
+        logger.error(f"Render worker {self.process.name!r} exited")
+        with _WORKERS_LOCK:
+            layouts, self.layouts = list(self.layouts.values()), {}
+        for layout in layouts:
+            layout._receive("error", message)
+
+
+@atexit.register
+def _stop_render_workers() -> None:
+    with _WORKERS_LOCK:
+        workers = list(_WORKERS)
+    for worker in workers:
+        worker.stop()
+
+
+def _dumps(value: Any) -> bytes:
+    if cloudpickle is not None:
+        return cloudpickle.dumps(value)
+    return pickle.dumps(value)
+
+
+# Everything below runs in worker processes. Each worker serves its layouts from one
+# event loop while a thread hands it the messages read from the kernel.
+
+
+def _run_worker(connection: Connection) -> None:
+    asyncio.run(_serve(connection))
+
+
+async def _serve(connection: Connection) -> None:
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue[tuple[Any, ...]] = asyncio.Queue()
+    Thread(target=_read_messages, args=(connection, loop, inbox), daemon=True).start()
+    layouts: dict[int, tuple[asyncio.Task[None], asyncio.Queue[Any]]] = {}
+    while True:
+        message = await inbox.get()
+        kind = message[0]
+        if kind == "stop":
+            break
+        layout_id = message[1]
+        if kind == "mount":
+            events: asyncio.Queue[Any] = asyncio.Queue()
+            task = loop.create_task(
+                _render_layout(connection, layout_id, message[2], events)
+            )
+            layouts[layout_id] = (task, events)
+            task.add_done_callback(lambda _, i=layout_id: layouts.pop(i, None))
+        elif kind == "event" and layout_id in layouts:
+            layouts[layout_id][1].put_nowait(message[2])
+        elif kind == "unmount" and layout_id in layouts:
+            layouts[layout_id][0].cancel()
+    for task, _ in list(layouts.values()):
+        task.cancel()
+
+
+def _read_messages(
+    connection: Connection,
+    loop: asyncio.AbstractEventLoop,
+    inbox: asyncio.Queue[tuple[Any, ...]],
+) -> None:
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            # the kernel exited
+            message = ("stop",)
+        loop.call_soon_threadsafe(inbox.put_nowait, message)
+        if message[0] == "stop":
+            return None
+
+
+async def _render_layout(
+    connection: Connection, layout_id: int, payload: bytes, events: asyncio.Queue[Any]
+) -> None:
+    try:
+        async with Layout(pickle.loads(payload)) as layout:
+            events_task = asyncio.create_task(_deliver_events(layout, events))
+            try:
+                while True:
+                    update = await layout.render()
+                    connection.send(("update", layout_id, update))
+            finally:
+                events_task.cancel()
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        connection.send(("error", layout_id, traceback.format_exc()))
+
+
+async def _deliver_events(layout: Layout, events: asyncio.Queue[Any]) -> None:
+    # each event is delivered as its own task so a slow handler holds back no others
+    deliveries: set[asyncio.Task[None]] = set()
+    try:
+        while True:
+            task = asyncio.create_task(layout.deliver(await events.get()))
+            deliveries.add(task)
+            task.add_done_callback(deliveries.discard)
+    finally:
+        for task in deliveries:
+            task.cancel()
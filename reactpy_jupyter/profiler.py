@@ -0,0 +1,269 @@
+"""Find out which components are slow to render
+
+Widgets created while a profile is active (see :func:`start_profile`) record, for each
+component they render, how often it rendered, its total render time including the
+components it contains, its self time excluding them, and the time its effects took.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import Counter
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable
+
+from attr import dataclass
+from reactpy.core.types import ComponentType
+
+from reactpy_jupyter.stats import NullStats, Stats, TimedLayout
+
+_PROFILE: Profile | None = None
+_LATEST_PROFILE: Profile | None = None
+
+_EFFECTS_FRAME = "(effects)"
+
+
+def start_profile() -> Profile:
+    """Profile the renders of widgets created from now on"""
+    global _PROFILE, _LATEST_PROFILE
+    _PROFILE = _LATEST_PROFILE = Profile()
+    return _PROFILE
+
+
+def stop_profile() -> Profile | None:
+    """Stop profiling newly created widgets and return the active profile
+
+    Widgets which were created while profiling continue to record to the profile.
+    """
+    global _PROFILE
+    profile, _PROFILE = _PROFILE, None
+    return profile
+
+
+def current_profile() -> Profile | None:
+    """The profile widgets created now would record to, if any"""
+    return _PROFILE
+
+
+def latest_profile() -> Profile | None:
+    """The most recently started profile, even if it has been stopped"""
+    return _LATEST_PROFILE
+
+
+@dataclass
+class ComponentTimes:
+    """The time, in seconds, spent rendering one kind of component"""
+
+    renders: int = 0
+    total_time: float = 0.0
+    self_time: float = 0.0
+    effect_time: float = 0.0
+
+
+_SORT_KEYS: dict[str, Callable[[tuple[str, ComponentTimes]], Any]] = {
+    "total": lambda item: -item[1].total_time,
+    "self": lambda item: -item[1].self_time,
+    "effects": lambda item: -item[1].effect_time,
+    "renders": lambda item: -item[1].renders,
+    "name": lambda item: item[0],
+}
+
+
+class Profile:
+    """Component render times collected from any number of widgets"""
+
+    def __init__(self) -> None:
+        self.components: dict[str, ComponentTimes] = {}
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        """Self time of each stack of component names, outermost first"""
+        self._lock = Lock()
+
+    def record_render(
+        self, stack: tuple[str, ...], total_time: float, self_time: float
+    ) -> None:
+        with self._lock:
+            times = self._get_times(stack[-1])
+            times.renders += 1
+            times.total_time += total_time
+            times.self_time += self_time
+            self.stacks[stack] += self_time
+
+    def record_effects(self, stack: tuple[str, ...], elapsed: float) -> None:
+        with self._lock:
+            self._get_times(stack[-1]).effect_time += elapsed
+            self.stacks[(*stack, _EFFECTS_FRAME)] += elapsed
+
+    def table(self, sort: str = "total", limit: int | None = None) -> str:
+        """Format the times of each component as a plain text table
+
+        Rows may be sorted by ``total``, ``self``, ``effects``, ``renders`` or ``name``.
+        """
+        with self._lock:
+            items = sorted(self.components.items(), key=_SORT_KEYS[sort])[:limit]
+        name_width = max([len(name) for name, _ in items] + [len("component")])
+        columns = ("renders", "total ms", "self ms", "effects ms", "mean ms")
+        lines = [f"{'component':<{name_width}}" + "".join(f"{c:>12}" for c in columns)]
+        for name, times in items:
+            ms = [
+                times.total_time * 1000,
+                times.self_time * 1000,
+                times.effect_time * 1000,
+                times.total_time * 1000 / times.renders if times.renders else 0,
+            ]
+            lines.append(
+                f"{name:<{name_width}}{times.renders:>12}"
+                + "".join(f"{t:>12.2f}" for t in ms)
+            )
+        return "\n".join(lines)
+
+    def collapsed_stacks(self) -> str:
+        """Export self times, in microseconds, in the collapsed stack format
+
+        This is the format read by ``flamegraph.pl`` and most other flame graph tools.
+        """
+        with self._lock:
+            stacks = list(self.stacks.items())
+        return "\n".join(
+            f"{';'.join(stack)} {round(elapsed * 1e6)}" for stack, elapsed in stacks
+        )
+
+    def speedscope(self, name: str = "ReactPy renders") -> dict[str, Any]:
+        """Export self times as a sampled profile for https://www.speedscope.app"""
+        with self._lock:
+            stacks = list(self.stacks.items())
+        frame_indices: dict[str, int] = {}
+        samples = []
+        weights = []
+        for stack, elapsed in stacks:
+            samples.append(
+                [frame_indices.setdefault(f, len(frame_indices)) for f in stack]
+            )
+            weights.append(round(elapsed * 1e6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "reactpy_jupyter",
+            "name": name,
+            "shared": {"frames": [{"name": f} for f in frame_indices]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "microseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+    def save(self, path: str | Path) -> None:
+        """Save as a speedscope profile if the path ends in ``.json``, otherwise as
+        collapsed stacks"""
+        path = Path(path)
+        if path.suffix == ".json":
+            path.write_text(json.dumps(self.speedscope()))
+        else:
+            path.write_text(self.collapsed_stacks() + "\n")
+
+    def _get_times(self, name: str) -> ComponentTimes:
+        times = self.components.get(name)
+        if times is None:
+            times = self.components[name] = ComponentTimes()
+        return times
+
+
+class ProfiledLayout(TimedLayout):
+    """A layout which records the render times of its components to a profile"""
+
+    def __init__(
+        self, root: ComponentType, stats: Stats | NullStats, profile: Profile
+    ) -> None:
+        super().__init__(root, stats)
+        self._profile = profile
+        self._frames: list[_Frame] = []
+
+    def _render_component(
+        self,
+        exit_stack: Any,
+        old_state: Any,
+        new_state: Any,
+        component: ComponentType,
+    ) -> None:
+        # children are rendered with the exit stack given to their parent
+        if isinstance(exit_stack, _EffectTimer):
+            exit_stack = exit_stack.exit_stack
+
+        if self._frames:
+            stack = (*self._frames[-1].stack, _component_name(component))
+        else:
+            stack = (*_ancestor_names(new_state), _component_name(component))
+        frame = _Frame(stack)
+        self._frames.append(frame)
+        start = perf_counter()
+        try:
+            super()._render_component(
+                _EffectTimer(exit_stack, self._profile, stack),
+                old_state,
+                new_state,
+                component,
+            )
+        finally:
+            total_time = perf_counter() - start
+            self._frames.pop()
+            if self._frames:
+                self._frames[-1].child_time += total_time
+            self._profile.record_render(
+                stack, total_time, total_time - frame.child_time
+            )
+
+
+class _Frame:
+    __slots__ = "stack", "child_time"
+
+    def __init__(self, stack: tuple[str, ...]) -> None:
+        self.stack = stack
+        self.child_time = 0.0
+
+
+class _EffectTimer:
+    """Stands in for the exit stack of a render to time the effects registered to it"""
+
+    __slots__ = "exit_stack", "_profile", "_stack"
+
+    def __init__(self, exit_stack: Any, profile: Profile, stack: tuple[str, ...]):
+        self.exit_stack = exit_stack
+        self._profile = profile
+        self._stack = stack
+
+    def callback(self, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        def timed_callback() -> None:
+            start = perf_counter()
+            try:
+                function(*args, **kwargs)
+            finally:
+                self._profile.record_effects(self._stack, perf_counter() - start)
+
+        return self.exit_stack.callback(timed_callback)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.exit_stack, name)
+
+
+def _ancestor_names(model_state: Any) -> tuple[str, ...]:
+    names = []
+    while True:
+        try:
+            model_state = model_state.parent
+        except AttributeError:
+            break  # reached the root
+        if model_state.is_component_state:
+            names.append(_component_name(model_state.life_cycle_state.component))
+    return tuple(reversed(names))
+
+
+def _component_name(component: ComponentType) -> str:
+    component_type = getattr(component, "type", None)
+    return getattr(component_type, "__qualname__", None) or type(component).__qualname__
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import Future
+from queue import Queue as SyncQueue
+from threading import Lock, Thread, get_ident
+from typing import Any, Callable, Coroutine
+from weakref import WeakKeyDictionary
+
+from reactpy_jupyter.config import (
+    REACTPY_JUPYTER_RENDER_LOOP,
+    REACTPY_JUPYTER_RENDER_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+_RENDER_LOOPS: list[RenderLoop] = []
+_RENDER_LOOPS_LOCK = Lock()
+_KERNEL_LOOPS: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, KernelLoop
+] = WeakKeyDictionary()
+
+
+def acquire_render_loop() -> RenderLoop | KernelLoop:
+    """Get the loop a new widget should render in
+
+    This is the event loop running in the current thread if
+    :data:`~reactpy_jupyter.config.REACTPY_JUPYTER_RENDER_LOOP` is ``"kernel"`` and
+    there is one. Otherwise it's the least busy of the kernel's shared render loops,
+    new ones being started while there are fewer than
+    :data:`~reactpy_jupyter.config.REACTPY_JUPYTER_RENDER_THREADS`. The caller must
+    call ``release()`` once it no longer needs the loop.
+    """
+    if REACTPY_JUPYTER_RENDER_LOOP.current == "kernel":
+        kernel_loop = _acquire_kernel_loop()
+        if kernel_loop is not None:
+            return kernel_loop
+        logger.debug("No event loop is running - rendering in a thread instead")
+    return acquire_render_thread()
+
+
+def acquire_render_thread() -> RenderLoop:
+    """Get the least busy of the kernel's shared render loops, each in its own thread
+
+    The caller must call :meth:`RenderLoop.release` once it no longer needs the loop.
+    """
+    with _RENDER_LOOPS_LOCK:
+        if len(_RENDER_LOOPS) < REACTPY_JUPYTER_RENDER_THREADS.current:
+            render_loop = RenderLoop(f"reactpy-render-loop-{len(_RENDER_LOOPS)}")
+            _RENDER_LOOPS.append(render_loop)
+        else:
+            render_loop = min(_RENDER_LOOPS, key=lambda r: r.user_count)
+        render_loop.user_count += 1
+        return render_loop
+
+
+class RenderLoop:
+    """An asyncio event loop, running in a daemon thread, that is shared by widgets"""
+
+    def __init__(self, name: str) -> None:
+        loop_q: SyncQueue[asyncio.AbstractEventLoop] = SyncQueue()
+        self.user_count = 0
+        self.thread = Thread(target=self._run, args=(loop_q,), name=name, daemon=True)
+        self.thread.start()
+        self.loop = loop_q.get()
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Future[Any]:
+        """Schedule a coroutine to run as a task on this loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, function: Callable[..., Any], *args: Any) -> None:
+        """Schedule a function to be called from within this loop"""
+        self.loop.call_soon_threadsafe(function, *args)
+
+    def release(self) -> None:
+        """Indicate that one fewer widget is making use of this loop"""
+        with _RENDER_LOOPS_LOCK:
+            self.user_count -= 1
+
+    def _run(self, loop_q: SyncQueue[asyncio.AbstractEventLoop]) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop_q.put(loop)
+        loop.run_forever()
+
+
+class KernelLoop:
+    """An asyncio event loop which was already running, typically the kernel's own
+
+    Functions scheduled from the loop's own thread are called without waking it.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.user_count = 0
+        self.loop = loop
+        self._thread_id = get_ident()
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Future[Any]:
+        """Schedule a coroutine to run as a task on this loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, function: Callable[..., Any], *args: Any) -> None:
+        """Schedule a function to be called from within this loop"""
+        if get_ident() == self._thread_id:
+            self.loop.call_soon(function, *args)
+        else:
+            self.loop.call_soon_threadsafe(function, *args)
+
+    def release(self) -> None:
+        """Indicate that one fewer widget is making use of this loop"""
+        with _RENDER_LOOPS_LOCK:
+            self.user_count -= 1
+
+
+def _acquire_kernel_loop() -> KernelLoop | None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    with _RENDER_LOOPS_LOCK:
+        kernel_loop = _KERNEL_LOOPS.get(loop)
+        if kernel_loop is None:
+            kernel_loop = _KERNEL_LOOPS[loop] = KernelLoop(loop)
+        kernel_loop.user_count += 1
+        return kernel_loop
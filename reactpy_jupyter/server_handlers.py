@@ -0,0 +1,97 @@
+"""Handlers the Jupyter server extension uses to serve web modules
+
+This imports the notebook server so it's only imported once the extension is loaded.
+"""
+
+from __future__ import annotations
+
+import mimetypes
+import os
+from pathlib import Path
+from typing import Any
+
+from notebook.base.handlers import AuthenticatedFileHandler, IPythonHandler
+from tornado import web
+
+from .web_modules import (
+    IMMUTABLE_CACHE_CONTROL,
+    WebModuleStore,
+    resolve_hashed_module,
+    select_variant,
+    web_module_manifest,
+)
+
+
+class WebModuleManifestHandler(IPythonHandler):
+    """Maps the name of each web module to its content-hashed path"""
+
+    def initialize(self, path: str) -> None:
+        self.root = Path(path)
+
+    @web.authenticated
+    def get(self) -> None:
+        # the manifest changes whenever modules do - tornado adds an ETag to revalidate
+        self.set_header("Cache-Control", "no-cache")
+        self.finish(web_module_manifest(self.root))
+
+
+class WebModuleHandler(AuthenticatedFileHandler):
+    """Serves web modules by name, noting their use so they are not collected"""
+
+    @web.authenticated
+    def get(self, path: str) -> Any:
+        WebModuleStore(self.root).record_access(path)
+        return super().get(path)
+
+
+class HashedWebModuleHandler(AuthenticatedFileHandler):
+    """Serves web modules at paths containing a digest of their content
+
+    Since content at these paths never changes, browsers are told to cache it for a
+    year without revalidating. Precompressed variants are sent to clients that accept
+    them.
+    """
+
+    _content_encoding = ""
+
+    @web.authenticated
+    def head(self, digest: str, path: str) -> Any:
+        return self._get_hashed(digest, path, include_body=False)
+
+    @web.authenticated
+    def get(self, digest: str, path: str) -> Any:
+        return self._get_hashed(digest, path, include_body=True)
+
+    def _get_hashed(self, digest: str, path: str, include_body: bool) -> Any:
+        self.check_xsrf_cookie()
+        # stale URLs must not be cached as if they were the module's current content
+        if resolve_hashed_module(Path(self.root), digest, path) is None:
+            raise web.HTTPError(404)
+        WebModuleStore(self.root).record_access(path)
+        return web.StaticFileHandler.get(self, path, include_body=include_body)
+
+    def validate_absolute_path(self, root: str, absolute_path: str) -> str | None:
+        absolute_path = super().validate_absolute_path(root, absolute_path)
+        encoding, served_path = select_variant(
+            Path(absolute_path),
+            os.stat(absolute_path),
+            self.request.headers.get("Accept-Encoding", ""),
+            mimetypes.guess_type(absolute_path)[0] or "",
+        )
+        self._content_encoding = encoding
+        if encoding:
+            # newer versions of tornado remember the stat of the validated path
+            vars(self).pop("_stat_result", None)
+        return str(served_path)
+
+    def get_content_type(self) -> str:
+        # the content type of the module, not of its compressed variant
+        return mimetypes.guess_type(self.path)[0] or "application/octet-stream"
+
+    def set_headers(self) -> None:
+        # AuthenticatedFileHandler.set_headers would disable caching
+        web.StaticFileHandler.set_headers(self)
+        self.set_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        self.set_header("Vary", "Accept-Encoding")
+        if self._content_encoding:
+            self.set_header("Content-Encoding", self._content_encoding)
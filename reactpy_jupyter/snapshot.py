@@ -0,0 +1,285 @@
+"""Static representations of components for displays which can't show live widgets"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from html import escape
+from threading import Thread
+from typing import Any, Collection, Mapping
+
+from ipywidgets import Widget
+from reactpy.core.layout import Layout
+from reactpy.core.types import ComponentType
+
+from reactpy_jupyter.buffers import extract_buffers
+from reactpy_jupyter.render_loop import acquire_render_thread
+from reactpy_jupyter.updates import apply_update
+from reactpy_jupyter.widget_component import InnerWidgets, inner_widgets_context
+
+logger = logging.getLogger(__name__)
+
+WIDGET_MIME_TYPE = "application/vnd.jupyter.widget-view+json"
+HTML_MIME_TYPE = "text/html"
+# how long to wait for a component to render before leaving out its model
+RENDER_TIMEOUT = 5.0
+# how long displaying a new widget waits for it to render so it can be shown as HTML
+FIRST_RENDER_TIMEOUT = 1.0
+
+# elements which have no closing tag
+VOID_ELEMENTS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+
+
+def wants_mime_type(
+    mime_type: str,
+    include: Collection[str] | None = None,
+    exclude: Collection[str] | None = None,
+) -> bool:
+    """Whether a display asked for the given kind of representation"""
+    if include and mime_type not in include:
+        return False
+    return not (exclude and mime_type in exclude)
+
+
+def snapshot_mimebundle(
+    component: ComponentType,
+    include: Collection[str] | None = None,
+    exclude: Collection[str] | None = None,
+    max_renders: int = 1,
+    settle_time: float = 0.0,
+    shared_thread: bool = True,
+) -> dict[str, Any]:
+    """Represent the component as it renders without starting a widget
+
+    The component is only rendered if a representation other than plain text is
+    wanted. See :func:`render_model` for how long it's rendered.
+    """
+    data: dict[str, Any] = {}
+    if wants_mime_type("text/plain", include, exclude):
+        data["text/plain"] = repr(component)
+    wants_json = wants_mime_type("application/json", include, exclude)
+    wants_html = wants_mime_type(HTML_MIME_TYPE, include, exclude)
+    if wants_json or wants_html:
+        rendered = render_model(
+            component,
+            max_renders=max_renders,
+            settle_time=settle_time,
+            shared_thread=shared_thread,
+        )
+        if rendered is not None:
+            model, inner_widgets = rendered
+            if wants_json:
+                # binary values are left out - only their placeholders remain
+                data["application/json"] = extract_buffers(model)[0]
+            if wants_html:
+                data[HTML_MIME_TYPE] = model_to_html(model, inner_widgets)
+    return data
+
+
+def render_model(
+    component: ComponentType,
+    timeout: float = RENDER_TIMEOUT,
+    max_renders: int = 1,
+    settle_time: float = 0.0,
+    shared_thread: bool = True,
+) -> tuple[Any, dict[str, Widget]] | None:
+    """Render the component and return its model and the widgets it embeds
+
+    The layout renders once unless ``max_renders`` allows more, in which case it keeps
+    rendering, as its effects may cause it to, until no render is pending. A render
+    which takes longer than ``settle_time`` seconds to arrive is not waited for.
+    Returns None if rendering took longer than ``timeout``.
+
+    Rendering happens in one of the shared render threads so that this may be called
+    from within an event loop, or without ``shared_thread`` in a thread of its own which
+    exits once done. The layout is unmounted once rendered.
+    """
+    if not shared_thread:
+        return _render_model_in_new_thread(component, timeout, max_renders, settle_time)
+    render_loop = acquire_render_thread()
+    try:
+        future = render_loop.run(_render_model(component, max_renders, settle_time))
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"{component} did not render within {timeout} seconds")
+            return None
+    finally:
+        render_loop.release()
+
+
+def _render_model_in_new_thread(
+    component: ComponentType, timeout: float, max_renders: int, settle_time: float
+) -> tuple[Any, dict[str, Widget]] | None:
+    results: list[tuple[Any, dict[str, Widget]]] = []
+
+    def run() -> None:
+        coro = _render_model(component, max_renders, settle_time)
+        try:
+            results.append(asyncio.run(asyncio.wait_for(coro, timeout)))
+        except asyncio.TimeoutError:
+            logger.warning(f"{component} did not render within {timeout} seconds")
+
+    thread = Thread(target=run, name="reactpy-snapshot-render", daemon=True)
+    thread.start()
+    thread.join()
+    return results[0] if results else None
+
+
+async def _render_model(
+    component: ComponentType, max_renders: int, settle_time: float
+) -> tuple[Any, dict[str, Widget]]:
+    inner_widgets: dict[str, Widget] = {}
+
+    def add_inner_widget(widget: Widget) -> None:
+        inner_widgets[widget.model_id] = widget
+
+    root = inner_widgets_context(
+        component, value=InnerWidgets(add_inner_widget, _ignore)
+    )
+    # the effects which add embedded widgets have run once the render is returned
+    async with Layout(root) as layout:
+        model = apply_update({}, await layout.render())
+        for _ in range(max_renders - 1):
+            # let tasks the effects started schedule renders
+            await asyncio.sleep(0)
+            if not _has_pending_renders(layout):
+                break
+            try:
+                update = await asyncio.wait_for(layout.render(), settle_time)
+            except asyncio.TimeoutError:
+                break
+            model = apply_update(model, update)
+    return model, inner_widgets
+
+
+def _has_pending_renders(layout: Layout) -> bool:
+    # ReactPy keeps the components waiting to render in a private queue. Should it not
+    # be found, renders are assumed to be pending and waited for up to the settle time.
+    queue = getattr(layout, "_rendering_queue", None)
+    pending = getattr(queue, "_pending", None)
+    return pending is None or bool(pending)
+
+
+def _ignore(*args: Any) -> None:
+    return None
+
+
+def model_to_html(model: Any, inner_widgets: Mapping[str, Widget] | None = None) -> str:
+    """Render the model of a layout as static HTML
+
+    Widgets embedded with :func:`~reactpy_jupyter.widget_component.from_widget` are
+    replaced by their own HTML representation and elements from JavaScript modules by
+    their fallback. Event handlers and scripts are left out.
+    """
+    parts: list[str] = []
+    _add_model_html(parts, model, inner_widgets or {})
+    return "".join(parts)
+
+
+def widget_html(widget: Widget) -> str:
+    """The HTML representation of a widget, or its escaped text if it has none"""
+    bundle = widget._repr_mimebundle_(include=[HTML_MIME_TYPE, "text/plain"])
+    data = (bundle[0] if isinstance(bundle, tuple) else bundle) or {}
+    if HTML_MIME_TYPE in data:
+        return data[HTML_MIME_TYPE]
+    return f"<pre>{escape(data.get('text/plain', repr(widget)))}</pre>"
+
+
+_INNER_WIDGET_CLASS = "widget-model-id-"
+_TAG_NAME_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9-]*")
+_ATTRIBUTE_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_:.-]*")
+_CAMEL_CASE_PATTERN = re.compile(r"(?<!^)(?=[A-Z])")
+# attributes whose React names differ from their HTML ones (once lowercased)
+_HTML_ATTRIBUTE_NAMES = {
+    "classname": "class",
+    "htmlfor": "for",
+    "defaultvalue": "value",
+    "defaultchecked": "checked",
+    "acceptcharset": "accept-charset",
+    "httpequiv": "http-equiv",
+}
+
+
+def _add_model_html(parts: list[str], model: Any, inner_widgets: Mapping[str, Widget]):
+    if not isinstance(model, dict):
+        parts.append(escape(str(model), quote=False))
+        return None
+    if "error" in model:
+        if model["error"]:
+            parts.append(f"<pre>{escape(model['error'])}</pre>")
+        return None
+    if "importSource" in model:
+        fallback = model["importSource"].get("fallback")
+        if fallback is not None:
+            _add_model_html(parts, fallback, inner_widgets)
+        return None
+
+    attributes = model.get("attributes", {})
+    class_name = attributes.get("class", "")
+    if isinstance(class_name, str) and class_name.startswith(_INNER_WIDGET_CLASS):
+        widget = inner_widgets.get(class_name[len(_INNER_WIDGET_CLASS) :])
+        if widget is not None:
+            parts.append(widget_html(widget))
+            return None
+
+    tag = model.get("tagName", "")
+    if tag == "script":
+        return None
+    if not _TAG_NAME_PATTERN.fullmatch(tag):
+        # fragments, and anything which could not be a tag, only render their children
+        tag = ""
+    if tag:
+        parts.append(f"<{tag}{_html_attributes(attributes)}>")
+        if tag in VOID_ELEMENTS:
+            return None
+    for child in model.get("children", ()):
+        if tag == "style" and isinstance(child, str):
+            # style sheets are not escaped but must not close the element early
+            parts.append(child.replace("</", "<\\/"))
+        else:
+            _add_model_html(parts, child, inner_widgets)
+    if tag:
+        parts.append(f"</{tag}>")
+
+
+def _html_attributes(attributes: Mapping[str, Any]) -> str:
+    parts = []
+    for key, value in attributes.items():
+        if (
+            value is None
+            or value is False
+            or not _ATTRIBUTE_NAME_PATTERN.fullmatch(key)
+        ):
+            continue
+        if key == "style" and isinstance(value, dict):
+            value = ";".join(f"{_css_property(k)}:{v}" for k, v in value.items())
+        elif not isinstance(value, (str, int, float)):
+            # neither objects nor binary values have an HTML form
+            continue
+        name = _html_attribute_name(key)
+        if value is True:
+            parts.append(f" {name}")
+        else:
+            parts.append(f' {name}="{escape(str(value))}"')
+    return "".join(parts)
+
+
+def _html_attribute_name(key: str) -> str:
+    # ReactPy accepts attribute names in snake case and React's camel case
+    if key.startswith(("data", "aria")):
+        return _CAMEL_CASE_PATTERN.sub("-", key).replace("_", "-").lower()
+    name = key.replace("_", "").lower()
+    return _HTML_ATTRIBUTE_NAMES.get(name, name)
+
+
+def _css_property(key: str) -> str:
+    if key.startswith("--"):
+        # custom properties are case sensitive
+        return key
+    return _CAMEL_CASE_PATTERN.sub("-", key).replace("_", "-").lower()
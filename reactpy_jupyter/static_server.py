@@ -0,0 +1,166 @@
+"""A static file server for web modules, used when no Jupyter server can serve them"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from threading import Thread
+from typing import Any
+from urllib.parse import unquote, urlsplit
+
+from .web_modules import (
+    HASHED_PATH_PREFIX,
+    IMMUTABLE_CACHE_CONTROL,
+    MANIFEST_PATH,
+    WebModuleStore,
+    resolve_hashed_module,
+    select_variant,
+    web_module_manifest,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class StaticFileServer:
+    """Serves the files of a directory from a daemon thread
+
+    Requests are handled concurrently over persistent connections. Responses carry
+    validators (``ETag`` and ``Last-Modified``) and, where the client accepts them,
+    are compressed using precompressed ``.br`` or ``.gz`` variants of the files.
+    """
+
+    def __init__(self, directory: str | Path, host: str = "127.0.0.1", port: int = 0):
+        self.directory = Path(directory)
+
+        def make_handler(*args: Any, **kwargs: Any) -> _StaticFileHandler:
+            return _StaticFileHandler(*args, directory=str(self.directory), **kwargs)
+
+        # port 0 lets the OS pick a free port
+        self._server = ThreadingHTTPServer((host, port), make_handler)
+        self._server.daemon_threads = True
+        self._thread: Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> str:
+        """Start serving and return the server's URL"""
+        self._thread = Thread(
+            target=self._server.serve_forever,
+            name="reactpy-static-file-server",
+            daemon=True,
+        )
+        self._thread.start()
+        logger.debug(f"Serving {str(self.directory)!r} at {self.url}")
+        return self.url
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _StaticFileHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # headers and bodies are written separately - don't wait to coalesce them
+    disable_nagle_algorithm = True
+
+    def send_head(self) -> Any:
+        url_path = unquote(urlsplit(self.path).path).lstrip("/")
+        if url_path == MANIFEST_PATH:
+            return self._send_manifest()
+
+        path: Path | None
+        # only content at hashed paths, whose digest is checked, never changes
+        immutable = url_path.startswith(f"{HASHED_PATH_PREFIX}/")
+        if immutable:
+            _, digest, name = (url_path.split("/", 2) + ["", ""])[:3]
+            path = resolve_hashed_module(Path(self.directory), digest, name)
+        else:
+            name = url_path
+            path = Path(self.translate_path(self.path))
+        try:
+            stat = path.stat() if path is not None else None
+        except OSError:
+            stat = None
+        if path is None or stat is None or not path.is_file():
+            # directory listings are never needed
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        WebModuleStore(self.directory).record_access(name)
+        content_type = self.guess_type(str(path))
+        encoding, served_path = select_variant(
+            path, stat, self.headers.get("Accept-Encoding", ""), content_type
+        )
+        variant = f"-{encoding}" if encoding else ""
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{variant}"'
+
+        if self._is_not_modified(etag, stat.st_mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._send_cache_headers(etag, stat.st_mtime, immutable)
+            self.end_headers()
+            return None
+
+        try:
+            file = open(served_path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.fstat(file.fileno()).st_size))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self._send_cache_headers(etag, stat.st_mtime, immutable)
+        self.end_headers()
+        return file
+
+    def end_headers(self) -> None:
+        self.send_header("Access-Control-Allow-Origin", "*")
+        super().end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_manifest(self) -> BytesIO:
+        manifest = web_module_manifest(Path(self.directory))
+        body = json.dumps(manifest, sort_keys=True).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        # the manifest changes whenever modules do
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return BytesIO(body)
+
+    def _send_cache_headers(self, etag: str, mtime: float, immutable: bool) -> None:
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        self.send_header("Vary", "Accept-Encoding")
+        if immutable:
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        else:
+            self.send_header("Cache-Control", "no-cache")
+
+    def _is_not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return etag in tags or "*" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
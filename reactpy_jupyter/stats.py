@@ -0,0 +1,229 @@
+"""Counters and histograms describing what widgets cost to render and communicate with
+
+Stats are only recorded by widgets created while
+:data:`~reactpy_jupyter.config.REACTPY_JUPYTER_STATS` is enabled. Other widgets share
+a :class:`NullStats` object whose methods do nothing.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, deque
+from time import perf_counter
+from typing import Any, Callable, Sequence
+from weakref import WeakSet
+
+from reactpy.core.layout import Layout
+from reactpy.core.types import ComponentType, LayoutUpdateMessage
+
+from reactpy_jupyter.config import REACTPY_JUPYTER_STATS
+from reactpy_jupyter.wire_format import message_size
+
+_ALL_STATS: WeakSet[Stats] = WeakSet()
+
+
+def create_stats(gauges: Callable[[], dict[str, int]]) -> Stats | NullStats:
+    """Create stats for a new widget, or get the null stats if they are disabled
+
+    The ``gauges`` callback reports the current value of quantities, like queue
+    depths, which go up and down.
+    """
+    if not REACTPY_JUPYTER_STATS.current:
+        return NULL_STATS
+    stats = Stats(gauges)
+    _ALL_STATS.add(stats)
+    return stats
+
+
+def kernel_stats() -> dict[str, Any]:
+    """Combine the stats of every open widget in this kernel which records them"""
+    all_stats = list(_ALL_STATS)
+    counters: Counter[str] = Counter()
+    gauges: Counter[str] = Counter()
+    histograms: dict[str, Histogram] = {}
+    for stats in all_stats:
+        counters.update(stats.counters.copy())
+        gauges.update(stats.gauges())
+        for name, histogram in list(stats.histograms.items()):
+            histograms.setdefault(name, Histogram()).merge(histogram)
+    return {
+        "widgets": len(all_stats),
+        "counters": dict(counters),
+        "gauges": dict(gauges),
+        "histograms": {name: h.summary() for name, h in histograms.items()},
+    }
+
+
+def format_stats(stats: dict[str, Any]) -> str:
+    """Format a summary of stats as a plain text table"""
+    lines = []
+    for section in ("counters", "gauges"):
+        for name, value in sorted(stats[section].items()):
+            lines.append(f"{name:<28}{value:>12}")
+    if stats["histograms"]:
+        header = "".join(f"{c:>12}" for c in ("count", "mean", "p50", "p99", "max"))
+        lines.append("")
+        lines.append(f"{'':<28}{header}")
+        for name, summary in sorted(stats["histograms"].items()):
+            scale = 1000 if name.endswith("_seconds") else 1
+            label = name.replace("_seconds", "_ms")
+            values = f"{summary['count']:>12}" + "".join(
+                f"{summary[k] * scale:>12.2f}" for k in ("mean", "p50", "p99", "max")
+            )
+            lines.append(f"{label:<28}{values}")
+    return "\n".join(lines)
+
+
+class Histogram:
+    """Summarizes a stream of measurements
+
+    Percentiles are estimated from a bounded sample of the most recent measurements.
+    """
+
+    __slots__ = "count", "total", "max", "_samples"
+
+    def __init__(self, sample_size: int = 1024) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples: deque[float] = deque(maxlen=sample_size)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._samples.append(value)
+
+    def merge(self, other: Histogram) -> None:
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self._samples.extend(other._samples)
+
+    def summary(self) -> dict[str, float]:
+        samples = sorted(self._samples)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": _percentile(samples, 0.5),
+            "p90": _percentile(samples, 0.9),
+            "p99": _percentile(samples, 0.99),
+            "max": self.max,
+        }
+
+
+class Stats:
+    """The stats recorded by one widget
+
+    Methods must only be called from the widget's render loop.
+    """
+
+    enabled = True
+
+    def __init__(self, gauges: Callable[[], dict[str, int]]) -> None:
+        self.counters: Counter[str] = Counter()
+        self.histograms: dict[str, Histogram] = {}
+        self.gauges = gauges
+        self._first_event_time: float | None = None
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def observe(self, name: str, value: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def event_received(self, received_at: float) -> None:
+        """Note the arrival, at the given :func:`~time.perf_counter` time, of an event"""
+        if self._first_event_time is None:
+            self._first_event_time = received_at
+
+    def update_sent(self) -> None:
+        """Note that an update, possibly caused by earlier events, was sent"""
+        if self._first_event_time is not None:
+            self.observe(
+                "event_to_update_seconds", perf_counter() - self._first_event_time
+            )
+            self._first_event_time = None
+
+    def message_sent(self, content: dict[str, Any], buffers: Sequence[bytes]) -> None:
+        self._message("sent", content, buffers)
+
+    def message_received(self, content: dict[str, Any], buffers: Sequence[Any]) -> None:
+        self._message("received", content, buffers)
+
+    def snapshot(self) -> dict[str, Any]:
+        # copies are made in single steps since the render loop may be recording
+        return {
+            "counters": self.counters.copy(),
+            "gauges": self.gauges(),
+            "histograms": {
+                name: h.summary() for name, h in list(self.histograms.items())
+            },
+        }
+
+    def close(self) -> None:
+        """Stop including these stats in the kernel-wide aggregate"""
+        _ALL_STATS.discard(self)
+
+    def _message(self, direction: str, content: dict[str, Any], buffers: Any) -> None:
+        size = message_size(content, buffers)
+        self.count(f"messages_{direction}")
+        self.count(f"bytes_{direction}", size)
+        self.observe(f"{direction}_message_bytes", size)
+
+
+class NullStats:
+    """Stands in for :class:`Stats` when they are disabled"""
+
+    enabled = False
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def observe(self, name: str, value: float) -> None:
+        pass
+
+    def event_received(self, received_at: float) -> None:
+        pass
+
+    def update_sent(self) -> None:
+        pass
+
+    def message_sent(self, content: dict[str, Any], buffers: Sequence[bytes]) -> None:
+        pass
+
+    def message_received(self, content: dict[str, Any], buffers: Sequence[Any]) -> None:
+        pass
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"counters": {}, "gauges": {}, "histograms": {}}
+
+    def close(self) -> None:
+        pass
+
+
+NULL_STATS = NullStats()
+
+
+class TimedLayout(Layout):
+    """A layout which records how long each of its renders take"""
+
+    def __init__(self, root: ComponentType, stats: Stats | NullStats) -> None:
+        super().__init__(root)
+        self._stats = stats
+
+    def _create_layout_update(self, *args: Any, **kwargs: Any) -> LayoutUpdateMessage:
+        start = perf_counter()
+        try:
+            return super()._create_layout_update(*args, **kwargs)
+        finally:
+            self._stats.observe("render_seconds", perf_counter() - start)
+            self._stats.count("renders")
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
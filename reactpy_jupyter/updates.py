@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Sequence
+
+from reactpy.core.types import LayoutUpdateMessage
+
+from reactpy_jupyter.buffers import SentBuffers
+
+
+class UpdateHistory:
+    """A bounded record of the most recent versioned layout updates"""
+
+    def __init__(self, size: int) -> None:
+        self._updates: deque[dict[str, Any]] = deque(maxlen=size)
+
+    def append(self, update: dict[str, Any]) -> None:
+        """Record an update with a ``version`` one greater than the last"""
+        self._updates.append(update)
+
+    def since(self, version: int) -> list[dict[str, Any]] | None:
+        """Get the updates which follow the given version
+
+        Returns ``None`` if some of those updates have already been discarded, or the
+        version is not one this history has seen.
+        """
+        if not self._updates:
+            return None
+        first_version = self._updates[0]["version"]
+        if not (first_version - 1 <= version <= self._updates[-1]["version"]):
+            return None
+        return list(self._updates)[version - first_version + 1 :]
+
+    def clear(self) -> None:
+        self._updates.clear()
+
+
+class ViewOutbox:
+    """Flow control for the updates sent to one view
+
+    Once a view has fallen ``window`` versions behind what it acknowledged, further
+    updates are held back. Held updates which are overwritten by a later one are
+    dropped and, should more than ``maxsize`` remain, they are all discarded in
+    favor of resending the full model. The binary values the view has been sent are
+    tracked too, up to ``buffers_size`` bytes of them.
+    """
+
+    def __init__(
+        self, window: int, maxsize: int, version: int, buffers_size: int = 0
+    ) -> None:
+        self.sent_version = version
+        self.acked_version = version
+        self.pending: list[dict[str, Any]] = []
+        self.needs_resync = False
+        self.sent_buffers = SentBuffers(buffers_size)
+        self._window = window
+        self._maxsize = maxsize
+
+    @property
+    def is_behind(self) -> bool:
+        return self.sent_version - self.acked_version >= self._window
+
+    def hold(self, message: dict[str, Any]) -> None:
+        """Hold an update or batch of updates until the view catches up"""
+        if self.needs_resync:
+            return None
+        if message["type"] == "layout-update-batch":
+            updates = message["updates"]
+        else:
+            updates = [message]
+        for update in updates:
+            self.pending = [
+                u for u in self.pending if not _path_covers(update["path"], u["path"])
+            ]
+            self.pending.append(update)
+        if len(self.pending) > self._maxsize:
+            self.pending.clear()
+            self.needs_resync = True
+
+
+def apply_update(model: Any, update: LayoutUpdateMessage) -> Any:
+    """Return a copy of the model with the given update applied
+
+    Only the containers along the update's path are copied. The given model is left
+    unchanged so that it can still be read safely as a snapshot from other threads.
+    """
+    path = update["path"]
+    if not path:
+        return update["model"]
+    return _replace_at(model, path.split("/")[1:], update["model"])
+
+
+def collapse_updates(
+    updates: Sequence[LayoutUpdateMessage],
+) -> list[LayoutUpdateMessage]:
+    """Drop updates which are overwritten by a later update to the same or a parent path
+
+    The order of the remaining updates is preserved so they can be applied in sequence.
+    """
+    kept: list[LayoutUpdateMessage] = []
+    for update in reversed(updates):
+        if not any(_path_covers(k["path"], update["path"]) for k in kept):
+            kept.append(update)
+    kept.reverse()
+    return kept
+
+
+def find_imported_modules(model: Any) -> set[str]:
+    """The names of the modules which elements of the model import from the server
+
+    Modules imported by URL are left out since views have no need to resolve them.
+    """
+    names = set()
+    stack = [model]
+    while stack:
+        element = stack.pop()
+        if not isinstance(element, dict):
+            continue
+        import_source = element.get("importSource")
+        if import_source and import_source.get("sourceType", "NAME") == "NAME":
+            names.add(import_source["source"])
+        stack.extend(element.get("children", ()))
+    return names
+
+
+def _path_covers(parent: str, child: str) -> bool:
+    return not parent or child == parent or child.startswith(parent + "/")
+
+
+def _replace_at(container: Any, parts: list[str], value: Any) -> Any:
+    key: Any = parts[0].replace("~1", "/").replace("~0", "~")
+    if isinstance(container, list):
+        key = int(key)
+        new_container = container.copy()
+    else:
+        new_container = dict(container)
+    if len(parts) == 1:
+        new_container[key] = value
+    else:
+        new_container[key] = _replace_at(container[key], parts[1:], value)
+    return new_container
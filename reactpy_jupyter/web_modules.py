@@ -0,0 +1,492 @@
+"""Content addressing, compression and storage of the web modules served to views
+
+Modules are published under URLs which contain a digest of their content, so
+browsers may cache them indefinitely. A manifest maps each module's name to that URL.
+"""
+
+from __future__ import annotations
+
+import filecmp
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from stat import S_ISLNK
+from threading import Lock, Thread
+from typing import IO, Any, Iterable, Iterator
+from uuid import uuid4
+
+from .config import (
+    REACTPY_JUPYTER_WEB_MODULES_MAX_AGE,
+    REACTPY_JUPYTER_WEB_MODULES_MAX_SIZE,
+)
+
+try:
+    import fcntl
+except ImportError:  # nocov
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+HASHED_PATH_PREFIX = "_hashed"
+MANIFEST_PATH = "_manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST_SIZE = 10
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json")
+_MIN_COMPRESSED_SIZE = 1024
+_VARIANT_SUFFIXES = (".br", ".gz", ".tmp")
+
+STORE_DIRECTORY = ".store"
+# modules used this recently are never collected since a kernel may have just made them
+_GRACE_PERIOD = 60 * 60
+# how often the last access of a module is recorded
+_ACCESS_RESOLUTION = 60 * 60
+_TEMP_FILE_MAX_AGE = 60
+
+# digests are only recomputed when a file's modification time or size changes
+_DIGESTS: dict[Path, tuple[int, int, str]] = {}
+_DIGESTS_LOCK = Lock()
+
+
+def module_digest(path: Path) -> str:
+    """A digest of the file's content"""
+    stat = path.stat()
+    with _DIGESTS_LOCK:
+        cached = _DIGESTS.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    digest = hashlib.blake2b(path.read_bytes(), digest_size=_DIGEST_SIZE).hexdigest()
+    with _DIGESTS_LOCK:
+        _DIGESTS[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def hashed_module_path(name: str, digest: str) -> str:
+    """The path, relative to where modules are served, of a module with this digest"""
+    return f"{HASHED_PATH_PREFIX}/{digest}/{name}"
+
+
+def resolve_hashed_module(directory: Path, digest: str, name: str) -> Path | None:
+    """Find the module with the given name if its content still has the given digest"""
+    path = resolve_module(directory, name)
+    if path is None:
+        return None
+    try:
+        return path if module_digest(path) == digest else None
+    except OSError:
+        return None
+
+
+def resolve_module(directory: Path, name: str) -> Path | None:
+    """Find the module with the given name in the directory"""
+    # modules may be symlinks to files elsewhere so only forbid escaping by name
+    parts = Path(name).parts
+    if not parts or Path(name).is_absolute() or ".." in parts:
+        return None
+    path = directory / name
+    return path if _is_module(path) else None
+
+
+def web_module_manifest(directory: Path) -> dict[str, dict[str, str]]:
+    """Map the name of each module in the directory to its content-hashed path"""
+    modules = {}
+    for path in _iter_modules(directory):
+        name = path.relative_to(directory).as_posix()
+        try:
+            modules[name] = hashed_module_path(name, module_digest(path))
+        except OSError:  # nocov
+            # the file was removed while listing the directory
+            continue
+    return {"modules": modules}
+
+
+def select_variant(
+    path: Path, stat: os.stat_result, accept_encoding: str, content_type: str
+) -> tuple[str, Path]:
+    """Choose an encoding the client accepts and the file to serve for it
+
+    Brotli compressed ``.br`` variants are used when they exist. Otherwise, a ``.gz``
+    variant of compressible files is used, and created if needed. Returns an empty
+    encoding and the given path if the file should be sent as is.
+    """
+    accepted = {e.split(";", 1)[0].strip() for e in accept_encoding.split(",")}
+    if "br" in accepted:
+        br_path = path.with_name(path.name + ".br")
+        if _is_fresh_variant(br_path, stat):
+            return "br", br_path
+    if "gzip" in accepted and content_type.startswith(_COMPRESSIBLE_TYPES):
+        gz_path = path.with_name(path.name + ".gz")
+        if _is_fresh_variant(gz_path, stat) or (
+            stat.st_size >= _MIN_COMPRESSED_SIZE and _write_gzip(path, gz_path)
+        ):
+            return "gzip", gz_path
+    return "", path
+
+
+def collect_web_modules(
+    max_size: int | None = None, max_age: float | None = None
+) -> dict[str, Any]:
+    """Remove the least recently used web modules
+
+    Modules are removed, oldest first, while they take up more than ``max_size``
+    bytes or were last used more than ``max_age`` seconds ago. Both default to the
+    ``REACTPY_JUPYTER_WEB_MODULES_MAX_SIZE`` and ``REACTPY_JUPYTER_WEB_MODULES_MAX_AGE``
+    options and are ignored if 0. Returns what was removed and the remaining size.
+    """
+    from .jupyter_server_extension import REACTPY_WEB_MODULES_DIR
+
+    return WebModuleStore(REACTPY_WEB_MODULES_DIR.current).collect_garbage(
+        REACTPY_JUPYTER_WEB_MODULES_MAX_SIZE.current if max_size is None else max_size,
+        REACTPY_JUPYTER_WEB_MODULES_MAX_AGE.current if max_age is None else max_age,
+    )
+
+
+def collect_web_modules_in_background() -> None:
+    """Collect web modules in a daemon thread, logging rather than raising errors"""
+    Thread(
+        target=_collect_web_modules_quietly,
+        name="reactpy-web-module-gc",
+        daemon=True,
+    ).start()
+
+
+def _collect_web_modules_quietly() -> None:
+    try:
+        report = collect_web_modules()
+    except Exception:  # nocov
+        logger.exception("Failed to collect web modules")
+    else:
+        logger.debug(f"Collected web modules - {report}")
+
+
+def record_web_modules_used(names: Iterable[str]) -> None:
+    """Note that a kernel's layouts use these modules so they are not collected
+
+    Kernels record this as they render layouts since the files of modules ReactPy
+    already had are not written again, and browsers may not have requested them yet.
+    The store is updated in a background thread, with the modules of every call made
+    in the meantime, so that renders never wait on its lock.
+    """
+    with _USED_MODULES_LOCK:
+        scheduled = bool(_USED_MODULES)
+        _USED_MODULES.update(names)
+        if scheduled or not _USED_MODULES:
+            return None
+    _USED_MODULES_RECORDER.submit(_record_used_modules)
+
+
+def _record_used_modules() -> None:
+    from .jupyter_server_extension import REACTPY_WEB_MODULES_DIR
+
+    with _USED_MODULES_LOCK:
+        names = sorted(_USED_MODULES)
+        _USED_MODULES.clear()
+    try:
+        WebModuleStore(REACTPY_WEB_MODULES_DIR.current).record_access(*names)
+    except Exception:  # nocov
+        logger.exception("Failed to record the web modules used")
+
+
+class WebModuleStore:
+    """Deduplicates the modules of a directory and removes those no longer used
+
+    Each module is made a hard link to an object, named by the digest of its content,
+    in a hidden ``.store`` directory so that modules with the same content are only
+    stored once. An index records the digest, size and last access of each module.
+    The store is locked while it's changed so that all the kernels and servers which
+    share the directory may use it at once.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self._store = self.directory / STORE_DIRECTORY
+        self._objects = self._store / "objects"
+        self._index_file = self._store / "index.json"
+        self._lock_file = self._store / "lock"
+
+    def sync(self) -> dict[str, dict[str, Any]]:
+        """Add new or changed modules to the store and return its index"""
+        with self._locked():
+            index = self._read_index()
+            self._sync(index)
+            self._write_index(index)
+        return index
+
+    def record_access(self, *names: str) -> None:
+        """Note that these modules were just used"""
+        now = time.time()
+        with _ACCESS_LOCK:
+            names = tuple(
+                name
+                for name in names
+                if now - _LAST_RECORDED_ACCESS.get((self.directory, name), 0)
+                >= _ACCESS_RESOLUTION
+            )
+            for name in names:
+                _LAST_RECORDED_ACCESS[(self.directory, name)] = now
+        if not names:
+            return None
+        try:
+            with self._locked():
+                index = self._read_index()
+                for name in names:
+                    if name not in index:
+                        # new modules are added now so they're not indexed as old ones
+                        path = resolve_module(self.directory, name)
+                        if path is not None:
+                            self._sync_module(index, name, path)
+                    if name in index:
+                        index[name]["accessed"] = now
+                self._write_index(index)
+        except OSError as error:  # nocov
+            logger.debug(f"Could not record access to web modules {names} - {error}")
+
+    def collect_garbage(self, max_size: int, max_age: float) -> dict[str, Any]:
+        """Remove modules, least recently used first, until within the given limits
+
+        Modules used within the last hour are always kept. Leftover temporary files and
+        objects no module links to any longer are removed as well.
+        """
+        now = time.time()
+        removed = []
+        freed = 0
+        with self._locked():
+            index = self._read_index()
+            self._sync(index)
+
+            # objects shared by several modules are only freed with the last of them
+            references: dict[str, int] = {}
+            sizes: dict[str, int] = {}
+            for entry in index.values():
+                references[entry["digest"]] = references.get(entry["digest"], 0) + 1
+                sizes[entry["digest"]] = entry["size"]
+            size = sum(sizes.values())
+
+            for name, entry in sorted(index.items(), key=lambda i: i[1]["accessed"]):
+                idle = now - entry["accessed"]
+                expired = bool(max_age) and idle > max_age
+                too_big = bool(max_size) and size > max_size
+                if idle < _GRACE_PERIOD or not (expired or too_big):
+                    # later modules were all used more recently
+                    break
+                path = self.directory / name
+                for file in (path, *_variants_of(path)):
+                    freed += _remove_file(file)
+                _remove_empty_parents(path, self.directory)
+                del index[name]
+                removed.append(name)
+                references[entry["digest"]] -= 1
+                if not references[entry["digest"]]:
+                    size -= entry["size"]
+
+            freed += self._remove_leftovers(now)
+            self._write_index(index)
+        return {"removed": removed, "freed_bytes": freed, "size": size}
+
+    def _sync(self, index: dict[str, dict[str, Any]]) -> None:
+        names = set()
+        for path in _iter_modules(self.directory):
+            name = path.relative_to(self.directory).as_posix()
+            names.add(name)
+            self._sync_module(index, name, path)
+        for name in set(index).difference(names):
+            del index[name]
+
+    def _sync_module(
+        self, index: dict[str, dict[str, Any]], name: str, path: Path
+    ) -> None:
+        try:
+            stat = path.lstat()
+            entry = index.get(name)
+            if entry is not None and entry["stat"] == _stat_key(stat):
+                return None
+            digest = module_digest(path)
+            # linking to an existing object changes the modification time
+            modified = stat.st_mtime
+            if not path.is_symlink():
+                self._link_object(path, stat, digest)
+                stat = path.lstat()
+        except OSError as error:  # nocov
+            # the module was removed or replaced while syncing
+            logger.debug(f"Could not store web module {name!r} - {error}")
+            return None
+        index[name] = {
+            "digest": digest,
+            # the files symlinks point to are not part of the store
+            "size": 0 if path.is_symlink() else stat.st_size,
+            "accessed": max(modified, entry["accessed"] if entry else 0),
+            "stat": _stat_key(stat),
+        }
+
+    def _link_object(self, path: Path, stat: os.stat_result, digest: str) -> None:
+        obj = self._objects / digest[:2] / digest
+        if obj.exists():
+            if obj.samefile(path) or not filecmp.cmp(obj, path, shallow=False):
+                # already stored, or a different module with the same digest
+                return None
+            # replace the module with a link to the identical object
+            source, target = obj, path
+        else:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            source, target = path, obj
+        # link then rename so the target is never missing or partially written
+        temp_file = target.with_name(f"__temp_{uuid4().hex}__")
+        try:
+            os.link(source, temp_file)
+            if target == path and _stat_key(path.lstat()) != _stat_key(stat):
+                # a kernel rewrote the module in the meantime
+                return None
+            os.replace(temp_file, target)
+        except OSError as error:
+            # hard links may not be supported - the module is then stored as is
+            logger.debug(f"Could not link web module to {str(obj)!r} - {error}")
+        finally:
+            if temp_file.exists():
+                temp_file.unlink()
+
+    def _remove_leftovers(self, now: float) -> int:
+        freed = 0
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = Path(root, file_name)
+                try:
+                    stat = path.lstat()
+                except OSError:  # nocov
+                    continue
+                if file_name.startswith("__temp_"):
+                    # discovery probes or files being written by another process
+                    if now - stat.st_mtime > _TEMP_FILE_MAX_AGE:
+                        freed += _remove_file(path)
+                elif Path(root) == self._objects or self._objects in Path(root).parents:
+                    if stat.st_nlink == 1:
+                        # no module links to this object anymore
+                        freed += _remove_file(path)
+                        _remove_empty_parents(path, self._objects)
+                elif (
+                    file_name.endswith((".br", ".gz"))
+                    and not path.with_suffix("").exists()
+                ):
+                    freed += _remove_file(path)
+        return freed
+
+    def _read_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            return json.loads(self._index_file.read_text())["modules"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _write_index(self, index: dict[str, dict[str, Any]]) -> None:
+        # write then rename so readers never see a partial file
+        temp_file = self._store / f"__temp_{uuid4().hex}__"
+        temp_file.write_text(json.dumps({"version": 1, "modules": index}))
+        os.replace(temp_file, self._index_file)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self._store.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_file, "a+b") as lock_file:
+            _lock(lock_file)
+            try:
+                yield None
+            finally:
+                _unlock(lock_file)
+
+
+_LAST_RECORDED_ACCESS: dict[tuple[Path, str], float] = {}
+_ACCESS_LOCK = Lock()
+# modules used by layouts which are yet to be recorded by a background thread
+_USED_MODULES: set[str] = set()
+_USED_MODULES_LOCK = Lock()
+_USED_MODULES_RECORDER = ThreadPoolExecutor(1, "reactpy-web-modules")
+
+
+def _stat_key(stat: os.stat_result) -> list[int]:
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def _variants_of(path: Path) -> list[Path]:
+    return [path.with_name(path.name + suffix) for suffix in (".br", ".gz")]
+
+
+def _remove_file(path: Path) -> int:
+    """Remove the file and return how many bytes that freed"""
+    try:
+        stat = path.lstat()
+        path.unlink()
+    except OSError:
+        return 0
+    # other links to the file keep it alive
+    return stat.st_size if stat.st_nlink == 1 and not S_ISLNK(stat.st_mode) else 0
+
+
+def _remove_empty_parents(path: Path, root: Path) -> None:
+    for parent in path.parents:
+        if parent == root or root not in parent.parents:
+            break
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+
+
+def _lock(file: IO[bytes]) -> None:
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_EX)
+    else:  # nocov
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock(file: IO[bytes]) -> None:
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+    else:  # nocov
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _iter_modules(directory: Path) -> Iterator[Path]:
+    for root, dirs, files in os.walk(directory, followlinks=True):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for file_name in files:
+            path = Path(root, file_name)
+            if _is_module(path):
+                yield path
+
+
+def _is_module(path: Path) -> bool:
+    return (
+        path.is_file()
+        and not path.name.startswith((".", "__temp_"))
+        and not path.name.endswith(_VARIANT_SUFFIXES)
+    )
+
+
+def _is_fresh_variant(variant: Path, source_stat: os.stat_result) -> bool:
+    try:
+        return variant.stat().st_mtime_ns >= source_stat.st_mtime_ns
+    except OSError:
+        return False
+
+
+def _write_gzip(source: Path, target: Path) -> bool:
+    # write then rename so concurrent requests never serve a partial file
+    temp_file = target.with_name(f"__temp_{uuid4().hex}__")
+    try:
+        temp_file.write_bytes(gzip.compress(source.read_bytes(), mtime=0))
+        os.replace(temp_file, target)
+    except OSError as error:
+        logger.debug(f"Could not compress {str(source)!r} - {error}")
+        try:
+            temp_file.unlink()
+        except OSError:
+            pass
+        return False
+    return True
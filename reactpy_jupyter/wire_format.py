@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, Sequence
+
+from reactpy_jupyter.config import REACTPY_JUPYTER_COMPRESSION_THRESHOLD, msgpack
+
+# favor speed - the messages being compressed are typically large and repetitive
+_ZLIB_LEVEL = 1
+
+
+def encode_message(data: Any, wire_format: str) -> tuple[dict[str, Any], list[bytes]]:
+    """Encode data to be sent in a comm message using the given wire format
+
+    Returns the message content and the buffers which should accompany it.
+    """
+    if wire_format == "json":
+        return {"data": data}, []
+
+    payload = msgpack.packb(data)
+    if len(payload) < REACTPY_JUPYTER_COMPRESSION_THRESHOLD.current:
+        return {"encoding": "msgpack"}, [payload]
+    return {"encoding": "msgpack+zlib"}, [zlib.compress(payload, _ZLIB_LEVEL)]
+
+
+def decode_message(message: dict[str, Any], buffers: Sequence[Any]) -> Any:
+    """Decode the data from a comm message sent by a view"""
+    encoding = message.get("encoding")
+    if encoding is None:
+        return message.get("data")
+
+    payload = buffers[0]
+    if encoding.endswith("+zlib"):
+        payload = zlib.decompress(payload)
+    return msgpack.unpackb(payload)
+
+
+def message_size(content: dict[str, Any], buffers: Sequence[Any]) -> int:
+    """The number of bytes taken up by the data in a comm message
+
+    Binary encoded messages are measured by their buffers. JSON content is serialized
+    by the kernel, after it leaves our hands, so has to be measured separately.
+    """
+    size = sum(memoryview(b).nbytes for b in buffers)
+    if "encoding" not in content:
+        size += len(json.dumps(content, separators=(",", ":")))
+    return size
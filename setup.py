@@ -112,6 +112,11 @@ package["install_requires"] = [
     "typing_extensions",
 ]
 
+package["extras_require"] = {
+    "msgpack": ["msgpack"],
+    "processes": ["cloudpickle"],
+}
+
 # --------------------------------------------------------------------------------------
 # Library Description
 # --------------------------------------------------------------------------------------
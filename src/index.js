@@ -2,36 +2,22 @@
  * @typedef {import("@jupyter-widgets/base").DOMWidgetView} DOMWidgetView
  */
 import { BaseReactPyClient, mount } from "@reactpy/client";
+import * as msgpack from "./msgpack.js";
 
 /**@param view {DOMWidgetView} view */
 export function render(view) {
   const client = new JupyterReactPyClient(view);
   mount(view.el, client);
-
-  async function updateInnerWidgets() {
-    /** @type {String[]} */
-    let innerModelIds = view.model.get("_inner_widgets");
-
-    for (let modelId of innerModelIds.map((id) =>
-      id.slice("IPY_MODEL_".length)
-    )) {
-      let model = await view.model.widget_manager.get_model(modelId);
-      (await waitForSelectorAll(`.widget-model-id-${modelId}`, view.el)).map(
-        async (containerEl) => {
-          let childView = await view.create_child_view(model);
-          containerEl.replaceChildren(childView.el);
-        }
-      );
-    }
-  }
-
-  view.model.on("change:_inner_widgets", updateInnerWidgets);
-
-  updateInnerWidgets();
 }
 
 let viewID = 0;
 
+/**
+ * The latest model and version seen by any view of each widget on this page
+ * @type {Map<string, {version: number, model: any}>}
+ */
+const modelCache = new Map();
+
 class JupyterReactPyClient extends BaseReactPyClient {
   /**
    * @param view {DOMWidgetView}
@@ -55,21 +41,61 @@ class JupyterReactPyClient extends BaseReactPyClient {
       );
     }
 
+    // start loading the modules the layout imports while its model is in transit
+    this.view.model.on("change:_reactpy_preload", () => this.preloadModules());
+    this.preloadModules();
+
+    this.layoutModel = {};
+    this.version = null;
+    /**
+     * Binary values this view was sent, by digest
+     * @type {Map<string, DataView>}
+     */
+    this.buffers = new Map();
+    /** @type {Map<string, Promise<DOMWidgetView[]>>} */
+    this.innerWidgetViews = new Map();
     this.ready.then(() => {
+      // Paint the newest model this page has seen without waiting on the kernel -
+      // either the snapshot from the widget state or the model of an earlier view.
+      const snapshot = [
+        this.view.model.get("_reactpy_snapshot"),
+        modelCache.get(this.view.model.model_id),
+      ]
+        .filter((s) => s && s.version)
+        .reduce((a, b) => (a && a.version >= b.version ? a : b), null);
+      if (snapshot) {
+        this.handleIncoming({
+          type: "layout-update",
+          path: "",
+          // views must not share (and mutate) the same model objects
+          model: hydrateBuffers(structuredClone(snapshot.model), this.buffers),
+          version: snapshot.version,
+        });
+        this.updateInnerWidgets({ added: snapshot.innerWidgets || [] });
+      }
+      // the kernel replies with whatever updates this view is missing
       this.view.send({
         type: "client-ready",
         viewID: this.viewID,
+        version: this.version,
         data: null,
       });
     });
 
-    this.view.model.on("msg:custom", (msg) => {
-      if (msg.viewID == this.viewID) {
-        this.handleIncoming(msg.data);
+    // decoding may be asynchronous so chain messages to preserve their order
+    this.incoming = Promise.resolve();
+    this.view.model.on("msg:custom", (msg, buffers) => {
+      if (msg.viewIDs.includes(this.viewID)) {
+        this.incoming = this.incoming
+          .then(() => decodeMessage(msg, buffers))
+          .then((data) =>
+            this.handleIncoming(this.receiveBuffers(msg, buffers, data))
+          );
       }
     });
 
     this.view.on("remove", () => {
+      this.updateInnerWidgets({ removed: [...this.innerWidgetViews.keys()] });
       this.view.model.send({
         type: "client-removed",
         viewID: this.viewID,
@@ -78,13 +104,120 @@ class JupyterReactPyClient extends BaseReactPyClient {
     });
   }
 
+  /**
+   * Keep the binary values sent with a message and put them in place of the
+   * placeholders in its data
+   * @param {any} msg
+   * @param {DataView[]} buffers
+   * @param {any} data
+   */
+  receiveBuffers(msg, buffers, data) {
+    // an encoded message is itself the first buffer
+    const offset = msg.encoding ? 1 : 0;
+    (msg.bufferIDs || []).forEach((id, i) =>
+      this.buffers.set(id, buffers[offset + i])
+    );
+    const hydrated = this.buffers.size
+      ? hydrateBuffers(data, this.buffers)
+      : data;
+    const dropped = (msg.droppedBuffers || {})[this.viewID] || [];
+    dropped.forEach((id) => this.buffers.delete(id));
+    return hydrated;
+  }
+
   /** @param message {any} */
-  sendMessage(message) {
-    this.view.model.send({
-      type: "dom-event",
-      viewID: this.viewID,
-      data: message,
+  handleIncoming(message) {
+    if (message.type === "inner-widgets") {
+      this.updateInnerWidgets(message);
+      return;
+    }
+    // apply every update in a batch before the (debounced) re-render they schedule
+    const updates =
+      message.type === "layout-update-batch" ? message.updates : [message];
+    updates.forEach((update) => {
+      if (update.type === "layout-update") {
+        this.layoutModel = applyUpdate(this.layoutModel, update);
+      }
+      super.handleIncoming(update);
     });
+    if (message.version != null) {
+      this.version = message.version;
+      modelCache.set(this.view.model.model_id, {
+        version: this.version,
+        model: this.layoutModel,
+      });
+      this.scheduleAck();
+    }
+  }
+
+  /**
+   * Mount and unmount the views of widgets embedded with from_widget
+   * @param {{added?: string[], removed?: string[]}} changes
+   */
+  updateInnerWidgets({ added = [], removed = [] }) {
+    added.forEach((modelId) => {
+      if (!this.innerWidgetViews.has(modelId)) {
+        this.innerWidgetViews.set(modelId, this.mountInnerWidget(modelId));
+      }
+    });
+    removed.forEach((modelId) => {
+      const childViews = this.innerWidgetViews.get(modelId);
+      if (childViews) {
+        this.innerWidgetViews.delete(modelId);
+        childViews.then((views) => views.forEach((v) => v.remove()));
+      }
+    });
+  }
+
+  /** @param modelId {string} */
+  async mountInnerWidget(modelId) {
+    const model = await this.view.model.widget_manager.get_model(modelId);
+    const containers = await waitForSelectorAll(
+      `.widget-model-id-${modelId}`,
+      this.view.el
+    );
+    return Promise.all(
+      containers.map(async (containerEl) => {
+        const childView = await this.view.create_child_view(model);
+        containerEl.replaceChildren(childView.el);
+        return childView;
+      })
+    );
+  }
+
+  scheduleAck() {
+    // Acknowledge at most once per frame. Frames stop in background tabs so the
+    // kernel holds back updates until the view is visible again.
+    if (this.ackScheduled) {
+      return;
+    }
+    this.ackScheduled = true;
+    requestAnimationFrame(() => {
+      this.ackScheduled = false;
+      this.view.model.send({
+        type: "ack",
+        viewID: this.viewID,
+        version: this.version,
+        data: null,
+      });
+    });
+  }
+
+  /** @param message {any} */
+  sendMessage(message) {
+    if (this.view.model.get("_reactpy_wire_format") === "msgpack") {
+      this.view.model.send(
+        { type: "dom-event", viewID: this.viewID, encoding: "msgpack" },
+        undefined,
+        [msgpack.encode(message)]
+      );
+    } else {
+      this.view.model.send({
+        type: "dom-event",
+        viewID: this.viewID,
+        data: message,
+      });
+    }
   }
 
   /** @param moduleName {string} */
@@ -94,9 +227,245 @@ class JupyterReactPyClient extends BaseReactPyClient {
     // source is a URL constructed by URL.createObjectURL. This appears to impact both
     // path resolution as well as CORS. By constrast the fetch() API does not appear to
     // be impacted by this. So we use fetch() to get the module source instead.
-    const rsp = await fetch(`${this.importSourceBaseUrl}/${moduleName}`);
-    return await import(URL.createObjectURL(await rsp.blob()));
+    //
+    // Modules are fetched from content-hashed URLs, when the server publishes them,
+    // so that the browser can cache them without revalidating.
+    const baseUrl = this.importSourceBaseUrl;
+    const path = await resolveModulePath(baseUrl, moduleName);
+    try {
+      return await importModule(`${baseUrl}/${path}`, path);
+    } catch (error) {
+      if (!path.startsWith("_hashed/")) {
+        throw error;
+      }
+      // The module may have changed since the manifest was fetched, as when the cell
+      // creating it is run again, leaving its digest stale. Retry once with a new one.
+      const freshPath = await resolveModulePath(baseUrl, moduleName, path);
+      if (freshPath === path) {
+        throw error;
+      }
+      return await importModule(`${baseUrl}/${freshPath}`, freshPath);
+    }
+  }
+
+  preloadModules() {
+    if (!this.importSourceBaseUrl) {
+      return;
+    }
+    // errors are reported once the module is actually used
+    (this.view.model.get("_reactpy_preload") || []).forEach((moduleName) =>
+      this.loadModule(moduleName).catch(() => {})
+    );
+  }
+}
+
+/**
+ * Modules loaded, or being loaded, by any view on this page keyed by their URL
+ * @type {Map<string, Promise<any>>}
+ */
+const moduleCache = new Map();
+
+/**
+ * @param {string} url
+ * @param {string} path
+ * @returns {Promise<any>}
+ */
+function importModule(url, path) {
+  let module = moduleCache.get(url);
+  if (!module) {
+    module = fetchModule(url);
+    moduleCache.set(url, module);
+    // The content at hashed paths never changes so those modules are kept. Others
+    // are only shared while loading so that changes to them are picked up later.
+    const keep = path.startsWith("_hashed/");
+    const forget = () => {
+      if (moduleCache.get(url) === module) {
+        moduleCache.delete(url);
+      }
+    };
+    module.then(keep ? null : forget, forget);
+  }
+  return module;
+}
+
+/**
+ * @param {string} url
+ * @returns {Promise<any>}
+ */
+async function fetchModule(url) {
+  const rsp = await fetch(url);
+  if (!rsp.ok) {
+    throw new Error(`Failed to load module from ${url} - ${rsp.status}`);
+  }
+  const blobUrl = URL.createObjectURL(await rsp.blob());
+  try {
+    return await import(blobUrl);
+  } finally {
+    // the module stays alive once imported so its source is no longer needed
+    URL.revokeObjectURL(blobUrl);
+  }
+}
+
+/**
+ * The content-hashed paths of the modules at each import source base URL
+ * @type {Map<string, Promise<Record<string, string> | null>>}
+ */
+const moduleManifests = new Map();
+
+/**
+ * The manifest is fetched again if it lacks the module, or still has the given path
+ * for it which failed to load.
+ * @param {string} baseUrl
+ * @param {string} moduleName
+ * @param {string | null} stalePath
+ * @returns {Promise<string>}
+ */
+async function resolveModulePath(baseUrl, moduleName, stalePath = null) {
+  let manifest = moduleManifests.get(baseUrl);
+  if (!manifest) {
+    manifest = fetchModuleManifest(baseUrl);
+    moduleManifests.set(baseUrl, manifest);
+  }
+  let modules = await manifest;
+  const isStale = stalePath
+    ? modules && modules[moduleName] === stalePath
+    : modules && !(moduleName in modules);
+  if (isStale) {
+    // the module was created, or changed, since the manifest was fetched
+    if (moduleManifests.get(baseUrl) === manifest) {
+      moduleManifests.set(baseUrl, fetchModuleManifest(baseUrl));
+    }
+    modules = await moduleManifests.get(baseUrl);
+  }
+  return (modules && modules[moduleName]) || moduleName;
+}
+
+/**
+ * @param {string} baseUrl
+ * @returns {Promise<Record<string, string> | null>}
+ */
+function fetchModuleManifest(baseUrl) {
+  // servers without a manifest are sent plain module names
+  return fetch(`${baseUrl}/_manifest.json`)
+    .then((rsp) => (rsp.ok ? rsp.json() : null))
+    .then((manifest) => (manifest && manifest.modules) || null)
+    .catch(() => null);
+}
+
+/**
+ * Apply a layout update without mutating the given model
+ * @param {any} model
+ * @param {{path: string, model: any}} update
+ */
+function applyUpdate(model, update) {
+  if (!update.path) {
+    return update.model;
+  }
+  return replaceAt(model, update.path.split("/").slice(1), update.model);
+}
+
+function replaceAt(container, parts, value) {
+  const key = parts[0].replace(/~1/g, "/").replace(/~0/g, "~");
+  const copy = Array.isArray(container) ? container.slice() : { ...container };
+  copy[key] =
+    parts.length === 1
+      ? value
+      : replaceAt(container[key], parts.slice(1), value);
+  return copy;
+}
+
+const BUFFER_KEY = "__reactpy_buffer__";
+
+const TYPED_ARRAYS = {
+  int8: Int8Array,
+  uint8: Uint8Array,
+  int16: Int16Array,
+  uint16: Uint16Array,
+  int32: Int32Array,
+  uint32: Uint32Array,
+  int64: BigInt64Array,
+  uint64: BigUint64Array,
+  float32: Float32Array,
+  float64: Float64Array,
+};
+
+/**
+ * Replace the placeholders of binary values with typed arrays, copying only the
+ * objects and arrays which contain them
+ * @param {any} value
+ * @param {Map<string, DataView>} buffers
+ */
+function hydrateBuffers(value, buffers) {
+  if (
+    value === null ||
+    typeof value !== "object" ||
+    ArrayBuffer.isView(value)
+  ) {
+    return value;
+  }
+  if (typeof value[BUFFER_KEY] === "string") {
+    return toTypedArray(value, buffers);
+  }
+  let copy = null;
+  for (const key of Object.keys(value)) {
+    const item = value[key];
+    const hydrated = hydrateBuffers(item, buffers);
+    if (hydrated !== item) {
+      copy = copy || (Array.isArray(value) ? value.slice() : { ...value });
+      copy[key] = hydrated;
+    }
+  }
+  return copy || value;
+}
+
+/**
+ * @param {{dtype: string, data?: DataView}} placeholder
+ * @param {Map<string, DataView>} buffers
+ */
+function toTypedArray(placeholder, buffers) {
+  // widget state carries the data in the placeholder itself
+  const data = placeholder.data || buffers.get(placeholder[BUFFER_KEY]);
+  if (!data) {
+    console.error(`Missing binary value ${placeholder[BUFFER_KEY]}`);
+    return null;
+  }
+  const TypedArray = TYPED_ARRAYS[placeholder.dtype] || Uint8Array;
+  const { buffer, byteOffset, byteLength } = data;
+  if (byteOffset % TypedArray.BYTES_PER_ELEMENT) {
+    // typed arrays must be aligned to their element size
+    return new TypedArray(buffer.slice(byteOffset, byteOffset + byteLength));
+  }
+  return new TypedArray(
+    buffer,
+    byteOffset,
+    byteLength / TypedArray.BYTES_PER_ELEMENT
+  );
+}
+
+/**
+ * @param {any} msg
+ * @param {DataView[]} buffers
+ * @returns {Promise<any> | any}
+ */
+function decodeMessage(msg, buffers) {
+  if (!msg.encoding) {
+    return msg.data;
+  }
+  const payload = buffers[0];
+  const bytes = new Uint8Array(
+    payload.buffer,
+    payload.byteOffset,
+    payload.byteLength
+  );
+  if (!msg.encoding.endsWith("+zlib")) {
+    return msgpack.decode(bytes);
   }
+  const stream = new Blob([bytes])
+    .stream()
+    .pipeThrough(new DecompressionStream("deflate"));
+  return new Response(stream)
+    .arrayBuffer()
+    .then((buffer) => msgpack.decode(new Uint8Array(buffer)));
 }
 
 const jupyterServerBaseUrl = (() => {
@@ -140,7 +509,7 @@ function concatAndResolveUrl(url, concat) {
 function waitForSelectorAll(selector, containerElement) {
   return new Promise((resolve) => {
     const resolveSearch = () => {
-      const elements = Array.from(document.querySelectorAll(selector));
+      const elements = Array.from(containerElement.querySelectorAll(selector));
       if (elements.length) {
         resolve(elements);
         return true;
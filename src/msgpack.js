@@ -0,0 +1,298 @@
+/**
+ * A minimal MessagePack codec covering the types produced by JSON-like data.
+ *
+ * Extension types are rejected when decoding and never produced when encoding. Values
+ * round trip with, and are encoded like, the Python encoder - see tests/test_msgpack_js.py
+ */
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+/**
+ * @param {Uint8Array} bytes
+ * @returns {any}
+ */
+export function decode(bytes) {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let offset = 0;
+
+  function readString(length) {
+    const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+    offset += length;
+    return value;
+  }
+
+  function readBinary(length) {
+    const value = bytes.slice(offset, offset + length);
+    offset += length;
+    return value;
+  }
+
+  function readArray(length) {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) {
+      value[i] = read();
+    }
+    return value;
+  }
+
+  function readMap(length) {
+    const value = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  }
+
+  function rejectExtension(length) {
+    const type = view.getInt8(offset);
+    throw new Error(
+      `Unsupported MessagePack extension type ${type} (${length} bytes)`
+    );
+  }
+
+  function read() {
+    const byte = view.getUint8(offset++);
+    if (byte <= 0x7f) return byte;
+    if (byte <= 0x8f) return readMap(byte & 0x0f);
+    if (byte <= 0x9f) return readArray(byte & 0x0f);
+    if (byte <= 0xbf) return readString(byte & 0x1f);
+    if (byte >= 0xe0) return byte - 0x100;
+
+    let value;
+    switch (byte) {
+      case 0xc0:
+        return null;
+      case 0xc2:
+        return false;
+      case 0xc3:
+        return true;
+      case 0xc4:
+        return readBinary(view.getUint8(offset++));
+      case 0xc5:
+        value = view.getUint16(offset);
+        offset += 2;
+        return readBinary(value);
+      case 0xc6:
+        value = view.getUint32(offset);
+        offset += 4;
+        return readBinary(value);
+      case 0xc7:
+        return rejectExtension(view.getUint8(offset++));
+      case 0xc8:
+        value = view.getUint16(offset);
+        offset += 2;
+        return rejectExtension(value);
+      case 0xc9:
+        value = view.getUint32(offset);
+        offset += 4;
+        return rejectExtension(value);
+      case 0xca:
+        value = view.getFloat32(offset);
+        offset += 4;
+        return value;
+      case 0xcb:
+        value = view.getFloat64(offset);
+        offset += 8;
+        return value;
+      case 0xcc:
+        return view.getUint8(offset++);
+      case 0xcd:
+        value = view.getUint16(offset);
+        offset += 2;
+        return value;
+      case 0xce:
+        value = view.getUint32(offset);
+        offset += 4;
+        return value;
+      case 0xcf:
+        value = Number(view.getBigUint64(offset));
+        offset += 8;
+        return value;
+      case 0xd0:
+        return view.getInt8(offset++);
+      case 0xd1:
+        value = view.getInt16(offset);
+        offset += 2;
+        return value;
+      case 0xd2:
+        value = view.getInt32(offset);
+        offset += 4;
+        return value;
+      case 0xd3:
+        value = Number(view.getBigInt64(offset));
+        offset += 8;
+        return value;
+      case 0xd4:
+        return rejectExtension(1);
+      case 0xd5:
+        return rejectExtension(2);
+      case 0xd6:
+        return rejectExtension(4);
+      case 0xd7:
+        return rejectExtension(8);
+      case 0xd8:
+        return rejectExtension(16);
+      case 0xd9:
+        return readString(view.getUint8(offset++));
+      case 0xda:
+        value = view.getUint16(offset);
+        offset += 2;
+        return readString(value);
+      case 0xdb:
+        value = view.getUint32(offset);
+        offset += 4;
+        return readString(value);
+      case 0xdc:
+        value = view.getUint16(offset);
+        offset += 2;
+        return readArray(value);
+      case 0xdd:
+        value = view.getUint32(offset);
+        offset += 4;
+        return readArray(value);
+      case 0xde:
+        value = view.getUint16(offset);
+        offset += 2;
+        return readMap(value);
+      case 0xdf:
+        value = view.getUint32(offset);
+        offset += 4;
+        return readMap(value);
+    }
+    throw new Error(`Invalid MessagePack byte 0x${byte.toString(16)}`);
+  }
+
+  return read();
+}
+
+/**
+ * @param {any} value
+ * @returns {Uint8Array}
+ */
+export function encode(value) {
+  let bytes = new Uint8Array(256);
+  let view = new DataView(bytes.buffer);
+  let offset = 0;
+
+  function reserve(size) {
+    if (offset + size <= bytes.length) return;
+    let length = bytes.length * 2;
+    while (length < offset + size) length *= 2;
+    const grown = new Uint8Array(length);
+    grown.set(bytes);
+    bytes = grown;
+    view = new DataView(bytes.buffer);
+  }
+
+  function writeHeader(length, fixPrefix, fixMax, prefix8, prefix16, prefix32) {
+    reserve(5);
+    if (fixPrefix !== null && length <= fixMax) {
+      view.setUint8(offset++, fixPrefix | length);
+    } else if (prefix8 !== null && length <= 0xff) {
+      view.setUint8(offset++, prefix8);
+      view.setUint8(offset++, length);
+    } else if (length <= 0xffff) {
+      view.setUint8(offset++, prefix16);
+      view.setUint16(offset, length);
+      offset += 2;
+    } else {
+      view.setUint8(offset++, prefix32);
+      view.setUint32(offset, length);
+      offset += 4;
+    }
+  }
+
+  function writeBytes(data) {
+    reserve(data.length);
+    bytes.set(data, offset);
+    offset += data.length;
+  }
+
+  function writeNumber(number) {
+    reserve(9);
+    if (!Number.isSafeInteger(number)) {
+      view.setUint8(offset++, 0xcb);
+      view.setFloat64(offset, number);
+      offset += 8;
+    } else if (number >= 0) {
+      if (number <= 0x7f) {
+        view.setUint8(offset++, number);
+      } else if (number <= 0xff) {
+        view.setUint8(offset++, 0xcc);
+        view.setUint8(offset++, number);
+      } else if (number <= 0xffff) {
+        view.setUint8(offset++, 0xcd);
+        view.setUint16(offset, number);
+        offset += 2;
+      } else if (number <= 0xffffffff) {
+        view.setUint8(offset++, 0xce);
+        view.setUint32(offset, number);
+        offset += 4;
+      } else {
+        view.setUint8(offset++, 0xcf);
+        view.setBigUint64(offset, BigInt(number));
+        offset += 8;
+      }
+    } else if (number >= -0x20) {
+      view.setUint8(offset++, number + 0x100);
+    } else if (number >= -0x80) {
+      view.setUint8(offset++, 0xd0);
+      view.setInt8(offset++, number);
+    } else if (number >= -0x8000) {
+      view.setUint8(offset++, 0xd1);
+      view.setInt16(offset, number);
+      offset += 2;
+    } else if (number >= -0x80000000) {
+      view.setUint8(offset++, 0xd2);
+      view.setInt32(offset, number);
+      offset += 4;
+    } else {
+      view.setUint8(offset++, 0xd3);
+      view.setBigInt64(offset, BigInt(number));
+      offset += 8;
+    }
+  }
+
+  function write(value) {
+    if (value === null || value === undefined) {
+      reserve(1);
+      view.setUint8(offset++, 0xc0);
+    } else if (typeof value === "boolean") {
+      reserve(1);
+      view.setUint8(offset++, value ? 0xc3 : 0xc2);
+    } else if (typeof value === "number") {
+      writeNumber(value);
+    } else if (typeof value === "string") {
+      const data = textEncoder.encode(value);
+      writeHeader(data.length, 0xa0, 0x1f, 0xd9, 0xda, 0xdb);
+      writeBytes(data);
+    } else if (Array.isArray(value)) {
+      writeHeader(value.length, 0x90, 0x0f, null, 0xdc, 0xdd);
+      value.forEach(write);
+    } else if (ArrayBuffer.isView(value) || value instanceof ArrayBuffer) {
+      const data = ArrayBuffer.isView(value)
+        ? new Uint8Array(value.buffer, value.byteOffset, value.byteLength)
+        : new Uint8Array(value);
+      writeHeader(data.length, null, 0, 0xc4, 0xc5, 0xc6);
+      writeBytes(data);
+    } else if (typeof value === "object") {
+      // like JSON.stringify, drop keys whose values cannot be represented
+      const entries = Object.entries(value).filter(
+        ([, v]) => v !== undefined && typeof v !== "function"
+      );
+      writeHeader(entries.length, 0x80, 0x0f, null, 0xde, 0xdf);
+      entries.forEach(([k, v]) => {
+        write(k);
+        write(v);
+      });
+    } else {
+      reserve(1);
+      view.setUint8(offset++, 0xc0);
+    }
+  }
+
+  write(value);
+  return bytes.subarray(0, offset);
+}
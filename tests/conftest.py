@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator
+
+import pytest
+from fake_frontend import FakeClient, fake_comms
+from reactpy.core.types import ComponentType
+
+from reactpy_jupyter.layout_widget import LayoutWidget, set_import_source_base_url
+from reactpy_jupyter.monkey_patch import execute_patch
+
+# pytest is not IPython so ReactPy, which is imported by now, has to be patched here
+execute_patch()
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _no_import_source_discovery() -> None:
+    # looking for a Jupyter server to serve import sources would only slow tests down
+    set_import_source_base_url("http://127.0.0.1/")
+
+
+@pytest.fixture
+def display() -> Iterator[Callable[[ComponentType], tuple[LayoutWidget, FakeClient]]]:
+    """Make a widget for a component and connect a view to it
+
+    The widgets and views made are closed after the test.
+    """
+    made: list[tuple[LayoutWidget, FakeClient]] = []
+
+    def display(component: ComponentType) -> tuple[LayoutWidget, FakeClient]:
+        widget = LayoutWidget(component)
+        client = FakeClient(widget.comm)
+        made.append((widget, client))
+        client.wait_for_version(1)
+        return widget, client
+
+    with fake_comms():
+        yield display
+        for widget, client in made:
+            client.close()
+            widget.close()
+
+
+@pytest.fixture
+def option() -> Iterator[Callable[[Any, Any], None]]:
+    """Set options for the duration of the test"""
+    previous: list[tuple[Any, Any]] = []
+
+    def set_option(option: Any, value: Any) -> None:
+        previous.append((option, option.current))
+        option.current = value
+
+    yield set_option
+    for option, value in reversed(previous):
+        option.current = value
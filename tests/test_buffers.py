@@ -0,0 +1,110 @@
+from array import array
+
+from reactpy_jupyter.buffers import (
+    BUFFER_KEY,
+    SentBuffers,
+    contains_buffers,
+    extract_buffers,
+    is_buffer,
+)
+
+
+def test_is_buffer():
+    assert is_buffer(b"x")
+    assert is_buffer(bytearray(b"x"))
+    assert is_buffer(memoryview(b"x"))
+    assert is_buffer(array("d", [1.0]))
+    for value in ("x", 1, 1.0, None, True, [b"x"], {"a": b"x"}, object()):
+        assert not is_buffer(value)
+
+
+def test_contains_buffers_looks_in_attributes_and_children():
+    assert not contains_buffers({"tagName": "div", "attributes": {"a": "b"}})
+    assert contains_buffers({"tagName": "div", "attributes": {"data": b"x"}})
+    assert contains_buffers(
+        {"tagName": "div", "children": [{"tagName": "p", "attributes": {"v": [b"x"]}}]}
+    )
+    assert contains_buffers({"tagName": "", "children": [b"x"]})
+
+
+def test_extract_buffers_only_copies_what_changed():
+    unchanged = {"tagName": "p", "children": ["text"]}
+    data = {"tagName": "div", "children": [unchanged, {"value": b"abc"}]}
+
+    new_data, found = extract_buffers(data)
+
+    assert data["children"][1] == {"value": b"abc"}
+    assert new_data["children"][0] is unchanged
+    placeholder = new_data["children"][1]["value"]
+    assert placeholder["dtype"] == "uint8"
+    assert placeholder["shape"] == [3]
+    assert bytes(found[placeholder[BUFFER_KEY]]) == b"abc"
+
+
+def test_extract_buffers_without_any():
+    data = {"a": [1, "b"]}
+    assert extract_buffers(data) == (data, {})
+    assert extract_buffers(data)[0] is data
+
+
+def test_extract_buffers_typed_arrays():
+    values = array("d", [1.0, 2.0])
+    new_data, found = extract_buffers([values, array("h", [1]), array("I", [1])])
+    assert [(p["dtype"], p["shape"]) for p in new_data] == [
+        ("float64", [2]),
+        ("int16", [1]),
+        (f"uint{array('I').itemsize * 8}", [1]),
+    ]
+    assert bytes(found[new_data[0][BUFFER_KEY]]) == values.tobytes()
+
+
+def test_extract_buffers_keeps_the_shape_of_bytes():
+    matrix = memoryview(b"abcd").cast("B", [2, 2])
+    new_data, _ = extract_buffers(matrix)
+    assert new_data["shape"] == [2, 2]
+
+
+def test_extract_buffers_sends_other_formats_as_bytes():
+    new_data, found = extract_buffers(memoryview(b"abcd").cast("c"))
+    assert (new_data["dtype"], new_data["shape"]) == ("uint8", [4])
+    assert bytes(found[new_data[BUFFER_KEY]]) == b"abcd"
+
+
+def test_extract_buffers_identical_values_share_a_digest():
+    new_data, found = extract_buffers([b"same", bytearray(b"same"), b"other"])
+    assert new_data[0][BUFFER_KEY] == new_data[1][BUFFER_KEY]
+    assert len(found) == 2
+
+
+def test_extract_buffers_inline():
+    new_data, _ = extract_buffers({"value": b"abc"}, inline=True)
+    assert bytes(new_data["value"]["data"]) == b"abc"
+
+
+def test_sent_buffers_only_sends_new_ones():
+    sent = SentBuffers(100)
+    _, first = extract_buffers([b"a" * 10, b"b" * 10])
+    assert sent.use(first) == (list(first), [])
+    _, second = extract_buffers([b"a" * 10, b"c" * 10])
+    missing, evicted = sent.use(second)
+    assert missing == [d for d in second if d not in first]
+    assert evicted == []
+
+
+def test_sent_buffers_evicts_the_least_recently_used():
+    sent = SentBuffers(25)
+    digests = []
+    for value in (b"a" * 10, b"b" * 10):
+        _, found = extract_buffers(value)
+        sent.use(found)
+        digests.extend(found)
+    # the first is used again, so the second is the least recently used
+    sent.use(extract_buffers(b"a" * 10)[1])
+    _, found = extract_buffers(b"c" * 10)
+    assert sent.use(found) == (list(found), [digests[1]])
+
+
+def test_sent_buffers_keeps_those_in_use_even_if_too_big():
+    sent = SentBuffers(5)
+    _, found = extract_buffers([b"a" * 10, b"b" * 10])
+    assert sent.use(found) == (list(found), [])
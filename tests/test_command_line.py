@@ -0,0 +1,26 @@
+import pytest
+
+from reactpy_jupyter.command_line import program_name
+
+
+@pytest.mark.parametrize(
+    "command_line, name",
+    [
+        (["/usr/bin/python3", "/usr/local/bin/papermill", "in.ipynb"], "papermill"),
+        (
+            ["python", "/venv/bin/jupyter-nbconvert", "--execute", "a.ipynb"],
+            "jupyter-nbconvert",
+        ),
+        (["python3.11", "-m", "nbconvert", "--execute"], "nbconvert"),
+        (["python", "-X", "dev", "-mnbclient.cli"], "nbclient"),
+        (["C:\\Python\\Scripts\\jupyter-execute.exe", "a.ipynb"], "jupyter-execute"),
+        (
+            ["python3", "-m", "ipykernel_launcher", "-f", "kernel.json"],
+            "ipykernel_launcher",
+        ),
+        (["python", "-c", "import papermill"], None),
+        ([], None),
+    ],
+)
+def test_program_name(command_line, name):
+    assert program_name(command_line) == name
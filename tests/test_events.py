@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from reactpy_jupyter.events import DEFAULT_EVENT_POLICIES, EventPolicy, EventQueue
+
+
+def event(target, event_type, **data):
+    return {
+        "type": "layout-event",
+        "target": target,
+        "data": [{"type": event_type, **data}],
+    }
+
+
+def run_queue(test, maxsize=256, policies=None, deliver=None, concurrency=4):
+    """Run the test with a queue whose delivered events are collected in a list"""
+    delivered = []
+
+    async def default_deliver(event):
+        delivered.append(event)
+
+    async def main():
+        queue = EventQueue(
+            deliver or default_deliver,
+            maxsize,
+            dict(DEFAULT_EVENT_POLICIES if policies is None else policies),
+            concurrency,
+        )
+        task = asyncio.create_task(queue.run())
+        try:
+            await test(queue, delivered)
+        finally:
+            task.cancel()
+
+    asyncio.run(main())
+    return delivered
+
+
+async def settle(seconds=0.0):
+    for _ in range(5):
+        await asyncio.sleep(seconds)
+
+
+def test_delivers_events_in_order():
+    async def test(queue, delivered):
+        for i in range(3):
+            queue.put(event("a", "click", i=i))
+        await settle()
+        assert [e["data"][0]["i"] for e in delivered] == [0, 1, 2]
+        assert queue.counts() == {
+            "received": 3,
+            "delivered": 3,
+            "coalesced": 0,
+            "dropped": 0,
+            "queued": 0,
+        }
+
+    run_queue(test)
+
+
+def test_slow_handlers_do_not_hold_back_later_events():
+    delivered = []
+
+    async def deliver(event):
+        if event["target"] == "slow":
+            await asyncio.sleep(10)
+        delivered.append(event["target"])
+
+    async def test(queue, _):
+        queue.put(event("slow", "click"))
+        queue.put(event("fast", "change"))
+        await settle()
+        assert delivered == ["fast"]
+
+    run_queue(test, deliver=deliver)
+
+
+def test_events_for_slow_handlers_wait_in_the_queue():
+    gate = asyncio.Event()
+    delivered = []
+    in_flight = []
+
+    async def deliver(event):
+        in_flight.append(event)
+        await gate.wait()
+        in_flight.remove(event)
+        delivered.append(event["data"][0]["x"])
+
+    async def test(queue, _):
+        for x in range(100):
+            queue.put(event("a", "mousemove", x=x))
+            await settle()
+        # only as many as may be handled at once were taken from the queue
+        assert len(in_flight) == 2
+        assert queue.counts()["queued"] == 1
+        # where the rest were coalesced into the latest
+        assert queue.counts()["coalesced"] == 97
+        gate.set()
+        await settle()
+        assert delivered == [0, 1, 99]
+
+    run_queue(test, deliver=deliver, concurrency=2)
+
+
+def test_coalesces_consecutive_events_for_a_handler():
+    async def test(queue, delivered):
+        for x in range(5):
+            queue.put(event("a", "mousemove", x=x))
+        queue.put(event("b", "mousemove", x=10))
+        await settle()
+        assert [(e["target"], e["data"][0]["x"]) for e in delivered] == [
+            ("a", 4),
+            ("b", 10),
+        ]
+        assert queue.counts()["coalesced"] == 4
+
+    run_queue(test)
+
+
+def test_full_queue_drops_the_oldest_coalesced_events():
+    async def test(queue, delivered):
+        queue.put(event("m0", "mousemove"))
+        queue.put(event("c0", "click"))
+        queue.put(event("m1", "mousemove"))
+        queue.put(event("c1", "click"))
+        queue.put(event("c2", "click"))
+        queue.put(event("m2", "mousemove"))
+        await settle()
+        assert [e["target"] for e in delivered] == ["c0", "c1", "c2"]
+        assert queue.counts()["dropped"] == 3
+
+    run_queue(test, maxsize=3)
+
+
+def test_full_queue_never_drops_discrete_events():
+    async def test(queue, delivered):
+        for i in range(5):
+            queue.put(event(f"c{i}", "click"))
+        await settle()
+        assert len(delivered) == 5
+        assert queue.counts()["dropped"] == 0
+
+    run_queue(test, maxsize=2)
+
+
+def test_throttle_delivers_the_first_and_latest_events():
+    policies = {"input": EventPolicy(throttle=0.05)}
+
+    async def test(queue, delivered):
+        for i in range(5):
+            queue.put(event("a", "input", i=i))
+        await settle()
+        assert [e["data"][0]["i"] for e in delivered] == [0]
+        await settle(0.05)
+        assert [e["data"][0]["i"] for e in delivered] == [0, 4]
+
+    run_queue(test, policies=policies)
+
+
+def test_debounce_waits_for_events_to_stop():
+    policies = {"input": EventPolicy(debounce=0.05)}
+
+    async def test(queue, delivered):
+        start = time.monotonic()
+        for i in range(3):
+            queue.put(event("a", "input", i=i))
+            await asyncio.sleep(0.01)
+        assert delivered == []
+        while not delivered:
+            await asyncio.sleep(0.01)
+        assert time.monotonic() - start >= 0.05
+        assert [e["data"][0]["i"] for e in delivered] == [2]
+        assert queue.counts()["coalesced"] == 2
+
+    run_queue(test, policies=policies)
+
+
+def test_clear_discards_waiting_events():
+    policies = {"input": EventPolicy(debounce=0.01)}
+
+    async def test(queue, delivered):
+        queue.put(event("a", "input"))
+        queue.clear()
+        await settle(0.02)
+        assert delivered == []
+
+    run_queue(test, policies=policies)
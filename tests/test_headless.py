@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fake_frontend import fake_comms
+from reactpy import component, html, use_effect, use_state
+
+from reactpy_jupyter import headless, to_widget
+from reactpy_jupyter.command_line import program_name
+from reactpy_jupyter.config import (
+    REACTPY_JUPYTER_HEADLESS,
+    REACTPY_JUPYTER_HTML_SNAPSHOT,
+)
+from reactpy_jupyter.headless import (
+    BATCH_RUNNERS,
+    headless_mimebundle,
+    is_headless,
+    started_by_batch_runner,
+)
+from reactpy_jupyter.layout_widget import LayoutWidget
+from reactpy_jupyter.snapshot import model_to_html
+
+
+@component
+def Steps():
+    step, set_step = use_state(0)
+    use_effect(lambda: set_step(step + 1) if step < 3 else None, [step])
+    return html.p(str(step))
+
+
+@pytest.fixture
+def parent_command_line(monkeypatch):
+    """Pose as a kernel started by the given command"""
+    command_line = []
+    monkeypatch.setattr(headless, "_parent_command_line", lambda: command_line)
+    started_by_batch_runner.cache_clear()
+    yield command_line
+    started_by_batch_runner.cache_clear()
+
+
+def test_batch_runners_are_detected(parent_command_line, option):
+    option(REACTPY_JUPYTER_HEADLESS, "auto")
+    parent_command_line[:] = ["python", "-m", "jupyter_server"]
+    assert not is_headless()
+
+    started_by_batch_runner.cache_clear()
+    parent_command_line[:] = ["/usr/bin/python3", "/usr/bin/papermill", "in.ipynb"]
+    assert is_headless()
+
+    option(REACTPY_JUPYTER_HEADLESS, "false")
+    assert not is_headless()
+
+
+def test_batch_runners_are_not_found_in_other_arguments():
+    command_line = [
+        "/usr/bin/python3",
+        "/usr/local/bin/jupyter-lab",
+        "--notebook-dir=~/papermill-reports",
+    ]
+    assert program_name(command_line) not in BATCH_RUNNERS
+
+
+def test_headless_mimebundle_is_the_settled_html():
+    bundle = headless_mimebundle(Steps())
+    assert set(bundle) == {"text/plain", "text/html"}
+    assert bundle["text/html"] == "<p>3</p>"
+    assert "application/json" in headless_mimebundle(Steps(), ["application/json"])
+
+
+def test_displayed_components_make_no_widget(option):
+    option(REACTPY_JUPYTER_HEADLESS, "true")
+    assert Steps()._repr_mimebundle_()["text/html"] == "<p>3</p>"
+
+
+def test_headless_widgets_are_rendered_up_front(option):
+    option(REACTPY_JUPYTER_HEADLESS, "true")
+    threads = threading.active_count()
+    with fake_comms():
+        start = time.perf_counter()
+        widget = LayoutWidget(Steps())
+        # nothing is waited for once no render is pending
+        assert time.perf_counter() - start < 0.09
+        try:
+            assert threading.active_count() == threads
+            assert widget._reactpy_version == 1
+            assert model_to_html(widget._reactpy_model) == "<p>3</p>"
+            assert widget._import_source_base_url == ""
+            # it never needed a render loop
+            assert not hasattr(widget, "_reactpy_loop")
+        finally:
+            widget.close()
+
+
+def test_headless_widgets_are_displayed_as_html(option):
+    option(REACTPY_JUPYTER_HEADLESS, "true")
+    option(REACTPY_JUPYTER_HTML_SNAPSHOT, False)
+    with fake_comms():
+        widget = to_widget(Steps)()
+        try:
+            data, _ = widget._repr_mimebundle_()
+            assert data["text/html"] == "<p>3</p>"
+            # for a browser to show should the notebook be opened with its widgets
+            assert widget._reactpy_snapshot["version"] == 1
+        finally:
+            widget.close()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from reactpy.config import REACTPY_WEB_MODULES_DIR
+
+from reactpy_jupyter import import_resources, layout_widget
+from reactpy_jupyter.import_resources import (
+    _probe_servers,
+    _try_to_set_import_source_base_url,
+)
+
+
+@pytest.fixture(autouse=True)
+def web_modules_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "web_modules"
+    directory.mkdir()
+    monkeypatch.setattr(REACTPY_WEB_MODULES_DIR, "current", directory)
+    monkeypatch.setattr(
+        import_resources, "_DISCOVERY_CACHE_FILE", tmp_path / "servers.json"
+    )
+    # discovery sets the URL which the other tests rely on
+    monkeypatch.setattr(layout_widget, "_IMPORT_SOURCE_BASE_URL", None)
+    return directory
+
+
+@pytest.fixture
+def start_server(web_modules_dir):
+    """Start a server which serves the web modules directory after some delay
+
+    The URLs of the servers which were sent requests are kept in ``requested``.
+    """
+    servers = []
+    requested = []
+
+    def start_server(delay: float = 0, serves: bool = True) -> dict[str, str]:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requested.append(f"http://127.0.0.1:{self.server.server_port}/")
+                time.sleep(delay)
+                name = self.path.split("?")[0].rsplit("/", 1)[-1]
+                found = serves and (web_modules_dir / name).exists()
+                self.send_response(200 if found else 404)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        servers.append(server)
+        Thread(target=server.serve_forever, daemon=True).start()
+        return {
+            "url": f"http://127.0.0.1:{server.server_port}/",
+            "base_url": "/",
+            "token": "",
+            "hostname": "127.0.0.1",
+            "pid": server.server_port,
+        }
+
+    start_server.requested = requested
+    yield start_server
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_probes_find_the_server_which_serves_web_modules(start_server):
+    servers = {
+        "slow": start_server(delay=1),
+        "other": start_server(serves=False),
+        "found": start_server(),
+    }
+    start = time.monotonic()
+    assert _probe_servers(servers, 5) == (
+        "found",
+        servers["found"]["url"] + "_reactpy_web_modules",
+    )
+    # the slow server was not waited for
+    assert time.monotonic() - start < 1
+
+
+def test_probes_give_up_after_the_timeout(start_server, web_modules_dir):
+    servers = {"slow": start_server(delay=1), "other": start_server(serves=False)}
+    start = time.monotonic()
+    assert _probe_servers(servers, 0.2) is None
+    assert time.monotonic() - start < 1
+    # the file the probes look for is cleaned up
+    assert list(web_modules_dir.iterdir()) == []
+
+
+def test_probes_queued_past_the_timeout_are_not_sent(start_server, monkeypatch):
+    monkeypatch.setattr(import_resources, "_MAX_CONCURRENT_PROBES", 1)
+    servers = {"first": start_server(delay=2), "second": start_server(delay=2)}
+    assert _probe_servers(servers, 0.2) is None
+    time.sleep(0.2)
+    assert start_server.requested == [servers["first"]["url"]]
+
+
+def test_discovered_urls_are_cached(start_server, monkeypatch):
+    found = start_server()
+    stopped = {**start_server(), "pid": -1}
+    running = [found]
+    monkeypatch.setattr(import_resources, "_list_running_servers", lambda: running)
+    # a server which has since stopped
+    import_resources._write_discovery_cache({"-1:http://127.0.0.1:1/": "stale"})
+
+    assert _try_to_set_import_source_base_url()
+    resource_url = found["url"] + "_reactpy_web_modules"
+    assert layout_widget._IMPORT_SOURCE_BASE_URL == resource_url
+    key = f"{found['pid']}:{found['url']}"
+    assert import_resources._read_discovery_cache() == {key: resource_url}
+
+    # later kernels use the cache rather than probing
+    monkeypatch.setattr(import_resources, "_probe_servers", None)
+    layout_widget._IMPORT_SOURCE_BASE_URL = None
+    assert _try_to_set_import_source_base_url()
+    assert layout_widget._IMPORT_SOURCE_BASE_URL == resource_url
+
+    # but not for servers which have been restarted
+    running[:] = [stopped]
+    monkeypatch.setattr(import_resources, "_probe_servers", lambda *args: None)
+    assert not _try_to_set_import_source_base_url()
+
+
+def test_only_local_servers_are_probed(start_server, monkeypatch):
+    remote = {**start_server(), "hostname": "example.com"}
+    monkeypatch.setattr(import_resources, "_list_running_servers", lambda: [remote])
+    assert not _try_to_set_import_source_base_url()
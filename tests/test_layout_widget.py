@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import ipywidgets
+from fake_frontend import FakeClient, fake_comms
+from reactpy import component, html, use_effect, use_ref, use_state
+
+from reactpy_jupyter import from_widget, layout_widget
+from reactpy_jupyter.config import (
+    REACTPY_JUPYTER_HIBERNATE_AFTER,
+    REACTPY_JUPYTER_HTML_SNAPSHOT,
+    REACTPY_JUPYTER_PRELOAD_MODULES,
+    REACTPY_JUPYTER_STATS,
+    REACTPY_JUPYTER_UPDATE_BATCH_WINDOW,
+    REACTPY_JUPYTER_UPDATE_HISTORY_SIZE,
+    REACTPY_JUPYTER_VIEW_WINDOW,
+    REACTPY_JUPYTER_WIRE_FORMAT,
+)
+from reactpy_jupyter.layout_widget import LayoutWidget, run
+from reactpy_jupyter.snapshot import WIDGET_MIME_TYPE
+from reactpy_jupyter.wire_format import decode_message
+
+
+@component
+def Counter():
+    count, set_count = use_state(0)
+    return html.div(
+        html.button({"on_click": lambda event: set_count(count + 1)}, str(count)),
+        html.p("static"),
+    )
+
+
+@component
+def TwoCounters():
+    # each count renders by itself, so a click results in two layout updates
+    setters = use_ref({}).current
+
+    def increment_both(event):
+        for set_value in setters.values():
+            set_value(lambda value: value + 1)
+
+    return html.div(
+        html.button({"on_click": increment_both}, "both"),
+        Count(setters, 0),
+        Count(setters, 1),
+    )
+
+
+@component
+def Count(setters, index):
+    value, setters[index] = use_state(0)
+    return html.p(str(value))
+
+
+def click(client: FakeClient, times: int = 1) -> None:
+    for _ in range(times):
+        version = client.version
+        client.send_event(client.find_target("on_click"), {"type": "click"})
+        client.wait_for_version(version + 1)
+
+
+def wait_until(condition: Callable[[], Any], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def record_messages(widget: LayoutWidget) -> list[dict]:
+    """Collect the decoded messages the widget sends from now on"""
+    sent = []
+    # ahead of the views so messages are recorded before the views are updated
+    widget.comm.listeners.insert(
+        0,
+        lambda content, buffers: sent.append(
+            {"viewIDs": content["viewIDs"], **decode_message(content, buffers)}
+        ),
+    )
+    return sent
+
+
+def test_views_receive_the_model(display):
+    _, client = display(Counter())
+    assert client.find_element("on_click")["children"] == ["0"]
+
+
+def test_events_update_every_view(display):
+    widget, client = display(Counter())
+    other = FakeClient(widget.comm)
+    try:
+        other.wait_for_version(1)
+        click(client, 3)
+        other.wait_for_version(client.version)
+        assert other.model == client.model
+        assert client.find_element("on_click")["children"] == ["3"]
+    finally:
+        other.close()
+
+
+def test_updates_within_the_batch_window_are_sent_together(display, option):
+    widget, client = display(TwoCounters())
+    # the window applies from the next update, so the first isn't batched with them
+    option(REACTPY_JUPYTER_UPDATE_BATCH_WINDOW, 0.05)
+    sent = record_messages(widget)
+    click(client)
+    assert [m["type"] for m in sent] == ["layout-update-batch"]
+    assert [u["version"] for u in sent[0]["updates"]] == [2, 3]
+
+
+def test_updates_are_sent_alone_without_a_batch_window(display):
+    widget, client = display(TwoCounters())
+    sent = record_messages(widget)
+    click(client)
+    client.wait_for_version(3)
+    assert [(m["type"], m["version"]) for m in sent] == [
+        ("layout-update", 2),
+        ("layout-update", 3),
+    ]
+
+
+def test_updates_are_encoded_once_for_all_views(display):
+    widget, client = display(Counter())
+    other = FakeClient(widget.comm)
+    try:
+        other.wait_for_version(1)
+        sent = []
+        # ahead of the views so the message is recorded before they are updated
+        widget.comm.listeners.insert(0, lambda content, _: sent.append(content))
+        click(client)
+        other.wait_for_version(client.version)
+        updates = [c for c in sent if "viewIDs" in c]
+        assert len(updates) == 1
+        assert set(updates[0]["viewIDs"]) == {client.view_id, other.view_id}
+    finally:
+        other.close()
+
+
+def test_views_showing_the_current_model_are_only_sent_updates(display):
+    widget, client = display(TwoCounters())
+    sent = record_messages(widget)
+    # a view which painted the current model, as another on the page had it
+    widget.comm.receive({"type": "client-ready", "viewID": "painted", "version": 1})
+    click(client)
+    client.wait_for_version(3)
+    assert [(m["type"], m["version"]) for m in sent] == [
+        ("layout-update", 2),
+        ("layout-update", 3),
+    ]
+    assert all(m["path"] for m in sent)
+
+
+def test_snapshot_is_published_for_the_first_view():
+    with fake_comms():
+        widget = LayoutWidget(Counter())
+        published = threading.Event()
+        widget.observe(lambda _: published.set(), "_reactpy_snapshot")
+        try:
+            widget._repr_mimebundle_()
+            # the snapshot is published by the first render, whenever that happens
+            assert widget._reactpy_snapshot or published.wait(5)
+            assert widget._reactpy_snapshot["version"] == 1
+            client = FakeClient(widget.comm)
+            client.reconnect(version=1)
+            client.wait_for_version(1)
+            # the view painted the snapshot so was not sent the model again
+            assert len(client.received) == 1
+            client.close()
+        finally:
+            widget.close()
+
+
+def test_snapshot_is_not_published_once_views_are_connected(display):
+    widget, client = display(Counter())
+    snapshot = widget._reactpy_snapshot
+    click(client)
+    widget._repr_mimebundle_()
+    # the connected view was sent the model and others on its page paint that one
+    assert widget._reactpy_snapshot is snapshot
+
+
+def test_display_does_not_wait_for_the_first_render():
+    release = threading.Event()
+
+    @component
+    def Slow():
+        release.wait(5)
+        return html.p("done")
+
+    with fake_comms():
+        widget = LayoutWidget(Slow())
+        try:
+            bundle = widget._repr_mimebundle_()
+            assert "text/html" not in bundle[0]
+        finally:
+            release.set()
+            widget.close()
+
+
+def test_html_snapshot_is_opt_in(display, option):
+    widget, client = display(Counter())
+    click(client)
+    assert "text/html" not in widget._repr_mimebundle_()[0]
+    option(REACTPY_JUPYTER_HTML_SNAPSHOT, True)
+    html_snapshot = widget._repr_mimebundle_()[0]["text/html"]
+    assert html_snapshot == "<div><button>1</button><p>static</p></div>"
+    # displays which can't show widgets are always given the HTML
+    option(REACTPY_JUPYTER_HTML_SNAPSHOT, False)
+    bundle = widget._repr_mimebundle_(exclude=[WIDGET_MIME_TYPE])
+    assert bundle[0]["text/html"] == html_snapshot
+
+
+def test_reconnecting_views_are_sent_only_what_they_missed(display):
+    widget, client = display(Counter())
+    click(client)
+    received = len(client.received)
+    client.reconnect()
+    click(client)
+    # the reconnected view was already up to date so only the click was sent
+    assert len(client.received) == received + 1
+    assert client.find_element("on_click")["children"] == ["2"]
+
+
+def test_views_too_far_behind_are_sent_the_full_model(display, option):
+    option(REACTPY_JUPYTER_UPDATE_HISTORY_SIZE, 1)
+    _, client = display(Counter())
+    click(client, 3)
+    # as if the page was saved at the first version - only a full model would do
+    client.model = {}
+    client.reconnect(version=1)
+    client.wait_for(lambda: client.model != {})
+    assert client.find_element("on_click")["children"] == ["3"]
+
+
+def test_events_are_counted(display):
+    widget, client = display(Counter())
+    click(client, 2)
+    assert widget.event_stats() == {
+        "received": 2,
+        "delivered": 2,
+        "coalesced": 0,
+        "dropped": 0,
+        "queued": 0,
+    }
+
+
+def test_updates_are_held_back_for_lagging_views(display, option):
+    option(REACTPY_JUPYTER_VIEW_WINDOW, 1)
+    widget, client = display(TwoCounters())
+    sent = record_messages(widget)
+    # a view which stops acknowledging the updates it is sent
+    widget.comm.receive({"type": "client-ready", "viewID": "lagging", "version": 1})
+
+    click(client)
+    client.wait_for_version(3)
+    assert [m["version"] for m in sent if "lagging" in m["viewIDs"]] == [2]
+    assert widget.outbox_stats()["lagging"] == {
+        "pending": 1,
+        "lag": 1,
+        "needs_resync": False,
+    }
+
+    widget.comm.receive({"type": "ack", "viewID": "lagging", "version": 2})
+    # the acknowledgement is handled before the next click
+    click(client)
+    assert [m["version"] for m in sent if "lagging" in m["viewIDs"]][:2] == [2, 3]
+
+
+def test_msgpack_wire_format(display, option):
+    option(REACTPY_JUPYTER_WIRE_FORMAT, "msgpack")
+    widget, client = display(Counter())
+    click(client, 2)
+    assert widget._reactpy_wire_format == "msgpack"
+    assert client.find_element("on_click")["children"] == ["2"]
+
+
+def test_stats_measure_encoded_messages(display, option):
+    option(REACTPY_JUPYTER_WIRE_FORMAT, "msgpack")
+    option(REACTPY_JUPYTER_STATS, True)
+    widget, client = display(Counter())
+    before = widget.stats()["counters"]
+    sent = []
+    widget.comm.listeners.insert(0, lambda _, buffers: sent.append(buffers))
+    click(client, 2)
+    after = widget.stats()["counters"]
+    assert len(sent) == after["messages_sent"] - before["messages_sent"] == 2
+    assert after["bytes_sent"] - before["bytes_sent"] == sum(len(b[0]) for b in sent)
+    # the clicks, and perhaps acks, were recorded before the updates they caused
+    assert after["messages_received"] - before["messages_received"] >= 2
+    assert widget.stats()["histograms"]["event_to_update_seconds"]["count"] == 2
+
+
+def test_binary_props_are_sent_once(display):
+    data = bytes(range(256)) * 4
+
+    @component
+    def Binary():
+        count, set_count = use_state(0)
+        return html.div(
+            html.button({"on_click": lambda event: set_count(count + 1)}, str(count)),
+            html.canvas({"data": data}),
+        )
+
+    _, client = display(Binary())
+    assert [bytes(b) for b in client.buffers.values()] == [data]
+    received = len(client.received)
+    click(client)
+    # the unchanged value was not sent again
+    assert client.received[received][1] < len(data)
+
+
+def test_inner_widgets_are_sent_as_they_change(display):
+    slider = ipywidgets.IntSlider()
+
+    @component
+    def Embed():
+        shown, set_shown = use_state(True)
+        return html.div(
+            html.button({"on_click": lambda event: set_shown(not shown)}, "toggle"),
+            from_widget(slider) if shown else html.p("hidden"),
+        )
+
+    try:
+        _, client = display(Embed())
+        client.wait_for(lambda: client.inner_widgets == {slider.model_id})
+        click(client)
+        client.wait_for(lambda: not client.inner_widgets)
+    finally:
+        slider.close()
+
+
+def test_closing_unmounts_the_layout(display):
+    unmounted = threading.Event()
+
+    @component
+    def Mounted():
+        use_effect(lambda: unmounted.set, [])
+        return html.p("mounted")
+
+    widget, _ = display(Mounted())
+    assert not unmounted.is_set()
+    widget.close()
+    assert unmounted.wait(5)
+
+
+def test_widgets_without_views_hibernate(display, option):
+    option(REACTPY_JUPYTER_HIBERNATE_AFTER, 0.05)
+    widget, client = display(Counter())
+    click(client, 2)
+
+    widget.comm.receive({"type": "client-removed", "viewID": client.view_id})
+    # the model is released, along with the snapshot if one was published
+    wait_until(lambda: not widget._reactpy_model and not widget._reactpy_snapshot)
+
+    # the layout renders afresh, with its state reset, once a view is back
+    client.reconnect()
+    client.wait_for_version(4)
+    assert client.find_element("on_click")["children"] == ["0"]
+
+
+def test_imported_modules_are_preloaded(display, option):
+    option(REACTPY_JUPYTER_PRELOAD_MODULES, True)
+
+    @component
+    def Imports():
+        shown, set_shown = use_state(False)
+        chart = {
+            "tagName": "Chart",
+            "importSource": {"source": "chart.js", "sourceType": "NAME"},
+        }
+        return html.div(
+            html.button({"on_click": lambda event: set_shown(True)}, "show"),
+            chart if shown else html.p("hidden"),
+        )
+
+    widget, client = display(Imports())
+    assert widget._reactpy_preload == []
+    preloaded = []
+
+    def on_message(content, buffers):
+        if "viewIDs" in content:
+            preloaded.append(list(widget._reactpy_preload))
+
+    widget.comm.listeners.insert(0, on_message)
+    click(client)
+    # the hint was synced before the update which needs the module was sent
+    assert preloaded == [["chart.js"]]
+
+
+def test_modules_are_recorded_the_first_time_a_layout_uses_them(display, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(layout_widget, "record_web_modules_used", recorded.append)
+
+    @component
+    def Charts():
+        count, set_count = use_state(1)
+        return html.div(
+            html.button({"on_click": lambda event: set_count(count + 1)}, "more"),
+            *[
+                {
+                    "tagName": "Chart",
+                    "importSource": {"source": f"{i % 2}.js", "sourceType": "NAME"},
+                }
+                for i in range(count)
+            ],
+        )
+
+    _, client = display(Charts())
+    click(client, 3)
+    assert recorded == [{"0.js"}, {"1.js"}]
+
+
+def test_running_a_cell_again_closes_the_widgets_it_ran(monkeypatch):
+    shell = SimpleNamespace(parent_header={}, execution_count=0)
+    monkeypatch.setattr("IPython.get_ipython", lambda: shell)
+    monkeypatch.setattr(layout_widget, "_RUN_WIDGETS", {})
+    displayed = []
+    monkeypatch.setattr(layout_widget, "ipython_display", displayed.append)
+
+    def run_cell(cell_id, runs=1):
+        shell.parent_header = {"metadata": {"cellId": cell_id}}
+        shell.execution_count += 1
+        for _ in range(runs):
+            run(Counter)
+        return displayed[-runs:]
+
+    with fake_comms():
+        try:
+            first = run_cell("a", runs=2)
+            other = run_cell("b")
+            assert all(w.comm is not None for w in first + other)
+            again = run_cell("a")
+            assert all(w.comm is None for w in first)
+            assert all(w.comm is not None for w in other + again)
+        finally:
+            for widget in displayed:
+                widget.close()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fake_frontend import FakeClient, fake_comms
+from reactpy import component, html
+from reactpy.core.component import Component
+
+from reactpy_jupyter import monkey_patch
+from reactpy_jupyter.config import REACTPY_JUPYTER_COMPONENT_WIDGETS
+from reactpy_jupyter.monkey_patch import (
+    COMPONENT_WIDGETS,
+    WidgetCache,
+    running_ipython,
+    when_imported,
+)
+
+
+@component
+def Hello(name: str):
+    return html.p(f"Hello {name}")
+
+
+@pytest.fixture
+def execution(monkeypatch):
+    """Pose as IPython running the cell with the given execution count"""
+    count = [1]
+    monkeypatch.setattr(monkey_patch, "_execution_count", lambda: count[0])
+    return count
+
+
+def test_reactpy_components_display_as_widgets():
+    assert Component._repr_mimebundle_.__module__ == "reactpy_jupyter.monkey_patch"
+
+
+def test_displays_without_widgets_do_not_start_one():
+    hello = Hello("static")
+    widgets = len(COMPONENT_WIDGETS)
+    bundle = hello._repr_mimebundle_(include=["text/plain"])
+    assert bundle == {"text/plain": repr(hello)}
+    assert len(COMPONENT_WIDGETS) == widgets
+
+
+def test_widget_cache_closes_the_least_recently_displayed_widgets(option, execution):
+    option(REACTPY_JUPYTER_COMPONENT_WIDGETS, 2)
+    cache = WidgetCache()
+    first, second, third = Hello("first"), Hello("second"), Hello("third")
+    with fake_comms():
+        try:
+            first_widget = cache.get(first)
+            second_widget = cache.get(second)
+            execution[0] += 1
+            assert cache.get(first) is first_widget
+            cache.get(third)
+            assert len(cache) == 2
+            assert second_widget.comm is None
+            assert first_widget.comm is not None
+        finally:
+            cache.clear()
+    assert first_widget.comm is None
+
+
+def test_widget_cache_keeps_widgets_being_shown(option, execution):
+    option(REACTPY_JUPYTER_COMPONENT_WIDGETS, 1)
+    cache = WidgetCache()
+    with fake_comms():
+        try:
+            shown = cache.get(Hello("shown"))
+            client = FakeClient(shown.comm)
+            client.wait_for_version(1)
+            execution[0] += 1
+            hidden = cache.get(Hello("hidden"))
+            assert len(cache) == 2
+            assert shown.comm is not None
+
+            client.close()
+            wait_until(lambda: not shown.has_views)
+            execution[0] += 1
+            cache.get(Hello("new"))
+            # neither widget is shown so both are closed to get within the limit
+            assert len(cache) == 1
+            assert shown.comm is None and hidden.comm is None
+        finally:
+            cache.clear()
+
+
+def test_widget_cache_keeps_widgets_displayed_by_the_running_cell(option, execution):
+    option(REACTPY_JUPYTER_COMPONENT_WIDGETS, 2)
+    cache = WidgetCache()
+    with fake_comms():
+        try:
+            # a cell whose loop displays more components than are kept
+            widgets = [cache.get(Hello(str(i))) for i in range(5)]
+            # none were closed before the browser had a chance to show them
+            assert len(cache) == 5
+            assert all(w.comm is not None for w in widgets)
+
+            # unless shown and then hidden again
+            client = FakeClient(widgets[1].comm)
+            client.wait_for_version(1)
+            client.close()
+            wait_until(lambda: not widgets[1].has_views)
+            cache.get(Hello("more"))
+            assert widgets[1].comm is None
+            assert len(cache) == 5
+
+            # once the next cell runs, the widgets never shown are closed
+            execution[0] += 1
+            cache.get(Hello("next"))
+            assert len(cache) == 2
+            assert all(w.comm is None for w in widgets)
+        finally:
+            cache.clear()
+
+
+def test_hooks_run_once_a_module_is_imported(tmp_path, monkeypatch):
+    (tmp_path / "hooked_module.py").write_text("value = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    hooked = []
+
+    when_imported("hooked_module", hooked.append)
+    assert hooked == []
+    import hooked_module
+
+    try:
+        assert hooked == [hooked_module]
+        # modules which are already imported are passed to hooks straight away
+        when_imported("hooked_module", hooked.append)
+        assert hooked == [hooked_module, hooked_module]
+    finally:
+        del sys.modules["hooked_module"]
+
+
+def test_running_ipython(monkeypatch):
+    monkeypatch.delenv("JPY_PARENT_PID", raising=False)
+    monkeypatch.setattr(sys, "orig_argv", ["python3", "-m", "pytest"], raising=False)
+    assert not running_ipython()
+    monkeypatch.setattr(sys, "orig_argv", ["python3", "-m", "ipykernel_launcher"])
+    assert running_ipython()
+    monkeypatch.setattr(sys, "orig_argv", ["python3", "-m", "pytest"])
+    monkeypatch.setenv("JPY_PARENT_PID", "1")
+    assert running_ipython()
+
+
+def test_imports_are_only_watched_in_ipython():
+    env = {k: v for k, v in os.environ.items() if k != "JPY_PARENT_PID"}
+    for program, watched in [("ipykernel_launcher", "True"), ("pytest", "False")]:
+        # pose as the program before the package is imported and patches ReactPy
+        code = (
+            f"import sys; sys.orig_argv[1:] = ['-m', {program!r}]; "
+            "from reactpy_jupyter import monkey_patch; "
+            "print(monkey_patch._FINDER in sys.meta_path)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, env=env
+        )
+        assert result.stdout.strip() == watched, result.stderr
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
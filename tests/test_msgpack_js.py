@@ -0,0 +1,115 @@
+"""Round trips between the browser's MessagePack codec and the Python encoder"""
+
+from __future__ import annotations
+
+import base64
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from reactpy_jupyter.config import msgpack
+
+NODE = shutil.which("node")
+CODEC = Path(__file__).parents[1] / "src" / "msgpack.js"
+
+pytestmark = [
+    pytest.mark.skipif(NODE is None, reason="Node.js is not installed"),
+    pytest.mark.skipif(msgpack is None, reason="msgpack is not installed"),
+]
+
+# Binary values can't be put in JSON so are passed to and from Node.js as base64
+_NODE_SCRIPT = """
+import { readFileSync } from "node:fs";
+import { decode, encode } from %s;
+
+const toBytes = (b64) => new Uint8Array(Buffer.from(b64, "base64"));
+const toBase64 = (bytes) => Buffer.from(bytes).toString("base64");
+const fromJson = (k, v) => (v && v.$bytes !== undefined ? toBytes(v.$bytes) : v);
+const toJson = (k, v) => (v instanceof Uint8Array ? { $bytes: toBase64(v) } : v);
+
+const input = JSON.parse(readFileSync(0, "utf8"), fromJson);
+const output = {
+  decoded: input.packed.map((p) => decode(p)),
+  encoded: input.values.map((v) => encode(v)),
+};
+process.stdout.write(JSON.stringify(output, toJson));
+"""
+
+VALUES = [
+    None,
+    True,
+    False,
+    *[0, 1, 127, 128, 255, 256, 65535, 65536, 2**32 - 1, 2**32, 2**53 - 1],
+    *[
+        -1,
+        -32,
+        -33,
+        -128,
+        -129,
+        -32768,
+        -32769,
+        -(2**31),
+        -(2**31) - 1,
+        1 - 2**53,
+    ],
+    *[0.5, -1.25, 1e300, 3.141592653589793],
+    *["", "a", "é €", "𝄞", "x" * 31, "x" * 32, "x" * 255, "x" * 256, "x" * 65536],
+    *[[], [1, "a", None], list(range(15)), list(range(16)), list(range(65536))],
+    *[{}, {"a": 1}, {str(i): i for i in range(15)}, {str(i): i for i in range(16)}],
+    *[b"", bytes(range(256)), b"\0" * 65536],
+    {
+        "type": "layout-update",
+        "path": "/children/0",
+        "model": {"tagName": "p", "attributes": {"x": 1.5}, "children": ["é"]},
+        "version": 3,
+    },
+]
+
+
+def run_codec(packed: list[bytes], values: list[Any]) -> dict[str, list[Any]]:
+    script = _NODE_SCRIPT % json.dumps(CODEC.as_uri())
+    data = {"packed": [_bytes_to_json(p) for p in packed], "values": values}
+    result = subprocess.run(
+        [NODE, "--input-type=module", "-e", script],
+        input=json.dumps(data, default=_bytes_to_json),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout, object_hook=_bytes_from_json)
+
+
+def test_decodes_what_python_encodes():
+    packed = [msgpack.packb(value) for value in VALUES]
+    assert run_codec(packed, [])["decoded"] == VALUES
+
+
+def test_python_decodes_what_it_encodes():
+    encoded = run_codec([], VALUES)["encoded"]
+    assert [msgpack.unpackb(e) for e in encoded] == VALUES
+
+
+def test_encodes_like_python():
+    # both pick the smallest representation of each value
+    assert run_codec([], VALUES)["encoded"] == [msgpack.packb(v) for v in VALUES]
+
+
+def test_rejects_extension_types():
+    packed = msgpack.packb([1, msgpack.ExtType(1, b"abc"), 2])
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        run_codec([packed], [])
+    assert "Unsupported MessagePack extension type 1" in error.value.stderr
+
+
+def _bytes_to_json(value: bytes) -> dict[str, str]:
+    return {"$bytes": base64.b64encode(value).decode()}
+
+
+def _bytes_from_json(value: dict[str, Any]) -> Any:
+    if "$bytes" in value:
+        return base64.b64decode(value["$bytes"])
+    return value
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+import reactpy_jupyter
+
+
+def test_importing_the_package_loads_neither_jupyter_nor_reactpy():
+    code = (
+        "import sys, reactpy_jupyter; "
+        "print(sorted({'anywidget', 'ipywidgets', 'reactpy', 'requests'} "
+        "& set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_public_names_are_loaded_on_first_use():
+    from reactpy_jupyter.layout_widget import to_widget
+
+    assert reactpy_jupyter.to_widget is to_widget
+    assert set(reactpy_jupyter.__all__) <= set(dir(reactpy_jupyter))
+    with pytest.raises(AttributeError):
+        reactpy_jupyter.not_a_name
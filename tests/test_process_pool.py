@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import os
+import threading
+
+import pytest
+from reactpy import component, html, use_state
+
+from reactpy_jupyter import process_pool
+from reactpy_jupyter.config import REACTPY_JUPYTER_RENDER_PROCESSES
+from reactpy_jupyter.process_pool import acquire_render_worker
+
+
+@pytest.fixture
+def workers(monkeypatch, option):
+    """Render in a pool of worker processes of its own"""
+    option(REACTPY_JUPYTER_RENDER_PROCESSES, 1)
+    started = []
+    monkeypatch.setattr(process_pool, "_WORKERS", started)
+    yield started
+    for worker in started:
+        worker.stop()
+        worker.process.join(5)
+
+
+@component
+def ProcessCounter():
+    count, set_count = use_state(0)
+    return html.div(
+        html.button({"on_click": lambda event: set_count(count + 1)}, str(count)),
+        html.p(str(os.getpid())),
+    )
+
+
+@component
+def Broken(value):
+    return html.p(str(value))
+
+
+class LoadsWithAnError:
+    def __reduce__(self):
+        return _raise_value_error, ("broken component",)
+
+
+def _raise_value_error(message):
+    raise ValueError(message)
+
+
+@component
+def Crashing():
+    return html.button({"on_click": lambda event: os._exit(1)}, "crash")
+
+
+def test_layouts_render_in_workers(workers, display):
+    widget, client = display(ProcessCounter())
+    client.send_event(client.find_target("on_click"), {"type": "click"})
+    client.wait_for(lambda: client.find_element("on_click")["children"] == ["1"])
+    assert _texts(client.model)[-1] == str(workers[0].process.pid)
+    assert workers[0].process.pid != os.getpid()
+
+    widget.close()
+    _wait_until(lambda: not workers[0].layouts)
+
+
+def test_errors_in_workers_are_shown_in_the_widget(workers, display):
+    _, client = display(Broken(LoadsWithAnError()))
+    assert "broken component" in _texts(client.model)[0]
+
+
+def test_components_which_cannot_be_sent_show_the_error(workers, display):
+    _, client = display(Broken(threading.Lock()))
+    assert "pickle" in _texts(client.model)[0]
+    # no worker was needed
+    assert workers == []
+
+
+def test_crashed_workers_are_replaced(workers, display):
+    _, client = display(Crashing())
+    crashed = workers[0]
+    client.send_event(client.find_target("on_click"), {"type": "click"})
+    client.wait_for_version(2)
+    assert "exited unexpectedly" in _texts(client.model)[0]
+    assert not crashed.alive
+
+    assert acquire_render_worker() is not crashed
+    assert workers != [crashed]
+
+
+def test_layouts_go_to_the_least_loaded_worker(workers, option):
+    option(REACTPY_JUPYTER_RENDER_PROCESSES, 2)
+    first, second = acquire_render_worker(), acquire_render_worker()
+    assert first is not second
+    first.layouts[-1] = None
+    assert acquire_render_worker() is second
+
+
+def _texts(model):
+    texts = []
+    for child in model.get("children", []):
+        if isinstance(child, dict):
+            texts.extend(_texts(child))
+        else:
+            texts.append(child)
+    return texts
+
+
+def _wait_until(condition, timeout=5.0):
+    event = threading.Event()
+    while not condition():
+        assert timeout > 0, "timed out"
+        event.wait(0.01)
+        timeout -= 0.01
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+
+from reactpy import component, html, use_effect
+
+from reactpy_jupyter import profiler
+from reactpy_jupyter.magics import reactpy_profile
+from reactpy_jupyter.profiler import Profile
+
+
+@component
+def Outer():
+    return html.div(Inner(), Inner())
+
+
+@component
+def Inner():
+    use_effect(lambda: None, [])
+    return html.p("inner")
+
+
+def test_profile_table_is_sorted():
+    profile = Profile()
+    profile.record_render(("App",), 0.003, 0.001)
+    profile.record_render(("App", "Row"), 0.002, 0.002)
+    profile.record_effects(("App", "Row"), 0.004)
+
+    rows = [line.split() for line in profile.table().splitlines()]
+    assert rows[0][:2] == ["component", "renders"]
+    assert rows[1] == ["App", "1", "3.00", "1.00", "0.00", "3.00"]
+    assert [r[0] for r in rows[1:]] == ["App", "Row"]
+    effects_rows = profile.table("effects").splitlines()[1:]
+    assert [r.split()[0] for r in effects_rows] == ["Row", "App"]
+    assert len(profile.table(limit=1).splitlines()) == 2
+
+
+def test_profile_exports():
+    profile = Profile()
+    profile.record_render(("App",), 0.003, 0.001)
+    profile.record_render(("App", "Row"), 0.002, 0.002)
+    profile.record_effects(("App", "Row"), 0.004)
+
+    assert profile.collapsed_stacks().splitlines() == [
+        "App 1000",
+        "App;Row 2000",
+        "App;Row;(effects) 4000",
+    ]
+    speedscope = profile.speedscope()
+    frames = [f["name"] for f in speedscope["shared"]["frames"]]
+    assert frames == ["App", "Row", "(effects)"]
+    assert speedscope["profiles"][0]["samples"] == [[0], [0, 1], [0, 1, 2]]
+    assert speedscope["profiles"][0]["weights"] == [1000, 2000, 4000]
+
+
+def test_profile_saves_by_extension(tmp_path):
+    profile = Profile()
+    profile.record_render(("App",), 0.001, 0.001)
+    profile.save(tmp_path / "renders.json")
+    profile.save(tmp_path / "renders.txt")
+    assert json.loads((tmp_path / "renders.json").read_text()) == profile.speedscope()
+    assert (tmp_path / "renders.txt").read_text() == "App 1000\n"
+
+
+def test_widgets_created_while_profiling_record_their_components(display):
+    profile = profiler.start_profile()
+    try:
+        _, client = display(Outer())
+    finally:
+        profiler.stop_profile()
+    display(Outer())
+
+    # effects run after the render is sent
+    client.wait_for(lambda: profile.components["Inner"].effect_time > 0, 5)
+    assert profile.components["Outer"].renders == 1
+    assert profile.components["Inner"].renders == 2
+    outer = profile.components["Outer"]
+    assert outer.total_time >= outer.self_time
+    # the root is wrapped in a context provider for the widget's inner widgets
+    assert ("context", "Outer", "Inner") in profile.stacks
+    assert ("context", "Outer", "Inner", "(effects)") in profile.stacks
+
+
+def test_reactpy_profile_magic(display, capsys, tmp_path):
+    reactpy_profile("start")
+    try:
+        assert "Profiling widgets" in capsys.readouterr().out
+        display(Outer())
+    finally:
+        reactpy_profile("stop")
+    table = capsys.readouterr().out.splitlines()
+    assert table[0].split()[0] == "component"
+    assert {line.split()[0] for line in table[1:]} >= {"Outer", "Inner"}
+
+    reactpy_profile("--sort renders --limit 1")
+    assert capsys.readouterr().out.splitlines()[1].split()[:2] == ["Inner", "2"]
+
+    path = tmp_path / "renders.json"
+    reactpy_profile(f"save {path}")
+    assert capsys.readouterr().out.strip() == f"Saved profile to {path}"
+    assert path.exists()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fake_frontend import FakeClient, fake_comms
+from reactpy import component, html, use_state
+
+from reactpy_jupyter import render_loop as render_loop_module
+from reactpy_jupyter.config import (
+    REACTPY_JUPYTER_RENDER_LOOP,
+    REACTPY_JUPYTER_RENDER_THREADS,
+)
+from reactpy_jupyter.layout_widget import LayoutWidget
+from reactpy_jupyter.render_loop import KernelLoop, RenderLoop, acquire_render_loop
+
+
+@pytest.fixture
+def render_loops(monkeypatch):
+    """Start from an empty pool of render loops"""
+    loops = []
+    monkeypatch.setattr(render_loop_module, "_RENDER_LOOPS", loops)
+    yield loops
+    for render_loop in loops:
+        render_loop.loop.call_soon_threadsafe(render_loop.loop.stop)
+
+
+def test_render_loops_are_shared_up_to_the_thread_limit(option, render_loops):
+    option(REACTPY_JUPYTER_RENDER_THREADS, 2)
+    loops = [acquire_render_loop() for _ in range(4)]
+    try:
+        assert render_loops == loops[:2]
+        assert [r.user_count for r in render_loops] == [2, 2]
+        assert len({r.thread for r in loops}) == 2
+        assert all(r.thread.daemon and r.thread.is_alive() for r in loops)
+    finally:
+        for render_loop in loops:
+            render_loop.release()
+
+
+def test_the_least_busy_render_loop_is_acquired(option, render_loops):
+    option(REACTPY_JUPYTER_RENDER_THREADS, 2)
+    first, second = acquire_render_loop(), acquire_render_loop()
+    second.release()
+    assert acquire_render_loop() is second
+    first.release()
+    assert acquire_render_loop() is first
+    assert [r.user_count for r in render_loops] == [1, 1]
+
+
+def test_render_loops_run_coroutines_and_callbacks():
+    render_loop = acquire_render_loop()
+    called_in = []
+
+    async def get_thread():
+        await asyncio.sleep(0)
+        return threading.current_thread()
+
+    try:
+        assert render_loop.run(get_thread()).result(5) is render_loop.thread
+        render_loop.call_soon(lambda: called_in.append(threading.current_thread()))
+        render_loop.run(asyncio.sleep(0)).result(5)
+        assert called_in == [render_loop.thread]
+    finally:
+        render_loop.release()
+
+
+def test_widgets_render_in_the_shared_loops(option):
+    option(REACTPY_JUPYTER_RENDER_THREADS, 1)
+    threads_before = threading.active_count()
+    render_threads = set()
+
+    @component
+    def Counter():
+        count, set_count = use_state(0)
+        render_threads.add(threading.current_thread())
+        return html.button({"on_click": lambda event: set_count(count + 1)}, count)
+
+    widgets = [LayoutWidget(Counter()) for _ in range(20)]
+    for widget in widgets:
+        _wait_until(lambda: widget._reactpy_model)
+
+    # at most the one render loop allowed was started, rather than a thread per widget
+    assert threading.active_count() <= threads_before + 1
+    assert render_threads == {w._reactpy_loop.thread for w in widgets}
+
+    button = _find_button(widgets[0]._reactpy_model)
+    target = button["eventHandlers"]["on_click"]["target"]
+    event = {"type": "layout-event", "target": target, "data": [{}]}
+    widgets[0]._reactpy_on_msg({"type": "dom-event", "data": event}, [])
+    _wait_until(lambda: _find_button(widgets[0]._reactpy_model)["children"] == ["1"])
+
+
+def test_the_running_loop_is_acquired_in_kernel_mode(option):
+    option(REACTPY_JUPYTER_RENDER_LOOP, "kernel")
+
+    async def acquire_twice():
+        first, second = acquire_render_loop(), acquire_render_loop()
+        assert first is second
+        assert first.loop is asyncio.get_running_loop()
+        assert first.user_count == 2
+        first.release()
+        second.release()
+        return first
+
+    kernel_loop = asyncio.run(acquire_twice())
+    assert isinstance(kernel_loop, KernelLoop)
+    assert kernel_loop.user_count == 0
+
+
+def test_kernel_mode_falls_back_to_threads_without_a_running_loop(option):
+    option(REACTPY_JUPYTER_RENDER_LOOP, "kernel")
+    render_loop = acquire_render_loop()
+    try:
+        assert isinstance(render_loop, RenderLoop)
+    finally:
+        render_loop.release()
+
+
+def test_kernel_loops_are_called_from_any_thread():
+    async def call_from_everywhere():
+        kernel_loop = KernelLoop(asyncio.get_running_loop())
+        called = asyncio.Event()
+        called_in = []
+
+        def call():
+            called_in.append(threading.current_thread())
+            if len(called_in) == 2:
+                called.set()
+
+        kernel_loop.call_soon(call)
+        thread = threading.Thread(target=kernel_loop.call_soon, args=(call,))
+        thread.start()
+        thread.join()
+        await asyncio.wait_for(called.wait(), 5)
+        return called_in
+
+    assert asyncio.run(call_from_everywhere()) == [threading.main_thread()] * 2
+
+
+def test_widgets_render_on_the_kernel_loop(option):
+    option(REACTPY_JUPYTER_RENDER_LOOP, "kernel")
+    render_threads = set()
+
+    @component
+    def Counter():
+        count, set_count = use_state(0)
+        render_threads.add(threading.current_thread())
+        return html.button({"on_click": lambda event: set_count(count + 1)}, count)
+
+    async def click():
+        widget = LayoutWidget(Counter())
+        client = FakeClient(widget.comm)
+        try:
+            await client.wait_for_version_async(1)
+            client.send_event(client.find_target("on_click"), {"type": "click"})
+            await client.wait_for_version_async(2)
+            return client.find_element("on_click")["children"]
+        finally:
+            client.close()
+            widget.close()
+
+    with fake_comms():
+        assert asyncio.run(click()) == ["1"]
+    assert render_threads == {threading.main_thread()}
+
+
+def _find_button(model):
+    if model.get("tagName") == "button":
+        return model
+    for child in model.get("children", []):
+        if isinstance(child, dict) and (button := _find_button(child)):
+            return button
+    return None
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
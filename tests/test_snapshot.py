@@ -0,0 +1,125 @@
+import ipywidgets
+from reactpy import component, html, use_effect, use_state
+
+from reactpy_jupyter import from_widget
+from reactpy_jupyter.snapshot import model_to_html, render_model, snapshot_mimebundle
+
+
+def test_model_to_html_elements_and_text():
+    model = {
+        "tagName": "div",
+        "attributes": {"class_name": "a", "data_x": 1, "aria-label": 'say "hi"'},
+        "children": ["<b>", {"tagName": "br"}, {"tagName": "p", "children": ["x"]}],
+    }
+    assert model_to_html(model) == (
+        '<div class="a" data-x="1" aria-label="say &quot;hi&quot;">'
+        "&lt;b&gt;<br><p>x</p></div>"
+    )
+
+
+def test_model_to_html_attributes():
+    model = {
+        "tagName": "input",
+        "attributes": {
+            "style": {"backgroundColor": "red", "font_size": "2px", "--Var": "1"},
+            "disabled": True,
+            "hidden": False,
+            "title": None,
+            "htmlFor": "x",
+            "value": b"binary",
+            "onclick": "alert(1)",
+            "bad name": "x",
+        },
+    }
+    assert model_to_html(model) == (
+        '<input style="background-color:red;font-size:2px;--Var:1" disabled for="x"'
+        ' onclick="alert(1)">'
+    )
+
+
+def test_model_to_html_leaves_out_scripts_and_fragments():
+    model = {
+        "tagName": "",
+        "children": [
+            {"tagName": "script", "children": ["alert(1)"]},
+            {"tagName": "style", "children": ["a > b {} </style>"]},
+            {"tagName": "not a tag", "children": ["text"]},
+        ],
+    }
+    assert model_to_html(model) == "<style>a > b {} <\\/style></style>text"
+
+
+def test_model_to_html_errors_and_import_sources():
+    model = {
+        "tagName": "div",
+        "children": [
+            {"tagName": "", "error": "oops <x>"},
+            {
+                "tagName": "Chart",
+                "importSource": {
+                    "source": "chart.js",
+                    "fallback": {"tagName": "p", "children": ["loading"]},
+                },
+            },
+        ],
+    }
+    assert model_to_html(model) == "<div><pre>oops &lt;x&gt;</pre><p>loading</p></div>"
+
+
+@component
+def Hello():
+    return html.p("hello")
+
+
+def test_render_model():
+    model, inner_widgets = render_model(Hello())
+    assert inner_widgets == {}
+    assert _find_element(model, "p") == {
+        "tagName": "p",
+        "children": ["hello"],
+    }
+
+
+def test_render_model_until_settled():
+    @component
+    def Steps():
+        step, set_step = use_state(0)
+        use_effect(lambda: set_step(step + 1) if step < 3 else None, [step])
+        return html.p(str(step))
+
+    model, _ = render_model(Steps())
+    assert model_to_html(model) == "<p>0</p>"
+    model, _ = render_model(Steps(), max_renders=10, settle_time=0.1)
+    assert model_to_html(model) == "<p>3</p>"
+
+
+def test_snapshot_mimebundle_with_inner_widgets():
+    label = ipywidgets.Label("label")
+
+    @component
+    def Embed():
+        return html.div(from_widget(label))
+
+    try:
+        bundle = snapshot_mimebundle(Embed(), exclude=["application/json"])
+    finally:
+        label.close()
+    assert set(bundle) == {"text/plain", "text/html"}
+    assert bundle["text/html"].startswith("<div>")
+    assert "Label" in bundle["text/html"]
+
+
+def test_snapshot_mimebundle_of_plain_text():
+    hello = Hello()
+    assert snapshot_mimebundle(hello, include=["text/plain"]) == {
+        "text/plain": repr(hello)
+    }
+
+
+def _find_element(model, tag_name):
+    if model.get("tagName") == tag_name:
+        return model
+    for child in model.get("children", []):
+        if isinstance(child, dict) and (element := _find_element(child, tag_name)):
+            return element
+    return None
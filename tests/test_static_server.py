@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from reactpy_jupyter.static_server import StaticFileServer
+from reactpy_jupyter.web_modules import (
+    IMMUTABLE_CACHE_CONTROL,
+    WebModuleStore,
+    module_digest,
+)
+
+MODULE = "export const value = 1;\\n" * 100
+
+
+@pytest.fixture
+def directory(tmp_path: Path) -> Path:
+    (tmp_path / "module.js").write_text(MODULE)
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "other.js").write_text("export default 1;")
+    return tmp_path
+
+
+@pytest.fixture
+def get(directory: Path) -> Iterator:
+    server = StaticFileServer(directory)
+    server.start()
+    host, port = server.url.split("//", 1)[1].rstrip("/").split(":")
+    connection = http.client.HTTPConnection(host, int(port), timeout=10)
+
+    def get(path: str, **headers: str) -> tuple[http.client.HTTPResponse, bytes]:
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    yield get
+    connection.close()
+    server.stop()
+
+
+def test_serves_files(get):
+    response, body = get("/module.js")
+    assert response.status == 200
+    assert body.decode() == MODULE
+    assert "javascript" in response.getheader("Content-Type")
+    assert response.getheader("Access-Control-Allow-Origin") == "*"
+    assert response.getheader("Cache-Control") == "no-cache"
+
+
+def test_names_which_look_hashed_are_revalidated(get, directory):
+    # only the digests of _hashed paths are checked so other files may change
+    for name in ["chart-20231010.js", "module.0123abcdef.js"]:
+        (directory / name).write_text(MODULE)
+        assert get(f"/{name}")[0].getheader("Cache-Control") == "no-cache"
+
+
+def test_missing_files_and_directories(get):
+    assert get("/missing.js")[0].status == 404
+    assert get("/nested/")[0].status == 404
+
+
+def test_revalidates_with_etags(get):
+    response, _ = get("/module.js")
+    etag = response.getheader("ETag")
+    response, body = get("/module.js", **{"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+
+
+def test_revalidates_with_modification_times(get):
+    response, _ = get("/module.js")
+    modified = response.getheader("Last-Modified")
+    assert get("/module.js", **{"If-Modified-Since": modified})[0].status == 304
+
+
+def test_compresses_with_gzip(get, directory):
+    response, body = get("/module.js", **{"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body).decode() == MODULE
+    assert (directory / "module.js.gz").exists()
+    # small files are sent as they are
+    response, _ = get("/nested/other.js", **{"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") is None
+
+
+def test_manifest(get, directory):
+    response, body = get("/_manifest.json")
+    assert response.getheader("Cache-Control") == "no-cache"
+    digest = module_digest(directory / "module.js")
+    modules = json.loads(body)["modules"]
+    assert modules["module.js"] == f"_hashed/{digest}/module.js"
+    assert set(modules) == {"module.js", "nested/other.js"}
+
+
+def test_hashed_paths(get, directory):
+    modules = json.loads(get("/_manifest.json")[1])["modules"]
+    response, body = get(f"/{modules['nested/other.js']}")
+    assert response.status == 200
+    assert body == b"export default 1;"
+    assert response.getheader("Cache-Control") == IMMUTABLE_CACHE_CONTROL
+
+
+def test_hashed_paths_of_changed_modules_are_not_found(get, directory):
+    path = json.loads(get("/_manifest.json")[1])["modules"]["module.js"]
+    (directory / "module.js").write_text("export const value = 2;")
+    assert get(f"/{path}")[0].status == 404
+
+
+def test_hashed_paths_cannot_escape_the_directory(get, directory):
+    outside = directory.parent / "outside.js"
+    outside.write_text("secret")
+    digest = module_digest(outside)
+    assert get(f"/_hashed/{digest}/../outside.js")[0].status == 404
+    assert get(f"/_hashed/{digest}/%2E%2E/outside.js")[0].status == 404
+
+
+def test_serving_modules_records_their_use(get, directory):
+    old = time.time() - 40 * 24 * 60 * 60
+    os.utime(directory / "module.js", (old, old))
+    get("/module.js")
+    store = WebModuleStore(directory)
+    assert store.collect_garbage(max_size=0, max_age=1)["removed"] == []
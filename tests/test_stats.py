@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from reactpy import component, html
+from test_layout_widget import Counter, click
+
+from reactpy_jupyter.config import REACTPY_JUPYTER_STATS
+from reactpy_jupyter.layout_widget import LayoutWidget
+from reactpy_jupyter.magics import reactpy_stats
+from reactpy_jupyter.stats import (
+    NULL_STATS,
+    Histogram,
+    Stats,
+    create_stats,
+    format_stats,
+    kernel_stats,
+)
+
+
+def test_histogram_summary():
+    histogram = Histogram(sample_size=100)
+    for value in range(1, 201):
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary["count"] == 200
+    assert summary["mean"] == 100.5
+    assert summary["max"] == 200
+    # percentiles are estimated from the latest samples only
+    assert summary["p50"] == 151
+    assert summary["p99"] == 200
+
+
+def test_histograms_merge():
+    first, second = Histogram(), Histogram()
+    first.observe(1)
+    second.observe(3)
+    first.merge(second)
+    assert first.summary()["count"] == 2
+    assert first.summary()["mean"] == 2
+    assert first.summary()["max"] == 3
+
+
+def test_stats_are_only_created_when_enabled(option):
+    assert create_stats(dict) is NULL_STATS
+    NULL_STATS.count("renders")
+    assert NULL_STATS.snapshot() == {"counters": {}, "gauges": {}, "histograms": {}}
+
+    option(REACTPY_JUPYTER_STATS, True)
+    stats = create_stats(dict)
+    try:
+        assert isinstance(stats, Stats)
+        stats.count("renders", 2)
+        assert stats.snapshot()["counters"] == {"renders": 2}
+    finally:
+        stats.close()
+
+
+def test_widgets_record_stats(display, option):
+    option(REACTPY_JUPYTER_STATS, True)
+    widget, client = display(Counter())
+    click(client, 2)
+
+    stats = widget.stats()
+    assert stats["counters"]["renders"] == 3
+    # the three updates, and the model if the view connected before the first render
+    assert stats["counters"]["messages_sent"] >= 3
+    # the view connecting, the clicks and the acknowledgements of the updates
+    assert stats["counters"]["messages_received"] >= 3
+    assert stats["histograms"]["render_seconds"]["count"] == 3
+    assert stats["histograms"]["event_to_update_seconds"]["count"] == 2
+    assert stats["gauges"] == {
+        "views": 1,
+        "queued_events": 0,
+        "held_updates": 0,
+        "inner_widgets": 0,
+    }
+    assert kernel_stats()["counters"]["renders"] >= 3
+
+
+def test_widgets_stop_counting_toward_kernel_stats_once_closed(option):
+    option(REACTPY_JUPYTER_STATS, True)
+    widgets_before = kernel_stats()["widgets"]
+    widget = LayoutWidget(Hello())
+    assert kernel_stats()["widgets"] == widgets_before + 1
+    widget.close()
+    assert kernel_stats()["widgets"] == widgets_before
+
+
+def test_format_stats():
+    stats = {
+        "widgets": 1,
+        "counters": {"renders": 3},
+        "gauges": {"views": 1},
+        "histograms": {
+            "render_seconds": {
+                "count": 3,
+                "mean": 0.002,
+                "p50": 0.001,
+                "p90": 0.004,
+                "p99": 0.004,
+                "max": 0.004,
+            }
+        },
+    }
+    lines = format_stats(stats).splitlines()
+    assert lines[0].split() == ["renders", "3"]
+    assert lines[1].split() == ["views", "1"]
+    assert lines[3].split() == ["count", "mean", "p50", "p99", "max"]
+    # times are shown in milliseconds
+    assert lines[4].split() == ["render_ms", "3", "2.00", "1.00", "4.00", "4.00"]
+
+
+def test_reactpy_stats_magic(option, capsys):
+    widget = None
+    try:
+        if not kernel_stats()["widgets"]:
+            reactpy_stats("")
+            assert "No widgets are recording stats" in capsys.readouterr().out
+        option(REACTPY_JUPYTER_STATS, True)
+        widget = LayoutWidget(Hello())
+        reactpy_stats("")
+        assert "widget(s)" in capsys.readouterr().out
+    finally:
+        if widget is not None:
+            widget.close()
+
+
+@component
+def Hello():
+    return html.p("hello")
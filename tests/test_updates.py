@@ -0,0 +1,140 @@
+from reactpy_jupyter.updates import (
+    UpdateHistory,
+    ViewOutbox,
+    apply_update,
+    collapse_updates,
+    find_imported_modules,
+)
+
+
+def update(path, model, version=None):
+    message = {"type": "layout-update", "path": path, "model": model}
+    if version is not None:
+        message["version"] = version
+    return message
+
+
+def test_apply_update_replaces_the_root():
+    model = {"tagName": "div"}
+    assert apply_update(model, update("", {"tagName": "p"})) == {"tagName": "p"}
+
+
+def test_apply_update_copies_only_along_the_path():
+    first = {"tagName": "b", "children": ["x"]}
+    second = {"tagName": "i", "children": ["y"]}
+    model = {"tagName": "div", "children": [first, second]}
+
+    new_model = apply_update(model, update("/children/0/children/0", "z"))
+
+    assert new_model == {
+        "tagName": "div",
+        "children": [{"tagName": "b", "children": ["z"]}, second],
+    }
+    # the old model is left as it was for anyone still reading it
+    assert model["children"][0] == {"tagName": "b", "children": ["x"]}
+    assert new_model["children"][1] is second
+
+
+def test_apply_update_unescapes_path_keys():
+    model = {"attributes": {}}
+    new_model = apply_update(model, update("/attributes/a~1b~0c", 1))
+    assert new_model == {"attributes": {"a/b~c": 1}}
+
+
+def test_collapse_updates_drops_overwritten_updates():
+    updates = [
+        update("/children/0", "a"),
+        update("/children/1", "b"),
+        update("/children/0/children/2", "c"),
+        update("/children/0", "d"),
+        update("/children/10", "e"),
+    ]
+    assert collapse_updates(updates) == [updates[1], updates[3], updates[4]]
+
+
+def test_collapse_updates_to_the_root():
+    updates = [update("/children/0", "a"), update("", {}), update("/children/1", "b")]
+    assert collapse_updates(updates) == updates[1:]
+
+
+def test_update_history_since():
+    history = UpdateHistory(3)
+    updates = [update("", i, version=i) for i in range(1, 6)]
+    for u in updates:
+        history.append(u)
+
+    assert history.since(5) == []
+    assert history.since(3) == updates[3:]
+    assert history.since(2) == updates[2:]
+    # older updates were discarded
+    assert history.since(1) is None
+    # a version from the future, as after the layout restarted
+    assert history.since(6) is None
+
+
+def test_update_history_when_empty():
+    history = UpdateHistory(3)
+    assert history.since(0) is None
+    history.append(update("", 0, version=1))
+    history.clear()
+    assert history.since(0) is None
+
+
+def test_view_outbox_falls_behind_after_its_window():
+    outbox = ViewOutbox(window=2, maxsize=10, version=0)
+    assert not outbox.is_behind
+    outbox.sent_version = 2
+    assert outbox.is_behind
+    outbox.acked_version = 1
+    assert not outbox.is_behind
+
+
+def test_view_outbox_holds_only_the_latest_update_to_a_path():
+    outbox = ViewOutbox(window=1, maxsize=10, version=0)
+    outbox.hold(update("/children/0", "a", version=1))
+    outbox.hold(update("/children/1", "b", version=2))
+    outbox.hold(
+        {
+            "type": "layout-update-batch",
+            "updates": [update("/children/0", "c", version=3)],
+            "version": 3,
+        }
+    )
+    assert [u["model"] for u in outbox.pending] == ["b", "c"]
+    outbox.hold(update("", "d", version=4))
+    assert [u["model"] for u in outbox.pending] == ["d"]
+
+
+def test_view_outbox_resyncs_once_too_many_updates_are_held():
+    outbox = ViewOutbox(window=1, maxsize=2, version=0)
+    for i in range(3):
+        outbox.hold(update(f"/children/{i}", i, version=i + 1))
+    assert outbox.needs_resync
+    assert outbox.pending == []
+    # nothing more is held until the view has been resynced
+    outbox.hold(update("/children/0", "x", version=4))
+    assert outbox.pending == []
+
+
+def test_find_imported_modules():
+    model = {
+        "tagName": "div",
+        "children": [
+            {"tagName": "A", "importSource": {"source": "a.js", "sourceType": "NAME"}},
+            {
+                "tagName": "",
+                "children": [
+                    {"tagName": "B", "importSource": {"source": "b.js"}},
+                    {
+                        "tagName": "C",
+                        "importSource": {
+                            "source": "https://example.com/c.js",
+                            "sourceType": "URL",
+                        },
+                    },
+                ],
+            },
+            "text",
+        ],
+    }
+    assert find_imported_modules(model) == {"a.js", "b.js"}
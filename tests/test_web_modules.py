@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from reactpy.config import REACTPY_WEB_MODULES_DIR
+
+from reactpy_jupyter.web_modules import (
+    WebModuleStore,
+    module_digest,
+    record_web_modules_used,
+    resolve_hashed_module,
+    web_module_manifest,
+)
+
+DAY = 24 * 60 * 60
+
+
+def write_module(directory: Path, name: str, content: str, age: float = 0) -> Path:
+    path = directory / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+    return path
+
+
+def test_identical_modules_are_stored_once(tmp_path):
+    first = write_module(tmp_path, "a.js", "same")
+    second = write_module(tmp_path, "b/c.js", "same")
+    write_module(tmp_path, "d.js", "different")
+
+    index = WebModuleStore(tmp_path).sync()
+
+    assert set(index) == {"a.js", "b/c.js", "d.js"}
+    assert index["a.js"]["digest"] == index["b/c.js"]["digest"]
+    assert first.samefile(second)
+    assert first.read_text() == "same"
+
+
+def test_changed_modules_are_stored_again(tmp_path):
+    path = write_module(tmp_path, "a.js", "old")
+    store = WebModuleStore(tmp_path)
+    old_digest = store.sync()["a.js"]["digest"]
+    path.unlink()
+    write_module(tmp_path, "a.js", "new")
+    assert store.sync()["a.js"]["digest"] != old_digest
+
+
+def test_collects_modules_not_used_recently(tmp_path):
+    write_module(tmp_path, "old.js", "old", age=40 * DAY)
+    write_module(tmp_path, "nested/old.js", "old too", age=40 * DAY)
+    write_module(tmp_path, "new.js", "new", age=DAY)
+
+    report = WebModuleStore(tmp_path).collect_garbage(max_size=0, max_age=30 * DAY)
+
+    assert sorted(report["removed"]) == ["nested/old.js", "old.js"]
+    assert not (tmp_path / "nested").exists()
+    assert (tmp_path / "new.js").exists()
+    assert web_module_manifest(tmp_path)["modules"].keys() == {"new.js"}
+
+
+def test_collects_least_recently_used_modules_over_the_size_limit(tmp_path):
+    for days in range(1, 5):
+        write_module(tmp_path, f"{days}.js", str(days) * 100, age=days * DAY)
+
+    report = WebModuleStore(tmp_path).collect_garbage(max_size=250, max_age=0)
+
+    assert report["removed"] == ["4.js", "3.js"]
+    assert report["size"] == 200
+
+
+def test_recently_used_modules_are_kept(tmp_path):
+    write_module(tmp_path, "a.js", "a" * 100, age=40 * DAY)
+    store = WebModuleStore(tmp_path)
+    store.sync()
+    store.record_access("a.js")
+    assert store.collect_garbage(max_size=1, max_age=DAY)["removed"] == []
+
+
+def test_recording_access_indexes_new_modules(tmp_path):
+    # as when ReactPy finds a module it already wrote long ago
+    write_module(tmp_path, "a.js", "a", age=40 * DAY)
+    store = WebModuleStore(tmp_path)
+    store.record_access("a.js")
+    assert store.collect_garbage(max_size=0, max_age=DAY)["removed"] == []
+    assert (tmp_path / "a.js").exists()
+
+
+def test_modules_used_by_layouts_are_recorded_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(REACTPY_WEB_MODULES_DIR, "current", tmp_path)
+    for name in ["a.js", "b.js"]:
+        write_module(tmp_path, name, name, age=40 * DAY)
+    store = WebModuleStore(tmp_path)
+    with store._locked():
+        # another kernel holding the store's lock doesn't hold up renders
+        record_web_modules_used(["a.js"])
+        record_web_modules_used(["b.js"])
+
+    deadline = time.monotonic() + 5
+    while set(store._read_index()) != {"a.js", "b.js"}:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+    assert store.collect_garbage(max_size=0, max_age=DAY)["removed"] == []
+
+
+def test_objects_shared_by_kept_modules_are_kept(tmp_path):
+    write_module(tmp_path, "old.js", "same", age=40 * DAY)
+    write_module(tmp_path, "new.js", "same", age=DAY)
+    store = WebModuleStore(tmp_path)
+
+    assert store.collect_garbage(max_size=0, max_age=30 * DAY)["removed"] == ["old.js"]
+    assert (tmp_path / "new.js").read_text() == "same"
+    objects = list((tmp_path / ".store" / "objects").rglob("*"))
+    assert any(p.is_file() for p in objects)
+
+
+def test_resolve_hashed_module(tmp_path):
+    path = write_module(tmp_path, "a/b.js", "b")
+    digest = module_digest(path)
+    assert resolve_hashed_module(tmp_path, digest, "a/b.js") == path
+    assert resolve_hashed_module(tmp_path, "0" * len(digest), "a/b.js") is None
+
+
+def test_resolve_hashed_module_stays_within_the_directory(tmp_path):
+    directory = tmp_path / "modules"
+    outside = write_module(tmp_path, "outside.js", "secret")
+    digest = module_digest(outside)
+    for name in ["../outside.js", str(outside), ""]:
+        assert resolve_hashed_module(directory, digest, name) is None
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from reactpy_jupyter.config import REACTPY_JUPYTER_COMPRESSION_THRESHOLD
+from reactpy_jupyter.wire_format import (
+    decode_message,
+    encode_message,
+    message_size,
+)
+
+UPDATE = {
+    "type": "layout-update",
+    "path": "/children/0",
+    "model": {"tagName": "p", "attributes": {"x": 1.5, "y": None}, "children": ["é"]},
+    "version": 3,
+}
+
+
+def test_json_round_trip():
+    content, buffers = encode_message(UPDATE, "json")
+    assert (content, buffers) == ({"data": UPDATE}, [])
+    assert decode_message(content, buffers) == UPDATE
+
+
+def test_msgpack_round_trip():
+    content, buffers = encode_message(UPDATE, "msgpack")
+    assert content == {"encoding": "msgpack"}
+    assert len(buffers) == 1
+    assert decode_message(content, buffers) == UPDATE
+
+
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_msgpack_compressed_round_trip(option, threshold):
+    option(REACTPY_JUPYTER_COMPRESSION_THRESHOLD, threshold)
+    content, buffers = encode_message(UPDATE, "msgpack")
+    assert content == {"encoding": "msgpack+zlib"}
+    assert decode_message(content, buffers) == UPDATE
+
+
+def test_compresses_only_large_messages(option):
+    option(REACTPY_JUPYTER_COMPRESSION_THRESHOLD, 1000)
+    large = {**UPDATE, "model": "x" * 1000}
+    assert encode_message(UPDATE, "msgpack")[0]["encoding"] == "msgpack"
+    assert encode_message(large, "msgpack")[0]["encoding"] == "msgpack+zlib"
+    assert decode_message(*encode_message(large, "msgpack")) == large
+
+
+def test_decode_memoryview_buffers():
+    # buffers from the kernel arrive as memoryviews
+    content, buffers = encode_message(UPDATE, "msgpack")
+    assert decode_message(content, [memoryview(buffers[0])]) == UPDATE
+
+
+def test_message_size():
+    content, buffers = encode_message(UPDATE, "msgpack")
+    assert message_size(content, buffers) == len(buffers[0])
+    assert message_size(content, [memoryview(buffers[0])]) == len(buffers[0])
+    content, buffers = encode_message(UPDATE, "json")
+    assert message_size(content, buffers) == len(
+        json.dumps({"data": UPDATE}, separators=(",", ":"))
+    )